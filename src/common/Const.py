@@ -4,6 +4,8 @@ import os
 import sys
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 from . import errors
 
 __mode = os.environ.get("APP_EXEC_MODE", "prod")
@@ -15,11 +17,19 @@ APP_PROP_PATH = SRC_ROOT.parents[0].joinpath(__prop_name)
 SAMPLE_PROP_PATH = SRC_ROOT.parents[0].joinpath(__sample_prop_name)
 ST_CACHE_TIME_SHORT = 60 * 5
 
-LOG_LEVEL = logging.DEBUG
-
 if not APP_PROP_PATH.exists():
     err = errors.SettingNotFoundError(APP_PROP_PATH, SAMPLE_PROP_PATH)
     print(err, file=sys.stderr)
     raise err
 else:
     print(f"load apprication properties from {str(APP_PROP_PATH)}")
+    load_dotenv(APP_PROP_PATH)
+
+LOG_LEVEL = logging.getLevelName(os.environ.get("APP_LOG_LEVEL", "DEBUG").upper())
+if not isinstance(LOG_LEVEL, int):
+    print(f"unknown APP_LOG_LEVEL {os.environ['APP_LOG_LEVEL']}, use DEBUG instead", file=sys.stderr)
+    LOG_LEVEL = logging.DEBUG
+LOG_QUEUE = os.environ.get("APP_LOG_QUEUE", "false").lower() == "true"
+LOG_SAMPLE_EVERY = int(os.environ.get("APP_LOG_SAMPLE_EVERY", 100))
+# expose metrics on http://host:APP_METRICS_PORT/metrics if set. 0 disables the endpoint.
+METRICS_PORT = int(os.environ.get("APP_METRICS_PORT", 0))
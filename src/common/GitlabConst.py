@@ -1,5 +1,6 @@
 """Provide const values for connecting gitlab."""
 import os
+from pathlib import Path
 
 from dotenv import load_dotenv
 
@@ -13,3 +14,23 @@ if isinstance(__ids, str):
     GROUP_IDS = [int(id) for id in __ids.split(",")]
 else:
     GROUP_IDS = __ids
+MAX_WORKERS = int(os.environ.get("GITLAB_MAX_WORKERS", 8))
+RATE_LIMIT_PER_SEC = float(os.environ.get("GITLAB_RATE_LIMIT_PER_SEC", 10))
+CACHE_DIR = Path(os.environ.get("GITLAB_CACHE_DIR", Const.SRC_ROOT.parents[0].joinpath(".cache")))
+COMMIT_CACHE_MAX_MB = float(os.environ.get("GITLAB_COMMIT_CACHE_MAX_MB", 512))
+RESPONSE_CACHE_MAX_MB = float(os.environ.get("GITLAB_RESPONSE_CACHE_MAX_MB", 128))
+INCREMENTAL_SYNC = os.environ.get("GITLAB_INCREMENTAL_SYNC", "true").lower() == "true"
+PROJECT_INDEX_TTL_SEC = float(os.environ.get("GITLAB_PROJECT_INDEX_TTL_SEC", Const.ST_CACHE_TIME_SHORT))
+RETRY_COUNT = int(os.environ.get("GITLAB_RETRY_COUNT", 3))
+RETRY_BACKOFF_SEC = float(os.environ.get("GITLAB_RETRY_BACKOFF_SEC", 0.5))
+RETRY_MAX_WAIT_SEC = float(os.environ.get("GITLAB_RETRY_MAX_WAIT_SEC", 60))
+RATE_LIMIT_MIN_REMAINING = int(os.environ.get("GITLAB_RATE_LIMIT_MIN_REMAINING", 10))
+POOL_SIZE = int(os.environ.get("GITLAB_POOL_SIZE", max(MAX_WORKERS, 10)))
+TIMEOUT_SEC = float(os.environ.get("GITLAB_TIMEOUT_SEC", 30))
+CLIENT_BACKEND = os.environ.get("GITLAB_CLIENT_BACKEND", "sync")
+PER_PAGE = int(os.environ.get("GITLAB_PER_PAGE", 100))
+STATS_MODE = os.environ.get("GITLAB_STATS_MODE", "commit")
+SNAPSHOT = os.environ.get("GITLAB_SNAPSHOT", "true").lower() == "true"
+SNAPSHOT_MAX_AGE_SEC = float(os.environ.get("GITLAB_SNAPSHOT_MAX_AGE_SEC", Const.ST_CACHE_TIME_SHORT))
+BACKGROUND_REFRESH = os.environ.get("GITLAB_BACKGROUND_REFRESH", "true").lower() == "true"
+REFRESH_INTERVAL_SEC = float(os.environ.get("GITLAB_REFRESH_INTERVAL_SEC", Const.ST_CACHE_TIME_SHORT))
@@ -1,11 +1,13 @@
 """Provice logger."""
+import atexit
 import inspect
+import itertools
 import logging
 import logging.handlers
 import os
+import queue
 import sys
 import traceback
-from contextlib import contextmanager
 from functools import wraps
 from pathlib import Path
 from typing import Any, Union
@@ -16,17 +18,34 @@ loggers: dict[str, Any] = {}
 
 
 class CustomLogger(logging.Logger):
-    """Force the closing of file handlers and the creation of console handlers."""
+    """Add caller information to records and force the creation of console handlers.
+
+    Caller is found by sys._getframe only when the level is enabled. File handlers are kept open.
+    """
 
     def __init__(self, name: str, level: int = logging.NOTSET) -> None:
-        """Simply exec init of logging.Logger class."""
-        super().__init__(name, level)
+        """Exec init of logging.Logger class.
 
-    def close_file_handler(self) -> None:
-        """Close all file handlers."""
-        for handler in self.handlers:
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
+        Parameters
+        ----------
+        name
+            name of logger.
+        level
+            log level, by default logging.NOTSET
+        """
+        super().__init__(name, level)
+        # set if handlers run on background thread. see get_logger.
+        self.listener: Union[logging.handlers.QueueListener, None] = None
+        self._sample_counters: dict[tuple[str, int], itertools.count] = {}
+
+    def setLevel(self, level: Union[int, str]) -> None:
+        """Set level and drop cached results of isEnabledFor."""
+        super().setLevel(level)
+        # logger created directly is not registered in logging manager, so manager never clears its cache.
+        # _cache of isEnabledFor is private and missing in typeshed, so guard it for other python versions.
+        cache = getattr(self, "_cache", None)
+        if cache is not None:
+            cache.clear()
 
     def set_stream_when_none(self) -> None:
         """Set stream handler if this logger hasn't it."""
@@ -37,45 +56,36 @@ class CustomLogger(logging.Logger):
                 continue
             handler.stream = sys.stdout
 
-    def __find_caller(self, wrapper_depth: int) -> dict:
-        def make_dict(filename, funcname, lineno) -> dict:
-            return {
-                "real_filename": self.split_filepath(filename),
-                "real_funcName": funcname,
-                "real_lineno": lineno,
-            }
-
-        # stack0: this function, 1: log function, 2: context manager, 3: contextlib
-        target_info = inspect.stack()[4 + wrapper_depth]
-        return make_dict(target_info.filename, target_info.function, target_info.lineno)
-
-    @contextmanager
-    def logging_context(self, wrapper_depth: int, kwargs_dict: dict):
-        """Provide common processing for logging.
+    def stop_listener(self) -> None:
+        """Write records left in queue and stop background thread. Do nothing if not running."""
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
 
-        Parameters
-        ----------
-        wrapper_depth
-            set depth of wrapping if caller wrapped.
-        kwargs_dict
-            set **kwargs if need.
-
-        Yields
-        ------
-        dict
-            preprocessed extra kwargs for logging function.
-        """
+    def __find_caller(self, depth: int) -> dict:
+        """Return caller information of the frame depth + 1 levels above (1 for this function)."""
+        try:
+            frame = sys._getframe(depth + 1)
+        except ValueError:
+            return {"real_filename": "unknown", "real_funcName": "unknown", "real_lineno": 0}
+        code = frame.f_code
+        return {
+            "real_filename": self.split_filepath(code.co_filename),
+            "real_funcName": code.co_name,
+            "real_lineno": frame.f_lineno,
+        }
+
+    def __log(self, level: int, msg: str, wrapper_depth: int, args: tuple, kwargs: dict) -> None:
+        """Log with caller information. Callers must check the level is enabled before call."""
         try:
             self.set_stream_when_none()
-            if "extra" not in kwargs_dict:
-                kwargs_dict["extra"] = self.__find_caller(wrapper_depth)
-            yield kwargs_dict
-            self.close_file_handler()
+            if "extra" not in kwargs:
+                # 1: this function, 2: log function, 3: caller
+                kwargs["extra"] = self.__find_caller(2 + wrapper_depth)
+            self._log(level, msg, args, **kwargs)
         except Exception as e:
             trace_str = traceback.format_exception_only(type(e), e)
             print(f"exception raised when logging: {trace_str}")
-        finally:
-            pass
 
     def debug(self, msg: str, wrapper_depth: int = 0, *args, **kwargs) -> None:
         """Output debug message.
@@ -87,8 +97,36 @@ class CustomLogger(logging.Logger):
         wrapper_depth
             set wrapper depth when caller wrapped, by default 0
         """
-        with self.logging_context(wrapper_depth, kwargs) as logging_kwargs:
-            super().debug(msg, *args, **logging_kwargs)
+        if self.isEnabledFor(logging.DEBUG):
+            self.__log(logging.DEBUG, msg, wrapper_depth, args, kwargs)
+
+    def debug_sampled(self, msg: str, every: Union[int, None] = None, wrapper_depth: int = 0, *args, **kwargs) -> None:
+        """Output only first and then 1 of every N debug messages from the same line.
+
+        Use this for high-volume sites like once per commit fetched.
+
+        Parameters
+        ----------
+        msg
+            massage for logging.
+        every
+            output 1 of every N messages, by default Const.LOG_SAMPLE_EVERY
+        wrapper_depth
+            set wrapper depth when caller wrapped, by default 0
+        """
+        if not self.isEnabledFor(logging.DEBUG):
+            return
+        if every is None:
+            every = Const.LOG_SAMPLE_EVERY
+        caller = sys._getframe(1 + wrapper_depth)
+        key = (caller.f_code.co_filename, caller.f_lineno)
+        counter = self._sample_counters.get(key)
+        if counter is None:
+            counter = self._sample_counters.setdefault(key, itertools.count())
+        # next() of itertools.count is atomic under GIL, so no lock is needed.
+        count = next(counter)
+        if count % max(1, every) == 0:
+            self.__log(logging.DEBUG, f"{msg} (sampled 1/{every}, #{count + 1})", wrapper_depth, args, kwargs)
 
     def info(self, msg: str, wrapper_depth: int = 0, *args, **kwargs) -> None:
         """Output info message.
@@ -100,8 +138,8 @@ class CustomLogger(logging.Logger):
         wrapper_depth
             set wrapper depth when caller wrapped, by default 0
         """
-        with self.logging_context(wrapper_depth, kwargs) as logging_kwargs:
-            super().info(msg, *args, **logging_kwargs)
+        if self.isEnabledFor(logging.INFO):
+            self.__log(logging.INFO, msg, wrapper_depth, args, kwargs)
 
     def warning(self, msg: str, wrapper_depth: int = 0, *args, **kwargs) -> None:
         """Output warning message.
@@ -113,8 +151,8 @@ class CustomLogger(logging.Logger):
         wrapper_depth
             set wrapper depth when caller wrapped, by default 0
         """
-        with self.logging_context(wrapper_depth, kwargs) as logging_kwargs:
-            super().warning(msg, *args, **logging_kwargs)
+        if self.isEnabledFor(logging.WARNING):
+            self.__log(logging.WARNING, msg, wrapper_depth, args, kwargs)
 
     def error(self, msg: str, wrapper_depth: int = 0, *args, **kwargs) -> None:
         """Output error message.
@@ -126,8 +164,8 @@ class CustomLogger(logging.Logger):
         wrapper_depth
             set wrapper depth when caller wrapped, by default 0
         """
-        with self.logging_context(wrapper_depth, kwargs) as logging_kwargs:
-            super().error(msg, *args, **logging_kwargs)
+        if self.isEnabledFor(logging.ERROR):
+            self.__log(logging.ERROR, msg, wrapper_depth, args, kwargs)
 
     def critical(self, msg: str, wrapper_depth: int = 0, *args, **kwargs) -> None:
         """Output critical message.
@@ -139,8 +177,8 @@ class CustomLogger(logging.Logger):
         wrapper_depth
             set wrapper depth when caller wrapped, by default 0
         """
-        with self.logging_context(wrapper_depth, kwargs) as logging_kwargs:
-            super().critical(msg, *args, **logging_kwargs)
+        if self.isEnabledFor(logging.CRITICAL):
+            self.__log(logging.CRITICAL, msg, wrapper_depth, args, kwargs)
 
     @staticmethod
     def split_filepath(filepath: str, split_str: str = None) -> str:
@@ -175,7 +213,12 @@ class CustomFilter(logging.Filter):
         return True
 
 
-def get_logger(name: str = None, level: int = Const.LOG_LEVEL, log_path: Union[Path, str] = None) -> CustomLogger:
+def get_logger(
+    name: str = None,
+    level: int = Const.LOG_LEVEL,
+    log_path: Union[Path, str] = None,
+    use_queue: bool = Const.LOG_QUEUE,
+) -> CustomLogger:
     """Create (or return pre exists) logger.
 
     Parameters
@@ -186,6 +229,8 @@ def get_logger(name: str = None, level: int = Const.LOG_LEVEL, log_path: Union[P
         set log level, by default Const.LOG_LEVEL
     log_path
         set output log file path if need, by default None
+    use_queue
+        put records to queue and format and write them on background thread, by default Const.LOG_QUEUE
 
     Returns
     -------
@@ -208,7 +253,7 @@ def get_logger(name: str = None, level: int = Const.LOG_LEVEL, log_path: Union[P
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(logging.Formatter(log_format))
-    logger.addHandler(console_handler)
+    handlers: list[logging.Handler] = [console_handler]
 
     if log_path:
         log_dir = Path(log_path).parents[0]
@@ -218,7 +263,18 @@ def get_logger(name: str = None, level: int = Const.LOG_LEVEL, log_path: Union[P
         )
         file_handler.setLevel(level)
         file_handler.setFormatter(logging.Formatter(log_format))
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if use_queue:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        logger.listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        logger.listener.start()
+        # flush records left in queue at exit.
+        atexit.register(logger.stop_listener)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
     logger.setLevel(level)
     loggers[name] = logger
     return logger
@@ -228,10 +284,11 @@ def logging_start_end(logger: logging.Logger):
     """Decorate function to logging."""
 
     def _decorator(func):
+        func_name = func.__name__
+        filename = CustomLogger.split_filepath((inspect.getabsfile(func)))
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            func_name = func.__name__
-            filename = CustomLogger.split_filepath((inspect.getabsfile(func)))
             current_frame = inspect.currentframe()
             if current_frame and current_frame.f_back:
                 lineno = str(current_frame.f_back.f_lineno)
@@ -0,0 +1,41 @@
+"""Provide statistics of unified diff text."""
+
+
+def count_diff_lines(diff: str) -> tuple[int, int]:
+    """Count added and removed lines of unified diff in one pass without splitting it into lines.
+
+    File headers like '--- a/file' and '+++ b/file' are not counted.
+    Lines in hunks are counted even if they look like headers (e.g. removed line '-- comment' is '--- comment').
+
+    Parameters
+    ----------
+    diff
+        diff text of single file. gitlab api returns it starting with hunk header '@@'.
+
+    Returns
+    -------
+    tuple[int, int]
+        count of added lines and removed lines.
+    """
+    start = __find_body_start(diff)
+    additions = diff.count("\n+", start)
+    deletions = diff.count("\n-", start)
+    if diff.startswith("+", start):
+        additions += 1
+    elif diff.startswith("-", start):
+        deletions += 1
+    return additions, deletions
+
+
+def __find_body_start(diff: str) -> int:
+    """Find start of first hunk. If diff has no file headers, return 0."""
+    has_git_header = diff.startswith("diff --git ")
+    # '--- ' alone may be removed line '-- ...'. it is file header only if '+++ ' line follows.
+    has_file_header = diff.startswith("--- ") and diff.startswith("+++ ", diff.find("\n") + 1)
+    if not (has_git_header or has_file_header):
+        return 0
+    hunk_start = diff.find("\n@@")
+    if hunk_start < 0:
+        # file headers only. e.g. changes of file mode.
+        return len(diff)
+    return hunk_start + 1
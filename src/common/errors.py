@@ -1,5 +1,5 @@
 """Provide Exception classes."""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
@@ -36,3 +36,20 @@ class ResourceNotFoundError(Exception):
     def __str__(self) -> str:
         """Create message for print this object."""
         return f"{self.target_resource} not found. Search condition is {self.search_condition}."
+
+
+@dataclass(frozen=True)
+class IncompleteDatasetError(Exception):
+    """Error class when some rows of dataset failed to fetch and the dataset is not published as snapshot."""
+
+    resource: str
+    group_id: int
+    failed_rows: int
+    df: Any = field(compare=False, repr=False)
+
+    def __str__(self) -> str:
+        """Create message for print this object."""
+        return (
+            f"{self.failed_rows} rows of {self.resource} in group {self.group_id} failed to fetch. "
+            "Snapshot is not published until they are fetched."
+        )
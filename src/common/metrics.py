@@ -0,0 +1,344 @@
+"""Collect latency and count metrics of the process and render them as prometheus text format."""
+import bisect
+import inspect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator, Union
+from urllib.parse import urlparse
+
+import requests
+
+# upper bounds of histogram buckets in seconds. +Inf bucket is added implicitly.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+FUNCTION_SECONDS = "gitlab_dashboard_function_seconds"
+FUNCTION_ERRORS = "gitlab_dashboard_function_errors_total"
+STAGE_SECONDS = "gitlab_dashboard_stage_seconds"
+API_CALLS = "gitlab_dashboard_api_calls_total"
+API_SECONDS = "gitlab_dashboard_api_request_seconds"
+API_RETRIES = "gitlab_dashboard_api_retries_total"
+DOWNLOADED_BYTES = "gitlab_dashboard_downloaded_bytes_total"
+CACHE_HITS = "gitlab_dashboard_cache_hits_total"
+CACHE_MISSES = "gitlab_dashboard_cache_misses_total"
+
+HELPS = {
+    FUNCTION_SECONDS: "Latency of instrumented functions by stage and group.",
+    FUNCTION_ERRORS: "Exceptions raised from instrumented functions.",
+    STAGE_SECONDS: "Latency of stages inside functions by group.",
+    API_CALLS: "Requests sent to gitlab by endpoint and status.",
+    API_SECONDS: "Latency of requests sent to gitlab by endpoint.",
+    API_RETRIES: "Requests retried after temporary failure by endpoint and reason.",
+    DOWNLOADED_BYTES: "Bytes of response bodies downloaded from gitlab by endpoint.",
+    CACHE_HITS: "Lookups answered by local caches.",
+    CACHE_MISSES: "Lookups local caches could not answer.",
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+# ids and shas in api path are replaced so that endpoints of all resources are counted together.
+__ENDPOINT_PATTERNS = (
+    (re.compile(r"/commits/[^/]+"), "/commits/:sha"),
+    (re.compile(r"/(\d+|[^/]*%2F[^/]*)(?=/|$)"), "/:id"),
+)
+
+
+@dataclass
+class Histogram:
+    """Counts of observed values in cumulative buckets."""
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(init=False)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        """Set empty counts of each bucket and +Inf bucket."""
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        """Add a value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate q-quantile by linear interpolation in the bucket like histogram_quantile of prometheus."""
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                if i == len(self.buckets):
+                    # values over the largest bucket can not be estimated.
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Counters and histograms keyed by metric name and labels. Safe to update from worker threads."""
+
+    def __init__(self) -> None:
+        """Create empty registry."""
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """Add value to the counter."""
+        key = self.__to_labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Add value to the histogram."""
+        key = self.__to_labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def counter_value(self, name: str, **labels: Any) -> float:
+        """Sum counters of the name have all given labels."""
+        with self._lock:
+            return sum(v for k, v in self.counters.get(name, {}).items() if self.__has_labels(k, labels))
+
+    def collect(self, name: str) -> list[dict[str, Any]]:
+        """Return each series of the metric as dict has labels and values.
+
+        Counters have value. Histograms have count, sum, mean, p50 and p95.
+        """
+        with self._lock:
+            counters = dict(self.counters.get(name, {}))
+            histograms = {
+                k: (h.count, h.total, h.quantile(0.5), h.quantile(0.95))
+                for k, h in self.histograms.get(name, {}).items()
+            }
+        rows: list[dict[str, Any]] = [{**dict(k), "value": v} for k, v in counters.items()]
+        for k, (count, total, p50, p95) in histograms.items():
+            rows.append({**dict(k), "count": count, "sum": total, "mean": total / count, "p50": p50, "p95": p95})
+        return rows
+
+    def clear(self) -> None:
+        """Drop all series."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Render all series in prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.extend(self.__header(name, "counter"))
+                lines.extend(f"{name}{self.__format_labels(k)} {v:g}" for k, v in sorted(series.items()))
+            for name, hist_series in sorted(self.histograms.items()):
+                lines.extend(self.__header(name, "histogram"))
+                for k, histogram in sorted(hist_series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += bucket_count
+                        le = bound if isinstance(bound, str) else f"{bound:g}"
+                        lines.append(f"{name}_bucket{self.__format_labels(k + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self.__format_labels(k)} {histogram.total:g}")
+                    lines.append(f"{name}_count{self.__format_labels(k)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __to_labels(labels: dict[str, Any]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    @staticmethod
+    def __has_labels(key: Labels, labels: dict[str, Any]) -> bool:
+        key_dict = dict(key)
+        return all(key_dict.get(k) == str(v) for k, v in labels.items())
+
+    @staticmethod
+    def __format_labels(labels: Labels) -> str:
+        if not labels:
+            return ""
+        escaped = (
+            k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    @staticmethod
+    def __header(name: str, metric_type: str) -> list[str]:
+        return [f"# HELP {name} {HELPS.get(name, name)}", f"# TYPE {name} {metric_type}"]
+
+
+registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return registry shared in the process."""
+    return registry
+
+
+def timed(stage: str) -> Callable:
+    """Decorate function to observe its latency to FUNCTION_SECONDS.
+
+    Series are labeled by stage, function and group. group is group_id argument of the function
+    or group_id attribute of self, so that slow group can be found.
+
+    Parameters
+    ----------
+    stage
+        layer of the function like repository, service and view.
+    """
+
+    def _decorator(func):
+        func_name = func.__qualname__
+        params = list(inspect.signature(func).parameters)
+        group_idx = params.index("group_id") if "group_id" in params else None
+        is_method = bool(params) and params[0] == "self"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            group = kwargs.get("group_id")
+            if group is None and group_idx is not None and group_idx < len(args):
+                group = args[group_idx]
+            if group is None and is_method and args:
+                group = getattr(args[0], "group_id", None)
+            labels = {"stage": stage, "function": func_name, "group": "" if group is None else group}
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                registry.inc(FUNCTION_ERRORS, **labels)
+                raise
+            finally:
+                registry.observe(FUNCTION_SECONDS, time.perf_counter() - start, **labels)
+
+        return wrapper
+
+    return _decorator
+
+
+@contextmanager
+def timer(name: str, **labels: Any) -> Iterator[None]:
+    """Observe seconds spent in the block to the histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, **labels)
+
+
+def count_cache(cache: str, hit: bool) -> None:
+    """Count lookup of the local cache."""
+    registry.inc(CACHE_HITS if hit else CACHE_MISSES, cache=cache)
+
+
+def endpoint_of(url: str) -> str:
+    """Return path of api url whose ids are replaced like /projects/:id/repository/commits/:sha."""
+    path = urlparse(url).path
+    api_idx = path.find("/api/v4")
+    if api_idx >= 0:
+        path = path[api_idx + len("/api/v4") :]
+    for pattern, replacement in __ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path or "/"
+
+
+def record_api_call(method: str, url: str, status: int, seconds: float, size: int) -> None:
+    """Count request sent to gitlab.
+
+    Parameters
+    ----------
+    method
+        http method.
+    url
+        requested url.
+    status
+        status code of response.
+    seconds
+        time from sending request to receiving response headers.
+    size
+        bytes of response body.
+    """
+    endpoint = endpoint_of(url)
+    registry.inc(API_CALLS, method=method, endpoint=endpoint, status=status)
+    registry.observe(API_SECONDS, seconds, endpoint=endpoint)
+    registry.inc(DOWNLOADED_BYTES, size, endpoint=endpoint)
+
+
+def record_response(response: requests.Response, *args, **kwargs) -> None:
+    """Count response as response hook of requests.Session."""
+    status = response.status_code
+    # streamed body is left for caller. read it here would load whole body in memory.
+    if kwargs.get("stream"):
+        size = int(response.headers.get("Content-Length", 0))
+    elif getattr(response, "not_modified", False):
+        # body was served from response cache after 304.
+        status, size = 304, 0
+    else:
+        size = len(response.content)
+    record_api_call(response.request.method or "GET", response.url, status, response.elapsed.total_seconds(), size)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve registry on /metrics in prometheus text format."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Respond registry or 404."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        """Do not write access log to stderr on every scrape."""
+
+
+metrics_server: Union[ThreadingHTTPServer, None] = None
+__metrics_server_lock = threading.Lock()
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics on daemon thread. Safe to call on every rerun of streamlit.
+
+    Parameters
+    ----------
+    port
+        port to listen. 0 picks free port.
+    host
+        address to listen, by default 0.0.0.0
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        running server shared in the process.
+    """
+    global metrics_server
+    with __metrics_server_lock:
+        if metrics_server is None:
+            metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    return metrics_server
+
+
+def stop_http_server() -> None:
+    """Stop /metrics server if running."""
+    global metrics_server
+    with __metrics_server_lock:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+            metrics_server = None
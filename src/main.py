@@ -1,20 +1,42 @@
 """Streamlit main page."""
 import traceback
+from typing import Any, Mapping
 
 import streamlit as st
 from streamlit.commands.page_config import set_page_config
 
-from common import GitlabConst
+from common import Const, GitlabConst, metrics
 from repository.mapper import GitlabClient
+from service.scheduler import start_scheduler
+from view.diagnostics import create_diagnostics_view
 from view.issue import create_issue_view
 from view.mergerequest import create_mergerequest_view
 
 VIEW_TARGETS = ("about", "issues", "merge_requests")
+# hidden from users. open with ?diagnostics in url.
+DIAGNOSTICS_VIEW = "diagnostics"
+
+
+def __query_params() -> Mapping[str, Any]:
+    # experimental_get_query_params is replaced by st.query_params and removed in newer streamlit.
+    query_params = getattr(st, "query_params", None)
+    if query_params is None:
+        query_params = getattr(st, "experimental_get_query_params")()
+    return query_params
+
 
 set_page_config(layout="wide")
+if GitlabConst.BACKGROUND_REFRESH:
+    # started once in the server process, later reruns only check it is running.
+    start_scheduler()
+if Const.METRICS_PORT:
+    metrics.start_http_server(Const.METRICS_PORT)
 st.title("Gitlab Dashboard")
 st.sidebar.markdown("# Select view")
-view_target = st.sidebar.radio("", VIEW_TARGETS)
+view_targets: tuple[str, ...] = VIEW_TARGETS
+if DIAGNOSTICS_VIEW in __query_params():
+    view_targets += (DIAGNOSTICS_VIEW,)
+view_target = st.sidebar.radio("", view_targets)
 try:
     group_name_id_map = {GitlabClient(id).group.name: id for id in GitlabConst.GROUP_IDS}
     target_group_name = st.sidebar.selectbox("GroupName", group_name_id_map.keys())
@@ -34,6 +56,8 @@ try:
         create_issue_view(target_group_id)
     elif view_target == VIEW_TARGETS[2]:
         create_mergerequest_view(target_group_id)
+    elif view_target == DIAGNOSTICS_VIEW:
+        create_diagnostics_view()
 except Exception as e:
     st.error(f"Failed to something: {str(e)}")
     st.error(f"{traceback.format_exc()}")
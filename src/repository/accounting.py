@@ -0,0 +1,57 @@
+"""Count requests sent to gitlab while a block runs.
+
+Every request is counted in metrics.API_CALLS by the response hook of the shared session or by the async client,
+so accounts are deltas of it and requests from worker threads of FetchEngine are counted too.
+Metrics are process-wide, so blocks running at the same time count each other.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+from common import metrics
+
+
+class RequestAccount:
+    """Requests sent while the account is open, counted by endpoint like /projects/:id/repository/commits/:sha."""
+
+    def __init__(self) -> None:
+        """Open account from requests counted so far."""
+        self._opened = self.__count_calls()
+        self._closed: Union[Counter[str], None] = None
+
+    @property
+    def total(self) -> int:
+        """Count all requests."""
+        return sum(self.by_endpoint().values())
+
+    def close(self) -> None:
+        """Stop counting requests."""
+        self._closed = self.__count_calls()
+
+    def by_endpoint(self) -> dict[str, int]:
+        """Return counts of each endpoint ordered by count."""
+        calls = self._closed if self._closed is not None else self.__count_calls()
+        return dict((calls - self._opened).most_common())
+
+    @staticmethod
+    def __count_calls() -> Counter[str]:
+        calls: Counter[str] = Counter()
+        for series in metrics.get_registry().collect(metrics.API_CALLS):
+            calls[f"{series['method']} {series['endpoint']}"] += int(series["value"])
+        return calls
+
+
+@contextmanager
+def account_requests() -> Iterator[RequestAccount]:
+    """Count requests sent to gitlab in the block.
+
+    Yields
+    ------
+    RequestAccount
+        account updated until the block exits.
+    """
+    account = RequestAccount()
+    try:
+        yield account
+    finally:
+        account.close()
@@ -0,0 +1,378 @@
+"""Fetch gitlab data by rest api asynchronously."""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Coroutine, Union
+from urllib.parse import quote
+
+import httpx
+import requests
+from gitlab.exceptions import GitlabHttpError
+from gitlab.v4.objects.commits import ProjectCommit
+from gitlab.v4.objects.issues import GroupIssue
+from gitlab.v4.objects.merge_requests import GroupMergeRequest
+from gitlab.v4.objects.projects import Project
+
+from common import GitlabConst, metrics
+from repository import project_index, response_cache
+from repository.lazy_mergerequest import LazyMergeRequest
+from repository.mapper import GitlabClient
+from repository.throttle import THROTTLED_STATUS_CODES, RetryPolicy, get_host_throttle
+
+
+class AsyncGitlabClient:
+    """Async API client for fetch gitlab specific group data.
+
+    Every method returns json of gitlab api as is. Pages 2..N of list api are requested
+    in parallel once X-Total-Pages of first page is known.
+    Concurrent requests are bounded by semaphore and HostThrottle shared with the sync client.
+    Requests failed temporarily are retried by RetryPolicy same as ThrottledAdapter of the sync client.
+    """
+
+    def __init__(
+        self,
+        group_id: int,
+        *,
+        url: Union[str, None] = None,
+        token: Union[str, None] = None,
+        max_concurrency: int = GitlabConst.MAX_WORKERS,
+        per_page: int = 100,
+        transport: Union[httpx.AsyncBaseTransport, None] = None,
+    ) -> None:
+        """Create http client. Must be called in running event loop.
+
+        Parameters
+        ----------
+        group_id
+            id of target group.
+        url
+            url of gitlab, by default GitlabConst.URL
+        token
+            access token, by default GitlabConst.TOKEN
+        max_concurrency
+            max requests in flight, by default GitlabConst.MAX_WORKERS
+        per_page
+            items per page of list api, by default 100
+        transport
+            transport of httpx for test, by default None
+        """
+        self.group_id = group_id
+        self.per_page = per_page
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._throttle = get_host_throttle(url or GitlabConst.URL, max_concurrency)
+        self._retry_policy = RetryPolicy()
+        self._client = httpx.AsyncClient(
+            base_url=f"{(url or GitlabConst.URL).rstrip('/')}/api/v4",
+            headers={"PRIVATE-TOKEN": token or GitlabConst.TOKEN},
+            timeout=GitlabConst.TIMEOUT_SEC,
+            limits=httpx.Limits(
+                max_connections=GitlabConst.POOL_SIZE, max_keepalive_connections=GitlabConst.POOL_SIZE
+            ),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncGitlabClient":
+        """Use as async context manager."""
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Close http client."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close http client."""
+        await self._client.aclose()
+
+    async def get(self, path: str, params: Union[dict[str, Any], None] = None) -> httpx.Response:
+        """Request GET. Raise httpx.HTTPStatusError if status is not 2xx."""
+        query = {k: v for k, v in (params or {}).items() if v is not None}
+        request = self._client.build_request("GET", path, params=query)
+        # list responses are revalidated by ETag same as CachingAdapter of sync client.
+        key = response_cache.cache_key("GET", str(request.url), request.headers)
+        cached = None if key is None else response_cache.get_response_cache().get(key)
+        if cached is not None:
+            request.headers["If-None-Match"] = cached.etag
+        response, elapsed = await self.__send_with_retry(request)
+        metrics.record_api_call("GET", str(response.url), response.status_code, elapsed, len(response.content))
+        if key is not None:
+            metrics.count_cache(response_cache.CACHE_NAME, cached is not None and response.status_code == 304)
+        if cached is not None and response.status_code == 304:
+            headers = response_cache.revalidated_headers(cached, response.headers)
+            return httpx.Response(200, headers=headers, content=cached.body, request=request)
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if key is not None and response.status_code == 200 and etag:
+            response_cache.get_response_cache().put(
+                key, response_cache.CachedResponse(etag, dict(response.headers), response.content)
+            )
+        return response
+
+    async def __send_with_retry(self, request: httpx.Request) -> tuple[httpx.Response, float]:
+        attempt = 0
+        while True:
+            await self._throttle.acquire_async()
+            try:
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    response = await self._client.send(request)
+                    elapsed = time.perf_counter() - start
+            except httpx.TransportError:
+                self._throttle.release()
+                if not self._retry_policy.should_retry(attempt, None):
+                    raise
+                status, headers = None, None
+            else:
+                self._throttle.release(response.status_code in THROTTLED_STATUS_CODES)
+                self._retry_policy.pause_if_exhausted(self._throttle, response.headers)
+                if not self._retry_policy.should_retry(attempt, response.status_code):
+                    return response, elapsed
+                status, headers = response.status_code, response.headers
+            wait_sec = self._retry_policy.before_retry(self._throttle, attempt, status, headers)
+            reason = "connection" if status is None else str(status)
+            metrics.registry.inc(metrics.API_RETRIES, endpoint=metrics.endpoint_of(str(request.url)), reason=reason)
+            await asyncio.sleep(wait_sec)
+            attempt += 1
+
+    async def list_all(self, path: str, params: Union[dict[str, Any], None] = None) -> list[dict[str, Any]]:
+        """Request all pages of list api and concat them in page order.
+
+        Parameters
+        ----------
+        path
+            path of list api like /groups/1/issues.
+        params
+            query parameters. None value is dropped.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            items of all pages.
+        """
+        query = {**(params or {}), "per_page": self.per_page}
+        first_page = await self.get(path, {**query, "page": 1})
+        items: list[dict[str, Any]] = first_page.json()
+        total_pages = first_page.headers.get("X-Total-Pages")
+        if total_pages:
+            pages = await asyncio.gather(
+                *[self.get(path, {**query, "page": page}) for page in range(2, int(total_pages) + 1)]
+            )
+            for page_response in pages:
+                items.extend(page_response.json())
+            return items
+        # gitlab omits X-Total-Pages if there are more than 10,000 items. follow next page one by one.
+        next_page = first_page.headers.get("X-Next-Page")
+        while next_page:
+            page_response = await self.get(path, {**query, "page": next_page})
+            items.extend(page_response.json())
+            next_page = page_response.headers.get("X-Next-Page")
+        return items
+
+    async def fetch_group(self) -> dict[str, Any]:
+        """Fetch group."""
+        return (await self.get(f"/groups/{self.group_id}", {"with_projects": False})).json()
+
+    async def fetch_group_issues(
+        self,
+        *,
+        state: Union[str, None] = None,
+        labels: Union[list[str], None] = None,
+        updated_after: Union[str, None] = None,
+    ) -> list[dict[str, Any]]:
+        """Fetch issues in group. See GitlabClient.fetch_group_issues."""
+        params = {"state": state, "labels": ",".join(labels) if labels else None, "updated_after": updated_after}
+        return await self.list_all(f"/groups/{self.group_id}/issues", params)
+
+    async def fetch_group_mergerequests(
+        self, *, state: Union[str, None] = None, updated_after: Union[str, None] = None
+    ) -> list[dict[str, Any]]:
+        """Fetch mergerequests in group. See GitlabClient.fetch_group_mergerequests."""
+        params = {"state": state, "updated_after": updated_after}
+        return await self.list_all(f"/groups/{self.group_id}/merge_requests", params)
+
+    async def fetch_group_projects(self) -> list[dict[str, Any]]:
+        """Fetch projects in this group and its subgroups."""
+        return await self.list_all(f"/groups/{self.group_id}/projects", {"include_subgroups": "true"})
+
+    async def fetch_single_project(self, project_id: int) -> dict[str, Any]:
+        """Fetch project."""
+        return (await self.get(f"/projects/{project_id}")).json()
+
+    async def fetch_projects_in_group(self, group_pj_ids: Union[list[int], None] = None) -> list[dict[str, Any]]:
+        """Fetch projects in this group. Projects not in group are fetched one by one."""
+        projects = await self.fetch_group_projects()
+        if group_pj_ids is None:
+            return projects
+        target_ids = set(group_pj_ids)
+        missing_ids = target_ids - {p["id"] for p in projects}
+        projects.extend(await asyncio.gather(*[self.fetch_single_project(i) for i in sorted(missing_ids)]))
+        return [p for p in projects if p["id"] in target_ids]
+
+    async def fetch_mergerequest_commits(self, project_id: int, mr_iid: int) -> list[dict[str, Any]]:
+        """Fetch commits of the merge request."""
+        return await self.list_all(f"/projects/{project_id}/merge_requests/{mr_iid}/commits")
+
+    async def fetch_mergerequest_changes(self, project_id: int, mr_iid: int) -> dict[str, Any]:
+        """Fetch merge request has changes of whole merge request."""
+        return (await self.get(f"/projects/{project_id}/merge_requests/{mr_iid}/changes")).json()
+
+    async def fetch_single_commit(self, project_id: int, sha: str) -> dict[str, Any]:
+        """Fetch commit has stats."""
+        return (await self.get(f"/projects/{project_id}/repository/commits/{quote(sha, safe='')}")).json()
+
+    async def fetch_commit_diff(self, project_id: int, sha: str) -> list[dict[str, Any]]:
+        """Fetch diffs of each file changed by the commit."""
+        return await self.list_all(f"/projects/{project_id}/repository/commits/{quote(sha, safe='')}/diff")
+
+
+class EventLoopThread:
+    """Run event loop on daemon thread so that sync code can wait coroutines."""
+
+    def __init__(self) -> None:
+        """Start event loop thread."""
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="gitlab-async-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run coroutine on the loop and wait the result."""
+        future: Future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result()
+
+
+event_loop_thread: Union[EventLoopThread, None] = None
+__event_loop_thread_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    """Create (or return pre exists) event loop thread shared in the process."""
+    global event_loop_thread
+    with __event_loop_thread_lock:
+        if event_loop_thread is None:
+            event_loop_thread = EventLoopThread()
+    return event_loop_thread
+
+
+async_clients: dict[tuple[str, str, int], AsyncGitlabClient] = {}
+__async_clients_lock = threading.Lock()
+
+
+def get_async_client(group_id: int, url: str, token: str) -> AsyncGitlabClient:
+    """Create (or return pre exists) async client on the shared event loop.
+
+    Parameters
+    ----------
+    group_id
+        id of target group.
+    url
+        url of gitlab.
+    token
+        access token.
+
+    Returns
+    -------
+    AsyncGitlabClient
+        client shared in the process.
+    """
+
+    async def create() -> AsyncGitlabClient:
+        # semaphore and http client must be created on the loop they run.
+        return AsyncGitlabClient(group_id, url=url, token=token)
+
+    with __async_clients_lock:
+        client = async_clients.get((url, token, group_id))
+        if client is None:
+            client = get_event_loop_thread().run(create())
+            async_clients[(url, token, group_id)] = client
+    return client
+
+
+@dataclass
+class AsyncBackedGitlabClient(GitlabClient):
+    """Sync facade of AsyncGitlabClient has the same methods as GitlabClient.
+
+    Results are converted to python-gitlab objects and errors to errors of python-gitlab and requests,
+    so that service layer can use them as before.
+    """
+
+    async_client: AsyncGitlabClient = field(init=False, metadata={"metadata": "async_gitlab_client"})
+
+    def __post_init__(self):
+        """Set group and shared async client."""
+        super().__post_init__()
+        self.async_client = get_async_client(self.group_id, self.gl.url, self.gl.private_token)
+
+    @staticmethod
+    def __run(coro: Coroutine[Any, Any, Any]) -> Any:
+        try:
+            return get_event_loop_thread().run(coro)
+        except httpx.HTTPStatusError as e:
+            raise GitlabHttpError(str(e), e.response.status_code, e.response.content) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def fetch_group_issues(
+        self,
+        *,
+        state: Union[str, None] = None,
+        labels: Union[list[str], None] = None,
+        updated_after: Union[str, None] = None,
+    ) -> list[GroupIssue]:
+        """Fetch issues in group. See GitlabClient.fetch_group_issues."""
+        issues = self.__run(
+            self.async_client.fetch_group_issues(state=state, labels=labels, updated_after=updated_after)
+        )
+        return [GroupIssue(self.group.issues, attrs) for attrs in issues]
+
+    def fetch_group_mergerequests(
+        self, *, state: Union[str, None] = None, updated_after: Union[str, None] = None
+    ) -> list[GroupMergeRequest]:
+        """Fetch mergerequests in group. See GitlabClient.fetch_group_mergerequests."""
+        mrs = self.__run(self.async_client.fetch_group_mergerequests(state=state, updated_after=updated_after))
+        return [GroupMergeRequest(self.group.mergerequests, attrs) for attrs in mrs]
+
+    def fetch_mergerrequests_in_group(
+        self, *, state: Union[str, None] = None, updated_after: Union[str, None] = None
+    ) -> list[LazyMergeRequest]:
+        """Fetch mergerequests in group bound to their projects. See GitlabClient.fetch_mergerrequests_in_group."""
+        group_mr = self.fetch_group_mergerequests(state=state, updated_after=updated_after)
+        id_pj_map = {pj.id: pj for pj in self.fetch_projects_in_group([mr.project_id for mr in group_mr])}
+        # MRs of projects deleted or not accessible are skipped.
+        return [LazyMergeRequest(mr, id_pj_map[mr.project_id]) for mr in group_mr if mr.project_id in id_pj_map]
+
+    def fetch_projects_in_group(self, group_pj_ids: Union[list[int], None] = None) -> list[Project]:
+        """Fetch projects in this group from the shared project index. See GitlabClient.fetch_projects_in_group."""
+        index = project_index.get_project_index(self.group_id, self.__list_projects_for_index)
+        if group_pj_ids is None:
+            return index.all()
+        return index.lookup(group_pj_ids, self.fetch_single_project)
+
+    def __list_projects_for_index(self) -> list[Project]:
+        projects = self.__run(self.async_client.fetch_group_projects())
+        return [Project(self.gl.projects, attrs) for attrs in projects]
+
+    def fetch_single_commit(self, project_id: int, short_id: str) -> Union[ProjectCommit, None]:
+        """Fetch commit has specific id. See GitlabClient.fetch_single_commit."""
+        index = project_index.get_project_index(self.group_id, self.__list_projects_for_index)
+        pj = index.projects.get(project_id)
+        if pj is None:
+            return None
+        return ProjectCommit(pj.commits, self.__run(self.async_client.fetch_single_commit(project_id, short_id)))
+
+    def fetch_mr_commits(self, mr: LazyMergeRequest) -> list[ProjectCommit]:
+        """Fetch commits of the merge request. See GitlabClient.fetch_mr_commits."""
+        commits = self.__run(self.async_client.fetch_mergerequest_commits(mr.project_id, mr.iid))
+        return [ProjectCommit(mr.project.commits, attrs) for attrs in commits]
+
+    def fetch_mr_changes(self, mr: LazyMergeRequest) -> dict[str, Any]:
+        """Fetch merge request has changes. See GitlabClient.fetch_mr_changes."""
+        return self.__run(self.async_client.fetch_mergerequest_changes(mr.project_id, mr.iid))
+
+    def fetch_project_commit(self, project: Project, short_id: str) -> ProjectCommit:
+        """Fetch commit has stats from the project. See GitlabClient.fetch_project_commit."""
+        return ProjectCommit(project.commits, self.__run(self.async_client.fetch_single_commit(project.id, short_id)))
+
+    def fetch_commit_diff(self, project: Project, commit: ProjectCommit) -> list[dict[str, Any]]:
+        """Fetch diffs of each file changed by the commit. See GitlabClient.fetch_commit_diff."""
+        return self.__run(self.async_client.fetch_commit_diff(project.id, commit.id))
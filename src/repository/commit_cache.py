@@ -0,0 +1,120 @@
+"""Store commit details on local disk. Commits never change once they exist."""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Union
+
+from common import GitlabConst, metrics
+
+commit_caches: dict[Path, "CommitCache"] = {}
+__commit_caches_lock = threading.Lock()
+
+
+class CommitCache:
+    """SQLite store of commit details keyed by (project_id, commit sha).
+
+    Least recently used commits are evicted when total size of stored details exceeds max_bytes.
+    """
+
+    file_name = "commits.sqlite3"
+
+    def __init__(self, cache_dir: Union[Path, str], max_bytes: int) -> None:
+        """Open (or create) the store.
+
+        Parameters
+        ----------
+        cache_dir
+            directory to put sqlite file.
+        max_bytes
+            max total size of stored details. if 0 or less, never store.
+        """
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir.joinpath(self.file_name)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS commits ("
+            "project_id INTEGER NOT NULL, sha TEXT NOT NULL, detail TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (project_id, sha))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS commits_accessed_at ON commits (accessed_at)")
+
+    def get(self, project_id: int, sha: str) -> Union[dict[str, Any], None]:
+        """Return stored detail of the commit, or None if never stored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT detail FROM commits WHERE project_id = ? AND sha = ?", (project_id, sha)
+            ).fetchone()
+            metrics.count_cache("commit", row is not None)
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE commits SET accessed_at = ? WHERE project_id = ? AND sha = ?", (time.time(), project_id, sha)
+            )
+        return json.loads(row[0])
+
+    def put(self, project_id: int, sha: str, detail: dict[str, Any]) -> None:
+        """Store detail of the commit and evict old commits if store is too large."""
+        if self.max_bytes <= 0:
+            return
+        payload = json.dumps(detail, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO commits (project_id, sha, detail, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (project_id, sha, payload, len(payload), time.time()),
+            )
+            self.__evict()
+
+    def total_bytes(self) -> int:
+        """Sum size of stored details."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM commits").fetchone()[0]
+
+    def __evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM commits").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # drop to 90% of max_bytes so that eviction does not run on every put.
+        over_bytes = total - int(self.max_bytes * 0.9)
+        evict_rows = []
+        for project_id, sha, size in self._conn.execute(
+            "SELECT project_id, sha, size FROM commits ORDER BY accessed_at"
+        ).fetchall():
+            if over_bytes <= 0:
+                break
+            evict_rows.append((project_id, sha))
+            over_bytes -= size
+        self._conn.executemany("DELETE FROM commits WHERE project_id = ? AND sha = ?", evict_rows)
+
+
+def get_commit_cache(cache_dir: Union[Path, str, None] = None, max_mb: Union[float, None] = None) -> CommitCache:
+    """Create (or return pre exists) commit cache.
+
+    Parameters
+    ----------
+    cache_dir
+        directory to put sqlite file, by default GitlabConst.CACHE_DIR
+    max_mb
+        max size of the store in MB used when create new cache, by default GitlabConst.COMMIT_CACHE_MAX_MB
+
+    Returns
+    -------
+    CommitCache
+        cache of the directory.
+    """
+    if cache_dir is None:
+        cache_dir = GitlabConst.CACHE_DIR
+    if max_mb is None:
+        max_mb = GitlabConst.COMMIT_CACHE_MAX_MB
+    cache_dir = Path(cache_dir)
+    with __commit_caches_lock:
+        cache = commit_caches.get(cache_dir)
+        if cache is None:
+            cache = CommitCache(cache_dir, int(max_mb * 1024 * 1024))
+            commit_caches[cache_dir] = cache
+    return cache
@@ -0,0 +1,116 @@
+"""Share single pooled gitlab connection and group objects in the process."""
+import threading
+from typing import Any, Union, cast
+
+import requests
+from gitlab.client import Gitlab
+from gitlab.v4.objects.groups import Group
+
+from common import GitlabConst, metrics
+from repository.response_cache import CachingAdapter
+
+
+class AdapterRetriedGitlab(Gitlab):
+    """Gitlab client leaves retries to the adapter of its session.
+
+    python-gitlab retries 429 by itself. Stacked on retries of ThrottledAdapter, a single page would be
+    requested (RETRY_COUNT + 1) * 11 times, so retries of python-gitlab are disabled.
+    """
+
+    def http_request(self, *args: Any, **kwargs: Any) -> requests.Response:
+        """Request once without retries of python-gitlab."""
+        kwargs.update(obey_rate_limit=False, retry_transient_errors=False, max_retries=0)
+        return super().http_request(*args, **kwargs)
+
+
+gitlab_clients: dict[tuple[str, str], Gitlab] = {}
+groups: dict[tuple[str, int], Group] = {}
+__lock = threading.Lock()
+
+
+def create_session(pool_size: int = GitlabConst.POOL_SIZE) -> requests.Session:
+    """Create keep-alive session can hold pool_size connections per host.
+
+    Requests wait for rate limit of the host, and idempotent requests failed temporarily are retried.
+    Responses of list apis are cached and revalidated by ETag.
+
+    Parameters
+    ----------
+    pool_size
+        max connections kept per host, by default GitlabConst.POOL_SIZE
+
+    Returns
+    -------
+    requests.Session
+        created session. every response is counted to metrics and open request accounts.
+    """
+    session = requests.Session()
+    adapter = CachingAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.hooks["response"].append(metrics.record_response)
+    return session
+
+
+def get_gitlab(url: Union[str, None] = None, token: Union[str, None] = None) -> Gitlab:
+    """Create (or return pre exists) gitlab client shared in the process.
+
+    Parameters
+    ----------
+    url
+        url of gitlab, by default GitlabConst.URL
+    token
+        access token, by default GitlabConst.TOKEN
+
+    Returns
+    -------
+    Gitlab
+        client uses pooled session.
+    """
+    if url is None:
+        url = GitlabConst.URL
+    if token is None:
+        token = GitlabConst.TOKEN
+    with __lock:
+        gl = gitlab_clients.get((url, token))
+        if gl is None:
+            gl = AdapterRetriedGitlab(
+                url, private_token=token, timeout=GitlabConst.TIMEOUT_SEC, session=create_session()
+            )
+            gitlab_clients[(url, token)] = gl
+    return gl
+
+
+def get_group(gl: Gitlab, group_id: int) -> Union[Group, None]:
+    """Fetch (or return pre fetched) group.
+
+    Parameters
+    ----------
+    gl
+        gitlab client.
+    group_id
+        id of group.
+
+    Returns
+    -------
+    Union[Group, None]
+        fetched group. None is not memoized so that next call fetches again.
+    """
+    key = (gl.url, group_id)
+    with __lock:
+        group = groups.get(key)
+    if group is None:
+        group = cast(Group, gl.groups.get(group_id))
+        if group is not None:
+            with __lock:
+                group = groups.setdefault(key, group)
+    return group
+
+
+def clear_connections() -> None:
+    """Close shared sessions and drop memoized groups."""
+    with __lock:
+        for gl in gitlab_clients.values():
+            gl.session.close()
+        gitlab_clients.clear()
+        groups.clear()
@@ -0,0 +1,30 @@
+"""Create gitlab client of configured backend."""
+from common import GitlabConst
+from repository.mapper import GitlabClient
+
+BACKEND_SYNC = "sync"
+BACKEND_ASYNC = "async"
+
+
+def create_client(group_id: int, backend: str = GitlabConst.CLIENT_BACKEND) -> GitlabClient:
+    """Create gitlab client for the group.
+
+    Parameters
+    ----------
+    group_id
+        id of target group.
+    backend
+        BACKEND_SYNC uses python-gitlab. BACKEND_ASYNC uses async http client through sync facade,
+        by default GitlabConst.CLIENT_BACKEND
+
+    Returns
+    -------
+    GitlabClient
+        client has methods of GitlabClient.
+    """
+    if backend == BACKEND_ASYNC:
+        # httpx is required only for async backend.
+        from repository.async_mapper import AsyncBackedGitlabClient
+
+        return AsyncBackedGitlabClient(group_id)
+    return GitlabClient(group_id)
@@ -0,0 +1,138 @@
+"""Fetch gitlab resources concurrently with bounded workers and rate limiting."""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Union
+from urllib.parse import urlparse
+
+from common import GitlabConst
+
+host_limiters: dict[str, "RateLimiter"] = {}
+__host_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket to limit requests per second for a single host."""
+
+    def __init__(self, rate: float, burst: Union[int, None] = None) -> None:
+        """Set rate and initial tokens.
+
+        Parameters
+        ----------
+        rate
+            requests allowed per second. if 0 or less, never wait.
+        burst
+            max tokens stored while idle, by default max(1, rate)
+        """
+        self.rate = rate
+        self.capacity = burst if burst else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token. Block until a token is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_sec = (1 - self._tokens) / self.rate
+            time.sleep(wait_sec)
+
+
+def get_host_limiter(url: str = GitlabConst.URL, rate: float = GitlabConst.RATE_LIMIT_PER_SEC) -> RateLimiter:
+    """Create (or return pre exists) rate limiter shared by all requests to the host of url.
+
+    Parameters
+    ----------
+    url
+        url of gitlab, by default GitlabConst.URL
+    rate
+        requests per second used when create new limiter, by default GitlabConst.RATE_LIMIT_PER_SEC
+
+    Returns
+    -------
+    RateLimiter
+        limiter of the host.
+    """
+    host = urlparse(url).netloc or url
+    with __host_limiters_lock:
+        limiter = host_limiters.get(host)
+        if limiter is None:
+            limiter = RateLimiter(rate)
+            host_limiters[host] = limiter
+    return limiter
+
+
+@dataclass
+class FetchEngine:
+    """Run fetch functions on bounded worker pool.
+
+    Functions passed to map should call throttle before each api request
+    so that all workers share rate limit of the host.
+    """
+
+    max_workers: int = GitlabConst.MAX_WORKERS
+    limiter: RateLimiter = field(default_factory=get_host_limiter)
+
+    def throttle(self) -> None:
+        """Wait until next request to the host is allowed."""
+        self.limiter.acquire()
+
+    def map(
+        self,
+        func: Callable[[Any], Any],
+        items: Iterable[Any],
+        *,
+        progress: Union[Callable[..., Any], None] = None,
+        desc: Union[str, None] = None,
+        tolerate: tuple[type[Exception], ...] = (),
+    ) -> list[Any]:
+        """Apply func to each item concurrently.
+
+        Parameters
+        ----------
+        func
+            fetch function called with single item.
+        items
+            arguments of func.
+        progress
+            progress bar class like tqdm or stqdm, by default None
+        desc
+            description of progress bar, by default None
+        tolerate
+            exceptions of these types are returned in place of results instead of raised, by default ()
+
+        Returns
+        -------
+        list[Any]
+            results in the same order as items.
+        """
+        targets = list(items)
+        results: list[Any] = [None] * len(targets)
+        if not targets:
+            return results
+        bar = progress(total=len(targets), desc=desc) if progress else None
+        executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        try:
+            futures: dict[Future, int] = {executor.submit(func, item): i for i, item in enumerate(targets)}
+            # update progress bar on caller thread. stqdm can not be updated from worker threads.
+            for future in as_completed(futures):
+                error = future.exception()
+                if error is not None and not isinstance(error, tolerate):
+                    raise error
+                results[futures[future]] = error if error is not None else future.result()
+                if bar is not None:
+                    bar.update(1)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if bar is not None:
+                bar.close()
+        return results
@@ -0,0 +1,64 @@
+"""Provide merge request made from group listing without fetching each merge request."""
+import threading
+from typing import Any, Union
+
+from gitlab.base import RESTObjectList
+from gitlab.v4.objects.merge_requests import GroupMergeRequest, ProjectMergeRequest
+from gitlab.v4.objects.projects import Project
+
+
+class LazyMergeRequest:
+    """Merge request has attributes of group listing.
+
+    Full merge request is fetched only when an attribute missing in the group listing is accessed.
+    commits() and changes() request project-scoped endpoints directly.
+    """
+
+    def __init__(self, group_mr: GroupMergeRequest, project: Project) -> None:
+        """Keep attributes of group listing and make project-scoped merge request without request.
+
+        Parameters
+        ----------
+        group_mr
+            merge request from group listing.
+        project
+            project of the merge request.
+        """
+        self._attrs: dict[str, Any] = group_mr.attributes
+        self._project = project
+        self._project_mr: ProjectMergeRequest = project.mergerequests.get(self._attrs["iid"], lazy=True)
+        self._full_mr: Union[ProjectMergeRequest, None] = None
+        self._lock = threading.Lock()
+
+    @property
+    def attributes(self) -> dict[str, Any]:
+        """Return attributes of group listing."""
+        return self._attrs
+
+    @property
+    def project(self) -> Project:
+        """Return project of the merge request."""
+        return self._project
+
+    def commits(self, **kwargs: Any) -> RESTObjectList:
+        """List commits of the merge request. See ProjectMergeRequest.commits."""
+        return self._project_mr.commits(**kwargs)
+
+    def changes(self, **kwargs: Any) -> dict[str, Any]:
+        """Fetch changes of the merge request. See ProjectMergeRequest.changes."""
+        return self._project_mr.changes(**kwargs)
+
+    def fetch(self) -> ProjectMergeRequest:
+        """Fetch (or return pre fetched) full merge request."""
+        with self._lock:
+            if self._full_mr is None:
+                self._full_mr = self._project.mergerequests.get(self._attrs["iid"])
+        return self._full_mr
+
+    def __getattr__(self, name: str) -> Any:
+        """Return attribute of group listing. If missing, fetch full merge request."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._attrs:
+            return self._attrs[name]
+        return getattr(self.fetch(), name)
@@ -1,15 +1,18 @@
 """Fetch gitlab data by rest api."""
 from dataclasses import dataclass, field
-from typing import Union
+from typing import Any, Union, cast
 
 from gitlab.client import Gitlab
 from gitlab.v4.objects.commits import ProjectCommit
 from gitlab.v4.objects.groups import Group
 from gitlab.v4.objects.issues import GroupIssue
-from gitlab.v4.objects.merge_requests import GroupMergeRequest, MergeRequest
+from gitlab.v4.objects.merge_requests import GroupMergeRequest
 from gitlab.v4.objects.projects import GroupProject, Project
 
-from common import GitlabConst, errors
+from common import errors, metrics
+from repository import connection, project_index
+from repository.lazy_mergerequest import LazyMergeRequest
+from repository.pagination import list_all_pages
 
 
 @dataclass
@@ -21,14 +24,19 @@ class GitlabClient:
     group: Group = field(init=False, metadata={"metadata": "gitlab_group"})
 
     def __post_init__(self):
-        """Set group_id and fetch group."""
-        self.gl = Gitlab(GitlabConst.URL, private_token=GitlabConst.TOKEN)
-        self.group = self.gl.groups.get(self.group_id)
+        """Set shared gitlab client and fetch group (memoized in the process)."""
+        self.gl = connection.get_gitlab()
+        self.group = connection.get_group(self.gl, self.group_id)
         if self.group is None:
             raise errors.ResourceNotFoundError("group", {"group_id": self.group_id})
 
+    @metrics.timed("repository")
     def fetch_group_issues(
-        self, *, state: Union[str, None] = None, labels: Union[list[str], None] = None
+        self,
+        *,
+        state: Union[str, None] = None,
+        labels: Union[list[str], None] = None,
+        updated_after: Union[str, None] = None,
     ) -> list[GroupIssue]:
         """Fetch issues in group.
 
@@ -38,6 +46,8 @@ class GitlabClient:
             issue state. if you need only opened issue, pass 'opened', by default None
         labels :
             if you need issues has specific labels, pass label list, by default None
+        updated_after :
+            if you need only issues updated on or after specific datetime, pass ISO 8601 string, by default None
 
         Returns
         -------
@@ -45,59 +55,89 @@ class GitlabClient:
             list of issues.
         """
         if labels:
-            return self.group.issues.list(all=True, state=state, labels=labels)
+            return list_all_pages(self.group.issues, state=state, labels=labels, updated_after=updated_after)
         else:
-            return self.group.issues.list(all=True, state=state)
+            return list_all_pages(self.group.issues, state=state, updated_after=updated_after)
 
-    def fetch_group_mergerequests(self, *, state: Union[str, None] = None) -> list[GroupMergeRequest]:
+    @metrics.timed("repository")
+    def fetch_group_mergerequests(
+        self, *, state: Union[str, None] = None, updated_after: Union[str, None] = None
+    ) -> list[GroupMergeRequest]:
         """Fetch mergerequests in group.
 
         Parameters
         ----------
         state :
             issue state. if you need only opened issue, pass 'opened', by default None
+        updated_after :
+            if you need only MRs updated on or after specific datetime, pass ISO 8601 string, by default None
 
         Returns
         -------
         list[GroupMergeRequest]
             list of mergerequests.
         """
-        return self.group.mergerequests.list(all=True, state=state)
+        return list_all_pages(self.group.mergerequests, state=state, updated_after=updated_after)
 
-    def fetch_mergerrequests_in_group(self, *, state: Union[str, None] = None) -> list[MergeRequest]:
-        """Fetch mergerequests in group from project."""
-        group_mr = self.fetch_group_mergerequests(state=state)
+    def fetch_mergerrequests_in_group(
+        self, *, state: Union[str, None] = None, updated_after: Union[str, None] = None
+    ) -> list[LazyMergeRequest]:
+        """Fetch mergerequests in group bound to their projects.
+
+        Each mergerequest is not fetched again. It is fetched only when field missing in group listing is accessed.
+        """
+        group_mr = self.fetch_group_mergerequests(state=state, updated_after=updated_after)
         pj_in_group = self.fetch_projects_in_group([mr.project_id for mr in group_mr])
         id_pj_map = {pj.id: pj for pj in pj_in_group}
-        return [id_pj_map[mr.project_id].mergerequests.get(mr.iid) for mr in group_mr]
+        # MRs of projects deleted or not accessible are skipped.
+        return [LazyMergeRequest(mr, id_pj_map[mr.project_id]) for mr in group_mr if mr.project_id in id_pj_map]
 
     def fetch_single_project(self, project_id: int) -> Project:
-        """Fetch project."""
+        """Fetch project. Server errors are retried by ThrottledAdapter of the session."""
         return self.gl.projects.get(project_id)
 
     def fetch_group_projects(self) -> list[GroupProject]:
         """Fetch projects in this group."""
-        return self.group.projects.list(all=True)
+        return list_all_pages(self.group.projects)
 
+    @metrics.timed("repository")
     def fetch_projects_in_group(self, group_pj_ids: Union[list[int], None] = None) -> list[Project]:
-        """Fetch projects in this group from project list."""
+        """Fetch projects in this group and its subgroups from the shared project index.
+
+        Projects not in the index (e.g. shared from other groups) are fetched one by one.
+        """
+        index = project_index.get_project_index(self.group_id, self.__list_projects_for_index)
         if group_pj_ids is None:
-            group_pj_ids = [p.id for p in self.fetch_group_projects()]
-        group_pj_ids = list(set(group_pj_ids))
-        # fetch_single_project sometimes failed to 500 error. so fetch all pj and filter it
-        pj_list = self.gl.projects.list(all=True)
-        return [p for p in pj_list if p.id in group_pj_ids]
-
-    def fetch_commits_in_group_projects(self) -> dict[int, list[ProjectCommit]]:
-        """Fetch commits in each projects. May be very heavy."""
-        pj_commits = dict()
-        for project in self.fetch_projects_in_group():
-            pj_commits[project.id] = project.commits.list(all=True)
-        return pj_commits
+            return index.all()
+        return index.lookup(group_pj_ids, self.fetch_single_project)
+
+    def __list_projects_for_index(self) -> list[Project]:
+        # GroupProject has no managers like commits, mergerequests. so make Project from its attributes.
+        # this does not request each project. fetch_single_project sometimes failed to 500 error.
+        group_projects = list_all_pages(self.group.projects, include_subgroups=True)
+        return [Project(self.gl.projects, gp.attributes) for gp in group_projects]
+
+    def fetch_mr_commits(self, mr: LazyMergeRequest) -> list[ProjectCommit]:
+        """Fetch commits of the merge request. Commits have no stats."""
+        return cast(list[ProjectCommit], mr.commits(all=True))
+
+    def fetch_mr_changes(self, mr: LazyMergeRequest) -> dict[str, Any]:
+        """Fetch merge request has changes of whole merge request in "changes"."""
+        return mr.changes()
+
+    def fetch_project_commit(self, project: Project, short_id: str) -> ProjectCommit:
+        """Fetch commit has stats from the project."""
+        return project.commits.get(short_id)
+
+    def fetch_commit_diff(self, project: Project, commit: ProjectCommit) -> list[dict[str, Any]]:
+        """Fetch diffs of each file changed by the commit."""
+        return commit.diff()
 
+    @metrics.timed("repository")
     def fetch_single_commit(self, project_id: int, short_id: str) -> Union[ProjectCommit, None]:
         """Fetch commit has specific id."""
-        pj = next((p for p in self.fetch_group_projects() if p.id == project_id), None)
+        index = project_index.get_project_index(self.group_id, self.__list_projects_for_index)
+        pj = index.projects.get(project_id)
         if pj:
             return pj.commits.get(short_id)
         else:
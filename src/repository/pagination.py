@@ -0,0 +1,73 @@
+"""Fetch all pages of gitlab list api concurrently."""
+import itertools
+from typing import Any, Protocol, Union
+
+from common import GitlabConst
+from repository.fetch_engine import FetchEngine
+
+
+class ListManager(Protocol):
+    """Manager of python-gitlab has list api like group.issues."""
+
+    def list(self, **kwargs: Any) -> Any:
+        """Fetch items. Returns lazy RESTObjectList if as_list=False is given, otherwise list of items."""
+        ...
+
+
+def list_all_pages(
+    manager: ListManager,
+    *,
+    engine: Union[FetchEngine, None] = None,
+    per_page: int = GitlabConst.PER_PAGE,
+    **kwargs: Any,
+) -> list[Any]:
+    """Fetch all items of list api. Same as manager.list(all=True, **kwargs) but pages are fetched concurrently.
+
+    Total pages are read from the first page. Then pages 2..N are requested on engine and reassembled in page order.
+    Each page is retried individually by ThrottledAdapter of the session.
+
+    Parameters
+    ----------
+    manager
+        manager of python-gitlab like group.issues.
+    engine
+        engine to fetch pages, by default FetchEngine()
+    per_page
+        items per page, by default GitlabConst.PER_PAGE
+    kwargs
+        filters of list api like state.
+
+    Returns
+    -------
+    list[Any]
+        all items. type of items is RESTObject of the manager like GroupIssue.
+    """
+    if engine is None:
+        engine = FetchEngine()
+    engine.throttle()
+    first_page = manager.list(as_list=False, per_page=per_page, **kwargs)
+    try:
+        total_pages = first_page.total_pages
+    except (TypeError, ValueError):
+        # gitlab omits X-Total-Pages if there are more than 10,000 items. follow next page one by one.
+        return list(first_page)
+    first_items = list(itertools.islice(first_page, first_page.per_page))
+    if total_pages <= 1:
+        return first_items
+
+    def fetch_page(page: int) -> list[Any]:
+        engine.throttle()
+        return manager.list(page=page, per_page=per_page, **kwargs)
+
+    pages = engine.map(fetch_page, range(2, total_pages + 1))
+    # items created while fetching shift pages, so same item may appear in two pages.
+    items: list[Any] = []
+    seen_ids = set()
+    for item in itertools.chain(first_items, *pages):
+        item_id = item.get_id()
+        if item_id is not None:
+            if item_id in seen_ids:
+                continue
+            seen_ids.add(item_id)
+        items.append(item)
+    return items
@@ -0,0 +1,105 @@
+"""Index projects of group so that lookups never scan all projects of the instance."""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Union
+
+from gitlab.exceptions import GitlabGetError
+from gitlab.v4.objects.projects import Project
+
+from common import GitlabConst, metrics
+
+project_indexes: dict[int, "ProjectIndex"] = {}
+__project_indexes_lock = threading.Lock()
+# index of each group is built under its own lock, so slow listing of a group never blocks other groups.
+__build_locks: dict[int, threading.Lock] = {}
+
+
+@dataclass
+class ProjectIndex:
+    """Projects of single group (including subgroups) keyed by project id."""
+
+    group_id: int
+    projects: dict[int, Project]
+    built_at: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def is_expired(self, ttl_sec: float) -> bool:
+        """Check the index is older than ttl_sec."""
+        return time.monotonic() - self.built_at > ttl_sec
+
+    def all(self) -> list[Project]:  # noqa: A003
+        """Return all projects in the index."""
+        return list(self.projects.values())
+
+    def lookup(self, project_ids: Iterable[int], fetch_missing: Callable[[int], Project]) -> list[Project]:
+        """Return projects have given ids.
+
+        Parameters
+        ----------
+        project_ids
+            ids of projects.
+        fetch_missing
+            function to fetch single project not in the index. fetched project is added to the index.
+
+        Returns
+        -------
+        list[Project]
+            projects ordered as the index. projects deleted or not accessible by the token are skipped.
+        """
+        target_ids = set(project_ids)
+        with self._lock:
+            missing_ids = target_ids - self.projects.keys()
+        for missing_id in sorted(missing_ids):
+            try:
+                project = fetch_missing(missing_id)
+            except GitlabGetError as e:
+                if e.response_code != 404:
+                    raise
+                continue
+            with self._lock:
+                self.projects[project.id] = project
+        return [p for p in self.all() if p.id in target_ids]
+
+
+def get_project_index(
+    group_id: int, build: Callable[[], list[Project]], ttl_sec: Union[float, None] = None
+) -> ProjectIndex:
+    """Create (or return pre exists and not expired) project index of the group.
+
+    Parameters
+    ----------
+    group_id
+        id of group.
+    build
+        function to list projects of the group. called only when index does not exist or expired.
+    ttl_sec
+        lifetime of the index, by default GitlabConst.PROJECT_INDEX_TTL_SEC
+
+    Returns
+    -------
+    ProjectIndex
+        index of the group shared by all callers.
+    """
+    if ttl_sec is None:
+        ttl_sec = GitlabConst.PROJECT_INDEX_TTL_SEC
+    with __project_indexes_lock:
+        build_lock = __build_locks.setdefault(group_id, threading.Lock())
+    with build_lock:
+        index = project_indexes.get(group_id)
+        is_hit = index is not None and not index.is_expired(ttl_sec)
+        if not is_hit:
+            index = ProjectIndex(group_id, {p.id: p for p in build()})
+            with __project_indexes_lock:
+                project_indexes[group_id] = index
+    metrics.count_cache("project_index", is_hit)
+    return index
+
+
+def clear_project_index(group_id: Union[int, None] = None) -> None:
+    """Drop index of the group. If group_id is None, drop all indexes."""
+    with __project_indexes_lock:
+        if group_id is None:
+            project_indexes.clear()
+        else:
+            project_indexes.pop(group_id, None)
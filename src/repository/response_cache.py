@@ -0,0 +1,172 @@
+"""Keep bodies of gitlab list responses with their ETag and revalidate them by conditional requests.
+
+Gitlab answers 304 Not Modified without body when If-None-Match matches ETag of the resource,
+so unchanged pages are served from memory instead of downloaded again.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Mapping, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from common import GitlabConst, metrics
+from repository.throttle import ThrottledAdapter
+
+CACHE_NAME = "http_etag"
+# list endpoints re-downloaded on every refresh. details of commits are kept in CommitCache instead.
+CACHED_ENDPOINTS = (
+    "/groups/:id/issues",
+    "/groups/:id/merge_requests",
+    "/groups/:id/projects",
+    "/projects",
+    "/projects/:id/merge_requests",
+)
+NOT_MODIFIED_ATTR = "not_modified"
+# stored body is already decoded, and headers of 304 describe its empty body. both are dropped on rebuild.
+BODY_HEADERS = ("content-length", "content-encoding", "transfer-encoding")
+
+CacheKey = tuple[str, str]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Body of response and headers to rebuild it when gitlab answers 304."""
+
+    etag: str
+    headers: dict[str, str]
+    body: bytes
+
+
+class ResponseCache:
+    """In-memory store of responses keyed by token and url.
+
+    Least recently used responses are evicted when total size of bodies exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        """Create empty store.
+
+        Parameters
+        ----------
+        max_bytes
+            max total size of stored bodies. if 0 or less, never store.
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: OrderedDict[CacheKey, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Union[CachedResponse, None]:
+        """Return stored response, or None if never stored or evicted."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+            return cached
+
+    def put(self, key: CacheKey, cached: CachedResponse) -> None:
+        """Store response and evict old responses if store is too large."""
+        if len(cached.body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous.body)
+            self._entries[key] = cached
+            self.total_bytes += len(cached.body)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted.body)
+
+    def clear(self) -> None:
+        """Drop all responses."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        """Count stored responses."""
+        with self._lock:
+            return len(self._entries)
+
+
+response_cache: Union[ResponseCache, None] = None
+__response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Create (or return pre exists) response cache shared in the process."""
+    global response_cache
+    with __response_cache_lock:
+        if response_cache is None:
+            response_cache = ResponseCache(int(GitlabConst.RESPONSE_CACHE_MAX_MB * 1024 * 1024))
+        return response_cache
+
+
+def revalidated_headers(cached: CachedResponse, not_modified_headers: Mapping[str, str]) -> CaseInsensitiveDict:
+    """Return headers of stored response updated by headers of 304 like new ETag and rate limit."""
+    headers = CaseInsensitiveDict({k: v for k, v in cached.headers.items() if k.lower() not in BODY_HEADERS})
+    headers.update({k: v for k, v in not_modified_headers.items() if k.lower() not in BODY_HEADERS})
+    return headers
+
+
+def cache_key(
+    method: Union[str, None], url: Union[str, None], headers: Mapping[str, Union[str, bytes]]
+) -> Union[CacheKey, None]:
+    """Return key of request whose response can be cached, or None if it can not.
+
+    Parameters
+    ----------
+    method
+        http method. only GET is cached.
+    url
+        requested url with query.
+    headers
+        request headers. responses are kept apart by access token, so users never see others' responses.
+        token may be bytes as requests allows it.
+
+    Returns
+    -------
+    Union[CacheKey, None]
+        pair of hashed token and url.
+    """
+    if method != "GET" or not url or metrics.endpoint_of(url) not in CACHED_ENDPOINTS:
+        return None
+    token = headers.get("PRIVATE-TOKEN") or headers.get("Authorization") or b""
+    if isinstance(token, str):
+        token = token.encode("utf-8")
+    return hashlib.sha256(token).hexdigest(), url
+
+
+class CachingAdapter(ThrottledAdapter):
+    """ThrottledAdapter sends list requests with If-None-Match and serves 304 from ResponseCache.
+
+    Responses served from the cache have status 200, the stored body and NOT_MODIFIED_ATTR set to True.
+    """
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        """Send request conditionally if its response is stored, otherwise store response has ETag."""
+        key = cache_key(request.method, request.url, request.headers)
+        if key is None or kwargs.get("stream"):
+            return super().send(request, *args, **kwargs)
+        cache = get_response_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            request.headers["If-None-Match"] = cached.etag
+        response = super().send(request, *args, **kwargs)
+        if cached is not None and response.status_code == 304:
+            metrics.count_cache(CACHE_NAME, True)
+            response.status_code = 200
+            response.reason = "OK"
+            response.headers = revalidated_headers(cached, response.headers)
+            response._content = cached.body
+            setattr(response, NOT_MODIFIED_ATTR, True)
+            return response
+        metrics.count_cache(CACHE_NAME, False)
+        etag = response.headers.get("ETag")
+        if response.status_code == 200 and etag:
+            cache.put(key, CachedResponse(etag, dict(response.headers), response.content))
+        return response
@@ -0,0 +1,14 @@
+"""Classify errors of gitlab requests. Requests are retried by ThrottledAdapter of the session."""
+import requests
+from gitlab.exceptions import GitlabError
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# errors of requesting gitlab. single item failed with them can be skipped and fetched again later.
+FETCH_ERRORS = (GitlabError, requests.exceptions.RequestException)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check error is temporary. Server errors, rate limit and connection errors are temporary."""
+    if isinstance(error, GitlabError):
+        return error.response_code in RETRY_STATUS_CODES
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
@@ -0,0 +1,178 @@
+"""Store datasets of each group as columnar snapshots on local disk."""
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common import GitlabConst
+from common.Logger import get_logger
+
+logger = get_logger()
+
+snapshot_stores: dict[Path, "SnapshotStore"] = {}
+__snapshot_stores_lock = threading.Lock()
+
+# values of these cols are few, so they are stored as dictionary encoded and loaded as category.
+CATEGORY_COLS = ("state", "target_branch", "source_branch", "merge_status", "author-username", "assignee-username")
+JSON_COLS_KEY = b"gitlab_dashboard.json_cols"
+
+
+class SnapshotStore:
+    """Parquet files of datasets keyed by (group_id, resource).
+
+    Snapshot is written to temporary file and renamed, so readers always see whole old or whole new snapshot.
+    """
+
+    dir_name = "snapshots"
+
+    def __init__(self, cache_dir: Union[Path, str]) -> None:
+        """Create directory of snapshots.
+
+        Parameters
+        ----------
+        cache_dir
+            directory to put snapshot directory.
+        """
+        self.dir = Path(cache_dir).joinpath(self.dir_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, group_id: int, resource: str) -> Path:
+        """Return path of the snapshot."""
+        return self.dir.joinpath(f"{resource}-{group_id}.parquet")
+
+    def saved_at(self, group_id: int, resource: str) -> Union[float, None]:
+        """Return unix time the snapshot was saved, or None if never saved."""
+        try:
+            return self.path(group_id, resource).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def age(self, group_id: int, resource: str) -> Union[float, None]:
+        """Return seconds since the snapshot was saved, or None if never saved."""
+        saved_at = self.saved_at(group_id, resource)
+        return None if saved_at is None else time.time() - saved_at
+
+    def load(self, group_id: int, resource: str) -> Union[pd.DataFrame, None]:
+        """Load the snapshot memory-mapped.
+
+        Parameters
+        ----------
+        group_id
+            id of group.
+        resource
+            resource type like issues, mergerequests.
+
+        Returns
+        -------
+        Union[pd.DataFrame, None]
+            saved dataset, or None if never saved.
+        """
+        try:
+            table = pq.read_table(self.path(group_id, resource), memory_map=True)
+        except FileNotFoundError:
+            return None
+        df = table.to_pandas()
+        for col in json.loads((table.schema.metadata or {}).get(JSON_COLS_KEY, b"[]")):
+            df[col] = [json.loads(v) if v is not None else None for v in df[col]]
+        return df
+
+    def save(self, group_id: int, resource: str, df: pd.DataFrame) -> bool:
+        """Replace the snapshot atomically.
+
+        Parameters
+        ----------
+        group_id
+            id of group.
+        resource
+            resource type like issues, mergerequests.
+        df
+            dataset. cols end with _at are stored as datetime.
+            cols of list or dict like labels and diff are stored as json.
+
+        Returns
+        -------
+        bool
+            True if saved. dataset can not be converted is not saved and logged.
+        """
+        try:
+            table = to_arrow_table(df)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.warning(f"Skip snapshot of {resource} in group {group_id}: {e}")
+            return False
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, prefix=f".{resource}-{group_id}-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pq.write_table(table, f)
+            os.replace(tmp_path, self.path(group_id, resource))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return True
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Convert dataset to arrow table has typed datetime and dictionary cols.
+
+    Parameters
+    ----------
+    df
+        dataset made by service layer.
+
+    Returns
+    -------
+    pa.Table
+        table has names of json cols in schema metadata.
+    """
+    typed_df = df.copy()
+    json_cols = []
+    for col in typed_df.columns:
+        if col.endswith("_at"):
+            typed_df[col] = pd.to_datetime(typed_df[col], utc=True)
+        elif col in CATEGORY_COLS:
+            typed_df[col] = typed_df[col].astype("category")
+        elif typed_df[col].dtype == object and typed_df[col].map(__is_container).any():
+            typed_df[col] = typed_df[col].map(__to_json)
+            json_cols.append(col)
+    table = pa.Table.from_pandas(typed_df, preserve_index=False)
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), JSON_COLS_KEY: json.dumps(json_cols)})
+
+
+def __is_container(value: Any) -> bool:
+    return isinstance(value, (list, dict))
+
+
+def __to_json(value: Any) -> Union[str, None]:
+    if value is None or (not __is_container(value) and pd.isna(value)):
+        return None
+    return json.dumps(value, default=str)
+
+
+def get_snapshot_store(cache_dir: Union[Path, str, None] = None) -> SnapshotStore:
+    """Create (or return pre exists) snapshot store.
+
+    Parameters
+    ----------
+    cache_dir
+        directory to put snapshot directory, by default GitlabConst.CACHE_DIR
+
+    Returns
+    -------
+    SnapshotStore
+        store of the directory.
+    """
+    if cache_dir is None:
+        cache_dir = GitlabConst.CACHE_DIR
+    cache_dir = Path(cache_dir)
+    with __snapshot_stores_lock:
+        store = snapshot_stores.get(cache_dir)
+        if store is None:
+            store = SnapshotStore(cache_dir)
+            snapshot_stores[cache_dir] = store
+    return store
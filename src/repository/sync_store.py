@@ -0,0 +1,113 @@
+"""Store synced group resources and high-water marks on local disk."""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Union
+
+from common import GitlabConst
+
+sync_stores: dict[Path, "SyncStore"] = {}
+__sync_stores_lock = threading.Lock()
+
+
+class SyncStore:
+    """SQLite store of rows keyed by (group_id, resource, id) and the latest updated_at synced."""
+
+    file_name = "sync.sqlite3"
+
+    def __init__(self, cache_dir: Union[Path, str]) -> None:
+        """Open (or create) the store.
+
+        Parameters
+        ----------
+        cache_dir
+            directory to put sqlite file.
+        """
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir.joinpath(self.file_name)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS marks ("
+                "group_id INTEGER NOT NULL, resource TEXT NOT NULL, high_water_mark TEXT NOT NULL, "
+                "PRIMARY KEY (group_id, resource))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                "group_id INTEGER NOT NULL, resource TEXT NOT NULL, item_id INTEGER NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (group_id, resource, item_id))"
+            )
+
+    def get_mark(self, group_id: int, resource: str) -> Union[str, None]:
+        """Return updated_at of the latest synced row, or None if never synced."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT high_water_mark FROM marks WHERE group_id = ? AND resource = ?", (group_id, resource)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_rows(self, group_id: int, resource: str) -> list[dict[str, Any]]:
+        """Return all synced rows. Newer items come first like gitlab list api."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM rows WHERE group_id = ? AND resource = ? ORDER BY item_id DESC", (group_id, resource)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def merge(self, group_id: int, resource: str, rows: list[dict[str, Any]], high_water_mark: str) -> None:
+        """Insert or replace rows by id and move high-water mark in single transaction.
+
+        Parameters
+        ----------
+        group_id
+            id of group.
+        resource
+            resource type like issues, mergerequests.
+        rows
+            rows created or updated after previous mark. each row must have id.
+        high_water_mark
+            latest updated_at in the synced rows.
+        """
+        records = [(group_id, resource, row["id"], json.dumps(row, default=str)) for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows (group_id, resource, item_id, data) VALUES (?, ?, ?, ?)", records
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO marks (group_id, resource, high_water_mark) VALUES (?, ?, ?)",
+                (group_id, resource, high_water_mark),
+            )
+
+    def clear(self, group_id: int, resource: str) -> None:
+        """Drop synced rows and mark so that next sync fetches full history."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rows WHERE group_id = ? AND resource = ?", (group_id, resource))
+            self._conn.execute("DELETE FROM marks WHERE group_id = ? AND resource = ?", (group_id, resource))
+
+
+def get_sync_store(cache_dir: Union[Path, str, None] = None) -> SyncStore:
+    """Create (or return pre exists) sync store.
+
+    Parameters
+    ----------
+    cache_dir
+        directory to put sqlite file, by default GitlabConst.CACHE_DIR
+
+    Returns
+    -------
+    SyncStore
+        store of the directory.
+    """
+    if cache_dir is None:
+        cache_dir = GitlabConst.CACHE_DIR
+    cache_dir = Path(cache_dir)
+    with __sync_stores_lock:
+        store = sync_stores.get(cache_dir)
+        if store is None:
+            store = SyncStore(cache_dir)
+            sync_stores[cache_dir] = store
+    return store
@@ -0,0 +1,269 @@
+"""Adapt requests to rate limit of gitlab and retry idempotent requests failed temporarily.
+
+Both the sync client (by ThrottledAdapter of the session) and the async client share HostThrottle and RetryPolicy.
+"""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Mapping, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+
+from common import GitlabConst, metrics
+from common.Logger import get_logger
+from repository.retry import RETRY_STATUS_CODES
+
+logger = get_logger()
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+# gitlab answers these when requests are too many. concurrency is decreased on them.
+THROTTLED_STATUS_CODES = (429, 503)
+
+host_throttles: dict[str, "HostThrottle"] = {}
+__host_throttles_lock = threading.Lock()
+
+
+class HostThrottle:
+    """Limit requests in flight to single host.
+
+    The limit is decreased by half when gitlab throttles requests and increased by 1 / limit on each success (AIMD).
+    All requests wait while the host asks to pause by Retry-After or exhausted RateLimit-Remaining.
+    Threads of the sync client and the event loop of the async client share the same throttle.
+    """
+
+    __POLL_SEC = 0.01
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1) -> None:
+        """Set limit to max_concurrency.
+
+        Parameters
+        ----------
+        max_concurrency
+            max requests in flight.
+        min_concurrency
+            limit is never decreased below this, by default 1
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Wait until the host is not paused and a request can be in flight."""
+        with self._cond:
+            while True:
+                wait_sec = self.paused_until - time.monotonic()
+                if wait_sec <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(wait_sec if wait_sec > 0 else None)
+
+    async def acquire_async(self) -> None:
+        """Wait like acquire without blocking event loop. Slots are polled since release does not wake it."""
+        while True:
+            with self._cond:
+                wait_sec = self.paused_until - time.monotonic()
+                if wait_sec <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+            await asyncio.sleep(wait_sec if wait_sec > 0 else self.__POLL_SEC)
+
+    def release(self, throttled: bool = False) -> None:
+        """Finish a request. Decrease limit if the host throttled it, otherwise increase limit."""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Make all requests to the host wait seconds from now."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+def get_host_throttle(url: str = GitlabConst.URL, max_concurrency: Union[int, None] = None) -> HostThrottle:
+    """Create (or return pre exists) throttle shared by all requests to the host of url.
+
+    Parameters
+    ----------
+    url
+        url of gitlab, by default GitlabConst.URL
+    max_concurrency
+        max requests in flight used when create new throttle, by default GitlabConst.POOL_SIZE
+
+    Returns
+    -------
+    HostThrottle
+        throttle of the host.
+    """
+    host = urlparse(url).netloc or url
+    with __host_throttles_lock:
+        throttle = host_throttles.get(host)
+        if throttle is None:
+            throttle = HostThrottle(max_concurrency or GitlabConst.POOL_SIZE)
+            host_throttles[host] = throttle
+    return throttle
+
+
+@dataclass
+class RetryPolicy:
+    """How many times and how long to wait before retrying requests failed temporarily.
+
+    Requests failed with RETRY_STATUS_CODES or connection errors are retried with jittered exponential backoff.
+    Retry-After of the response is used as wait if given.
+    When RateLimit-Remaining reaches min_remaining, all requests to the host wait until RateLimit-Reset.
+    None of each field is replaced by the value of GitlabConst.
+    """
+
+    retries: Union[int, None] = None
+    backoff_sec: Union[float, None] = None
+    max_wait_sec: Union[float, None] = None
+    min_remaining: Union[int, None] = None
+
+    def __post_init__(self) -> None:
+        """Fill missing fields by GitlabConst."""
+        if self.retries is None:
+            self.retries = GitlabConst.RETRY_COUNT
+        if self.backoff_sec is None:
+            self.backoff_sec = GitlabConst.RETRY_BACKOFF_SEC
+        if self.max_wait_sec is None:
+            self.max_wait_sec = GitlabConst.RETRY_MAX_WAIT_SEC
+        if self.min_remaining is None:
+            self.min_remaining = GitlabConst.RATE_LIMIT_MIN_REMAINING
+
+    def should_retry(self, attempt: int, status: Union[int, None]) -> bool:
+        """Check request failed with status (None if connection failed) can be retried after attempt."""
+        return attempt < self.retries and (status is None or status in RETRY_STATUS_CODES)
+
+    def wait_sec(self, attempt: int, headers: Union[Mapping[str, str], None]) -> float:
+        """Return seconds to wait before next attempt. Retry-After header is obeyed if given."""
+        retry_after = None if headers is None else parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(self.max_wait_sec, retry_after)
+        # full jitter spreads retries of workers failed at the same time.
+        return random.uniform(0, min(self.max_wait_sec, self.backoff_sec * 2**attempt))
+
+    def pause_if_exhausted(self, throttle: HostThrottle, headers: Mapping[str, str]) -> None:
+        """Pause the host until RateLimit-Reset if RateLimit-Remaining is at or below min_remaining."""
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")
+        if remaining is None or reset is None or not remaining.isdigit() or int(remaining) > self.min_remaining:
+            return
+        try:
+            wait_sec = float(reset) - time.time()
+        except ValueError:
+            return
+        if wait_sec > 0:
+            logger.info(f"Pause requests {wait_sec:.1f} sec. rate limit remaining {remaining}")
+            throttle.pause(min(self.max_wait_sec, wait_sec))
+
+    def before_retry(
+        self, throttle: HostThrottle, attempt: int, status: Union[int, None], headers: Union[Mapping[str, str], None]
+    ) -> float:
+        """Return seconds to wait before retry. Pause the host if it throttled the request.
+
+        Parameters
+        ----------
+        throttle
+            throttle of the host.
+        attempt
+            0-based count of attempts failed.
+        status
+            status code of failed response, or None if connection failed.
+        headers
+            headers of failed response, or None if connection failed.
+
+        Returns
+        -------
+        float
+            seconds to wait.
+        """
+        wait_sec = self.wait_sec(attempt, headers)
+        if status in THROTTLED_STATUS_CODES:
+            # other workers must wait too, or they are throttled as well.
+            throttle.pause(wait_sec)
+        return wait_sec
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """HTTPAdapter waits for HostThrottle and retries idempotent requests by RetryPolicy."""
+
+    def __init__(
+        self,
+        *,
+        retries: Union[int, None] = None,
+        backoff_sec: Union[float, None] = None,
+        max_wait_sec: Union[float, None] = None,
+        min_remaining: Union[int, None] = None,
+        **kwargs,
+    ) -> None:
+        """Set retry policy. Other kwargs are passed to HTTPAdapter.
+
+        Parameters
+        ----------
+        retries
+            max retry count of a request, by default GitlabConst.RETRY_COUNT
+        backoff_sec
+            upper bound of first wait. doubled on each retry, by default GitlabConst.RETRY_BACKOFF_SEC
+        max_wait_sec
+            upper bound of a wait, by default GitlabConst.RETRY_MAX_WAIT_SEC
+        min_remaining
+            pause host when RateLimit-Remaining is at or below this, by default GitlabConst.RATE_LIMIT_MIN_REMAINING
+        """
+        super().__init__(**kwargs)
+        self.max_concurrency = kwargs.get("pool_maxsize", DEFAULT_POOLSIZE)
+        self.policy = RetryPolicy(retries, backoff_sec, max_wait_sec, min_remaining)
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        """Send request after waiting for the host. Retry it if it is idempotent and failed temporarily."""
+        throttle = get_host_throttle(request.url or "", self.max_concurrency)
+        retryable = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            throttle.acquire()
+            try:
+                response = super().send(request, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                throttle.release()
+                if not retryable or not self.policy.should_retry(attempt, None):
+                    raise
+                status, headers = None, None
+            else:
+                throttle.release(response.status_code in THROTTLED_STATUS_CODES)
+                self.policy.pause_if_exhausted(throttle, response.headers)
+                if not retryable or not self.policy.should_retry(attempt, response.status_code):
+                    return response
+                status, headers = response.status_code, response.headers
+                response.close()
+            wait_sec = self.policy.before_retry(throttle, attempt, status, headers)
+            reason = "connection" if status is None else str(status)
+            metrics.registry.inc(metrics.API_RETRIES, endpoint=metrics.endpoint_of(request.url or ""), reason=reason)
+            logger.debug(f"Retry {request.method} {request.url} in {wait_sec:.2f} sec after {reason}")
+            time.sleep(wait_sec)
+            attempt += 1
+
+
+def parse_retry_after(value: Union[str, None]) -> Union[float, None]:
+    """Return seconds of Retry-After header given as seconds or http date. None if missing or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,85 @@
+"""Resolve details of commits shared across merge requests of a group.
+
+The same commit appears in several MRs, like stacked branches, MRs into release and main, and reopened MRs.
+Resolver collects unique (project id, sha) of all MRs first and fetches each of them only once.
+"""
+from typing import Any, Callable, Union
+
+from gitlab.v4.objects.commits import ProjectCommit
+from gitlab.v4.objects.projects import Project
+
+from repository.commit_cache import CommitCache
+from repository.fetch_engine import FetchEngine
+
+CommitKey = tuple[int, str]
+CommitTarget = tuple[Project, ProjectCommit]
+
+
+class CommitResolver:
+    """Resolve commit details from CommitCache on local disk, then gitlab.
+
+    Commits are deduplicated within each resolve. Details are kept across builds only by CommitCache.
+    """
+
+    def __init__(
+        self,
+        engine: FetchEngine,
+        commit_cache: CommitCache,
+        fetch_detail: Callable[[Project, ProjectCommit], dict[str, Any]],
+    ) -> None:
+        """Create resolver.
+
+        Parameters
+        ----------
+        engine
+            engine fetches missing commits concurrently.
+        commit_cache
+            local store of commit details checked before fetching.
+        fetch_detail
+            function fetches detail of a commit from gitlab.
+        """
+        self.engine = engine
+        self.commit_cache = commit_cache
+        self.fetch_detail = fetch_detail
+
+    def resolve(
+        self,
+        targets: list[CommitTarget],
+        *,
+        progress: Union[Callable[..., Any], None] = None,
+        desc: Union[str, None] = None,
+        tolerate: tuple[type[Exception], ...] = (),
+    ) -> list[Union[dict[str, Any], Exception]]:
+        """Return detail of each commit. Commits appear in several targets are fetched once.
+
+        Parameters
+        ----------
+        targets
+            pairs of project and commit of all MRs. may have the same commit several times.
+        progress
+            progress bar class like tqdm or stqdm, by default None
+        desc
+            description of progress bar, by default None
+        tolerate
+            exceptions of these types are returned in place of details instead of raised, by default ()
+
+        Returns
+        -------
+        list[Union[dict[str, Any], Exception]]
+            details in the same order as targets.
+        """
+        unique_targets: dict[CommitKey, CommitTarget] = {}
+        for project, commit in targets:
+            unique_targets.setdefault((project.id, commit.id), (project, commit))
+        missing = list(unique_targets.values())
+        details = self.engine.map(self.__fetch, missing, progress=progress, desc=desc, tolerate=tolerate)
+        resolved = {(project.id, commit.id): detail for (project, commit), detail in zip(missing, details)}
+        return [resolved[(project.id, commit.id)] for project, commit in targets]
+
+    def __fetch(self, target: CommitTarget) -> dict[str, Any]:
+        project, commit = target
+        detail = self.commit_cache.get(project.id, commit.id)
+        if detail is None:
+            detail = self.fetch_detail(project, commit)
+            self.commit_cache.put(project.id, commit.id, detail)
+        return detail
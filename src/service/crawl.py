@@ -0,0 +1,207 @@
+"""Crawl gitlab and publish datasets without streamlit server.
+
+Example: ``python -m service.crawl --groups 1,2 --resources issues,mrs --concurrency 16``
+
+Each dataset finished is recorded in checkpoint file, so rerun after interruption skips finished datasets.
+Commit details fetched before interruption are kept in commit cache, so interrupted dataset is not crawled from zero.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Union
+
+import pandas as pd
+
+from common import GitlabConst
+from common.Logger import get_logger
+from repository.sync_store import get_sync_store
+from service import mergerequest, snapshot, sync
+from service.issue import make_issue_df
+
+logger = get_logger()
+
+RESOURCE_ALIASES = {
+    "issues": sync.RESOURCE_ISSUES,
+    "mrs": sync.RESOURCE_MERGEREQUESTS,
+    "mergerequests": sync.RESOURCE_MERGEREQUESTS,
+}
+
+
+class CrawlCheckpoint:
+    """JSON file records datasets finished in current crawl."""
+
+    file_name = "crawl_checkpoint.json"
+
+    def __init__(self, cache_dir: Union[Path, str, None] = None) -> None:
+        """Read (or create empty) checkpoint.
+
+        Parameters
+        ----------
+        cache_dir
+            directory to put checkpoint file, by default GitlabConst.CACHE_DIR
+        """
+        cache_dir = Path(cache_dir or GitlabConst.CACHE_DIR)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = cache_dir.joinpath(self.file_name)
+        self.done: set[str] = set()
+        if self.path.exists():
+            self.done = set(json.loads(self.path.read_text()).get("done", []))
+
+    @staticmethod
+    def key(group_id: int, resource: str) -> str:
+        """Return key of dataset in checkpoint."""
+        return f"{group_id}:{resource}"
+
+    def is_done(self, group_id: int, resource: str) -> bool:
+        """Check the dataset was finished in interrupted crawl."""
+        return self.key(group_id, resource) in self.done
+
+    def mark_done(self, group_id: int, resource: str) -> None:
+        """Record the dataset was finished. file is replaced atomically."""
+        self.done.add(self.key(group_id, resource))
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"done": sorted(self.done)}))
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Drop checkpoint so that next crawl starts over."""
+        self.done.clear()
+        self.path.unlink(missing_ok=True)
+
+
+def parse_args(argv: Union[list[str], None] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog="python -m service.crawl", description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--groups",
+        type=__parse_ints,
+        default=GitlabConst.GROUP_IDS,
+        help="comma separated group ids, by default GITLAB_GROUP_IDS",
+    )
+    parser.add_argument(
+        "--resources",
+        type=__parse_resources,
+        default=[sync.RESOURCE_ISSUES, sync.RESOURCE_MERGEREQUESTS],
+        help=f"comma separated resources of {', '.join(RESOURCE_ALIASES)}, by default all",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=GitlabConst.MAX_WORKERS,
+        help="number of concurrent requests, by default GITLAB_MAX_WORKERS",
+    )
+    parser.add_argument(
+        "--stats-mode",
+        choices=[mergerequest.STATS_MODE_COMMIT, mergerequest.STATS_MODE_FAST],
+        default=GitlabConst.STATS_MODE,
+        help="how to make stats of merge requests, by default GITLAB_STATS_MODE",
+    )
+    parser.add_argument("--full", action="store_true", help="drop synced rows and fetch full history")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoint of interrupted crawl")
+    return parser.parse_args(argv)
+
+
+def crawl(
+    group_ids: list[int],
+    resources: list[str],
+    *,
+    concurrency: int = GitlabConst.MAX_WORKERS,
+    stats_mode: str = GitlabConst.STATS_MODE,
+    full: bool = False,
+    checkpoint: Union[CrawlCheckpoint, None] = None,
+) -> dict[tuple[int, str], str]:
+    """Build datasets of groups and publish them as snapshots.
+
+    Parameters
+    ----------
+    group_ids
+        ids of target groups.
+    resources
+        sync.RESOURCE_ISSUES and/or sync.RESOURCE_MERGEREQUESTS.
+    concurrency
+        number of concurrent requests to fetch commits, by default GitlabConst.MAX_WORKERS
+    stats_mode
+        stats mode of merge requests, by default GitlabConst.STATS_MODE
+    full
+        drop synced rows before crawl, by default False
+    checkpoint
+        datasets recorded in it are skipped, by default CrawlCheckpoint()
+
+    Returns
+    -------
+    dict[tuple[int, str], str]
+        errors of failed datasets keyed by (group_id, resource). checkpoint is cleared if nothing failed.
+    """
+    if checkpoint is None:
+        checkpoint = CrawlCheckpoint()
+    builders: dict[str, tuple[str, Callable[[int], pd.DataFrame]]] = {
+        sync.RESOURCE_ISSUES: (
+            sync.RESOURCE_ISSUES,
+            lambda group_id: make_issue_df(group_id, incremental=True),
+        ),
+        sync.RESOURCE_MERGEREQUESTS: (
+            mergerequest.get_resource(stats_mode),
+            lambda group_id: mergerequest.make_mergerequest_df(
+                group_id, max_workers=concurrency, incremental=True, stats_mode=stats_mode
+            ),
+        ),
+    }
+    errors = {}
+    for group_id in group_ids:
+        for resource in resources:
+            dataset_resource, build = builders[resource]
+            if checkpoint.is_done(group_id, dataset_resource):
+                logger.info(f"Skip {dataset_resource} of group {group_id} finished before interruption")
+                continue
+            if full:
+                get_sync_store().clear(group_id, dataset_resource)
+            start = time.perf_counter()
+            try:
+                df = snapshot.refresh(group_id, dataset_resource, lambda: build(group_id))
+            except Exception as e:
+                logger.error(f"Failed to crawl {dataset_resource} of group {group_id}", exc_info=True)
+                errors[(group_id, dataset_resource)] = repr(e)
+                continue
+            checkpoint.mark_done(group_id, dataset_resource)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Crawled {len(df)} {dataset_resource} of group {group_id} in {elapsed:.1f} sec")
+    if not errors:
+        checkpoint.clear()
+    return errors
+
+
+def main(argv: Union[list[str], None] = None) -> int:
+    """Run crawler. Return 1 if any dataset failed."""
+    args = parse_args(argv)
+    checkpoint = CrawlCheckpoint()
+    if args.restart:
+        checkpoint.clear()
+    errors = crawl(
+        args.groups,
+        args.resources,
+        concurrency=args.concurrency,
+        stats_mode=args.stats_mode,
+        full=args.full,
+        checkpoint=checkpoint,
+    )
+    for (group_id, resource), error in errors.items():
+        print(f"failed: {resource} of group {group_id}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def __parse_ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def __parse_resources(value: str) -> list[str]:
+    try:
+        return [RESOURCE_ALIASES[v.strip()] for v in value.split(",") if v.strip()]
+    except KeyError as e:
+        raise argparse.ArgumentTypeError(f"unknown resource {e}") from None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
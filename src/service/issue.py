@@ -1,18 +1,25 @@
 """Provide service for issue dataset."""
-from typing import Union
+from typing import Any, Union
 
 import pandas as pd
 
-from common import util
+from common import metrics, util
 from common.Logger import get_logger, logging_start_end
-from repository.mapper import GitlabClient
+from repository.factory import create_client
+from service import schema, snapshot, sync
 
 logger = get_logger()
 
 
+@metrics.timed("service")
 @logging_start_end(logger)
 def make_issue_df(
-    group_id: int, *, state: Union[str, None] = None, labels: Union[list[str], None] = None
+    group_id: int,
+    *,
+    state: Union[str, None] = None,
+    labels: Union[list[str], None] = None,
+    incremental: bool = False,
+    use_snapshot: bool = False,
 ) -> pd.DataFrame:
     """Make dataset of group issue.
 
@@ -24,15 +31,36 @@ def make_issue_df(
         issue state. if you need only opened issue, pass 'opened', by default None
     labels :
         if you need issues has specific labels, pass label list, by default None
+    incremental :
+        fetch only issues updated after previous sync and merge them into stored issues, by default False.
+        ignored if state or labels are given.
+    use_snapshot :
+        return snapshot saved on local disk if it is fresh, and save built dataset as snapshot, by default False.
+        ignored if state or labels are given.
 
     Returns
     -------
     pd.DataFrame
-        DataFrame each row has single issue infomation.
+        DataFrame each row has single issue infomation. cols and dtypes follow schema.ISSUE_SCHEMA.
     """
-    issues = []
-    for issue in GitlabClient(group_id).fetch_group_issues(state=state, labels=labels):
-        tmp_issue = issue.__dict__["_attrs"].copy()
-        util.flatten_dict_in_dict(tmp_issue)
-        issues.append(tmp_issue)
-    return pd.DataFrame.from_dict(issues)
+
+    def fetch_issues(updated_after: Union[str, None] = None) -> list[dict[str, Any]]:
+        # client is created only when gitlab is requested, so loading snapshot never connects.
+        client = create_client(group_id)
+        issues = []
+        for issue in client.fetch_group_issues(state=state, labels=labels, updated_after=updated_after):
+            tmp_issue = issue.__dict__["_attrs"].copy()
+            util.flatten_dict_in_dict(tmp_issue)
+            issues.append(tmp_issue)
+        return issues
+
+    def build() -> pd.DataFrame:
+        if incremental and state is None and labels is None:
+            issues = sync.sync_group_rows(group_id, sync.RESOURCE_ISSUES, fetch_issues)
+        else:
+            issues = fetch_issues()
+        return schema.ISSUE_SCHEMA.apply(pd.DataFrame.from_dict(issues))
+
+    if use_snapshot and state is None and labels is None:
+        return snapshot.load_or_build(group_id, sync.RESOURCE_ISSUES, build)
+    return build()
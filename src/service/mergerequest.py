@@ -1,6 +1,7 @@
 """Provide service for issue dataset."""
 from collections import defaultdict
-from typing import Union
+from functools import partial
+from typing import Any, Union
 
 import pandas as pd
 from gitlab.v4.objects.commits import ProjectCommit
@@ -8,13 +9,28 @@ from gitlab.v4.objects.projects import Project
 from stqdm import stqdm
 from tqdm import tqdm
 
-from common import util
+from common import GitlabConst, diffstat, metrics, util
 from common.Logger import get_logger, logging_start_end
+from repository.commit_cache import CommitCache, get_commit_cache
+from repository.factory import create_client
+from repository.fetch_engine import FetchEngine
+from repository.lazy_mergerequest import LazyMergeRequest
 from repository.mapper import GitlabClient
+from repository.retry import FETCH_ERRORS, is_retryable
+from service import schema, snapshot, sync
+from service.commit_resolver import CommitResolver
 
 logger = get_logger()
 
+STATS_MODE_COMMIT = "commit"
+STATS_MODE_FAST = "fast"
+# stats of MR failed permanently, like commits lost by force-push.
+NULL_STATS = dict.fromkeys(
+    ("total_commits", "total_additions", "total_deletions", "total_changes", "total_changed_file_count", "diff")
+)
 
+
+@metrics.timed("service")
 @logging_start_end(logger)
 def make_mergerequest_df(
     group_id: int,
@@ -22,6 +38,11 @@ def make_mergerequest_df(
     state: Union[str, None] = None,
     target_pj_names: Union[list[str], None] = None,
     from_streamlit_view: bool = False,
+    max_workers: int = GitlabConst.MAX_WORKERS,
+    commit_cache: Union[CommitCache, None] = None,
+    incremental: bool = False,
+    stats_mode: str = GitlabConst.STATS_MODE,
+    use_snapshot: bool = False,
 ) -> pd.DataFrame:
     """Make dataset of group mergerequest.
 
@@ -31,52 +52,258 @@ def make_mergerequest_df(
         target group you want to get mergerequests.
     state :
         mergerequest state. if you need only opened mergerequest, pass 'opened', by default None
+    max_workers :
+        number of concurrent requests to fetch commits, by default GitlabConst.MAX_WORKERS
+    commit_cache :
+        local store of commit details checked before fetching commits, by default get_commit_cache()
+    incremental :
+        fetch only MRs updated after previous sync and merge them into stored MRs, by default False.
+        ignored if state or target_pj_names are given.
+    stats_mode :
+        STATS_MODE_COMMIT fetches stats and diffs of each commit. change_cnt of each file is number of commits.
+        STATS_MODE_FAST fetches only commit list and changes of each MR. change_cnt of each file is 1,
+        by default GitlabConst.STATS_MODE
+    use_snapshot :
+        return snapshot saved on local disk if it is fresh, and save built dataset as snapshot, by default False.
+        ignored if state or target_pj_names are given.
 
     Returns
     -------
     pd.DataFrame
-        DataFrame each row has single mergerequest infomation.
+        DataFrame each row has single mergerequest infomation. cols and dtypes follow schema.MERGEREQUEST_SCHEMA.
+        MRs failed temporarily after retries are left out and counted in attrs[snapshot.FAILED_ROWS_ATTR].
+        MRs failed permanently like 404 are kept with null stats.
     """
     # TODO: get each commit info per merge requests to keep commiter information and aggregate by id at view layer.
-    client = GitlabClient(group_id)
+    engine = FetchEngine(max_workers)
+    if commit_cache is None:
+        commit_cache = get_commit_cache()
     pg_bar = tqdm
     if from_streamlit_view:
         pg_bar = stqdm
-    # GroupMergeRequest does not have commit info. So get from Project commits.
-    # Project.commits.list() has not stats of commit so fetch each single commit.
-    group_mr = client.fetch_mergerrequests_in_group(state=state)
-    pj_in_group = client.fetch_projects_in_group([mr.project_id for mr in group_mr])
-    if target_pj_names is not None:
-        pj_in_group = [pj for pj in pj_in_group if pj.name in target_pj_names]
-    id_pj_map = {pj.id: pj for pj in pj_in_group}
-    group_mr = [mr for mr in group_mr if mr.project_id in id_pj_map]
-
-    mergerequests = []
-    for mr in pg_bar(group_mr, desc="Collect commits from MRs"):
-        logger.debug(f"Collect commits from merge requests {mr.title=}")
-        tmp_mergerequest = mr.__dict__["_attrs"].copy()
-        tmp_mergerequest["group_id"] = group_id
-        util.flatten_dict_in_dict(tmp_mergerequest)
-        mr_project = id_pj_map[mr.project_id]
-        mr_commit_stat = __make_commit_stats(mr.commits(all=True), mr_project)
-        tmp_mergerequest.update(mr_commit_stat)
-        mergerequests.append(tmp_mergerequest)
-    return pd.DataFrame.from_dict(mergerequests)
-
-
-def __make_commit_stats(mr_commits: list[ProjectCommit], project: Project) -> dict:
-    def agg_diff(commit_diffs: list[dict]) -> dict[str, dict[str, int]]:
-        diffs = dict()
-        for diff in commit_diffs:
-            if diff["deleted_file"]:
+
+    def fetch_mr_commits(client: GitlabClient, mr: LazyMergeRequest) -> list[ProjectCommit]:
+        logger.debug_sampled(f"Collect commits from merge requests {mr.title=}")
+        engine.throttle()
+        return client.fetch_mr_commits(mr)
+
+    def fetch_commit_detail(client: GitlabClient, project: Project, mr_commit: ProjectCommit) -> dict[str, Any]:
+        logger.debug_sampled(f"Fetch commit {mr_commit.short_id} from project {project.id}")
+        return __fetch_commit_detail(client, mr_commit, project, engine)
+
+    def fetch_commit_stats(
+        client: GitlabClient, group_mr: list[LazyMergeRequest], id_pj_map: dict[int, Project]
+    ) -> list[Union[dict, Exception]]:
+        # commits shared by several MRs are fetched once in the build, including incremental sync.
+        commit_resolver = CommitResolver(engine, commit_cache, partial(fetch_commit_detail, client))
+        # fan out requests across MRs first, then across unique commits of them.
+        # a failure is kept in place of the MR, so that other MRs are not thrown away.
+        with metrics.timer(metrics.STAGE_SECONDS, stage="collect_mr_commits", group=group_id):
+            commits_per_mr = engine.map(
+                partial(fetch_mr_commits, client),
+                group_mr,
+                progress=pg_bar,
+                desc="Collect commits from MRs",
+                tolerate=FETCH_ERRORS,
+            )
+        commit_targets = [
+            (id_pj_map[mr.project_id], mr_commit)
+            for mr, mr_commits in zip(group_mr, commits_per_mr)
+            if not isinstance(mr_commits, Exception)
+            for mr_commit in mr_commits
+        ]
+        with metrics.timer(metrics.STAGE_SECONDS, stage="fetch_commit_stats", group=group_id):
+            commit_details = commit_resolver.resolve(
+                commit_targets, progress=pg_bar, desc="Fetch commit stats", tolerate=FETCH_ERRORS
+            )
+        mr_stats: list[Union[dict, Exception]] = []
+        detail_idx = 0
+        for mr_commits in commits_per_mr:
+            if isinstance(mr_commits, Exception):
+                mr_stats.append(mr_commits)
+                continue
+            mr_details = commit_details[detail_idx : detail_idx + len(mr_commits)]
+            detail_idx += len(mr_commits)
+            errors = [d for d in mr_details if isinstance(d, Exception)]
+            if errors:
+                # temporary error wins, so that the MR is fetched again later.
+                mr_stats.append(next((e for e in errors if is_retryable(e)), errors[0]))
+            else:
+                mr_stats.append(__make_commit_stats([d for d in mr_details if not isinstance(d, Exception)]))
+        return mr_stats
+
+    def fetch_change_stats(client: GitlabClient, mr: LazyMergeRequest) -> dict:
+        mr_commits = fetch_mr_commits(client, mr)
+        engine.throttle()
+        mr_changes = client.fetch_mr_changes(mr)
+        mr_stats = __make_change_stats(len(mr_commits), mr_changes["changes"])
+        # group listing does not have changes_count, but changes of the MR have it.
+        mr_stats["changes_count"] = mr_changes.get("changes_count")
+        return mr_stats
+
+    def fetch_mergerequests(updated_after: Union[str, None] = None) -> list[dict[str, Any]]:
+        # GroupMergeRequest does not have commit info. So get from Project commits.
+        # Project.commits.list() has not stats of commit so fetch each single commit.
+        # client is created only when gitlab is requested, so loading snapshot never connects.
+        client = create_client(group_id)
+        group_mr = client.fetch_mergerrequests_in_group(state=state, updated_after=updated_after)
+        pj_in_group = client.fetch_projects_in_group([mr.project_id for mr in group_mr])
+        if target_pj_names is not None:
+            pj_in_group = [pj for pj in pj_in_group if pj.name in target_pj_names]
+        id_pj_map = {pj.id: pj for pj in pj_in_group}
+        group_mr = [mr for mr in group_mr if mr.project_id in id_pj_map]
+
+        if stats_mode == STATS_MODE_FAST:
+            with metrics.timer(metrics.STAGE_SECONDS, stage="collect_mr_changes", group=group_id):
+                mr_stats = engine.map(
+                    partial(fetch_change_stats, client),
+                    group_mr,
+                    progress=pg_bar,
+                    desc="Collect changes from MRs",
+                    tolerate=FETCH_ERRORS,
+                )
+        else:
+            mr_stats = fetch_commit_stats(client, group_mr, id_pj_map)
+
+        mergerequests = []
+        failed_updated_ats = []
+        no_stats_count = 0
+        for mr, mr_stat in zip(group_mr, mr_stats):
+            tmp_mergerequest = mr.__dict__["_attrs"].copy()
+            if isinstance(mr_stat, Exception) and is_retryable(mr_stat):
+                failed_updated_ats.append(tmp_mergerequest["updated_at"])
                 continue
-            file_name = diff["new_path"]
-            diff_lines = diff["diff"].split("\n")
-            add_lines = len(list(filter(lambda s: s.startswith("+"), diff_lines)))
-            del_lines = len(list(filter(lambda s: s.startswith("-"), diff_lines)))
-            diffs[file_name] = {"add": add_lines, "del": del_lines}
-        return diffs
+            tmp_mergerequest["group_id"] = group_id
+            util.flatten_dict_in_dict(tmp_mergerequest)
+            if isinstance(mr_stat, Exception):
+                # never succeeds on retry. keep the MR so that it does not block sync and snapshot.
+                no_stats_count += 1
+                tmp_mergerequest.update(NULL_STATS)
+            else:
+                tmp_mergerequest.update(mr_stat)
+            mergerequests.append(tmp_mergerequest)
+        if no_stats_count:
+            logger.warning(f"{no_stats_count} merge requests in group {group_id} are kept without stats")
+        if not failed_updated_ats:
+            return mergerequests
+        failures.extend(failed_updated_ats)
+        logger.warning(
+            f"Skip {len(failed_updated_ats)} of {len(group_mr)} merge requests in group {group_id} failed to fetch. "
+            "They are fetched again by next sync."
+        )
+        return sync.PartialRows(mergerequests, failed_updated_ats)
+
+    resource = get_resource(stats_mode)
+    failures: list[str] = []
+
+    def build() -> pd.DataFrame:
+        if incremental and state is None and target_pj_names is None:
+            mergerequests = sync.sync_group_rows(group_id, resource, fetch_mergerequests)
+        else:
+            mergerequests = fetch_mergerequests()
+        df = schema.MERGEREQUEST_SCHEMA.apply(pd.DataFrame.from_dict(mergerequests))
+        df.attrs[snapshot.FAILED_ROWS_ATTR] = len(failures)
+        return df
+
+    if use_snapshot and state is None and target_pj_names is None:
+        return snapshot.load_or_build(group_id, resource, build)
+    return build()
+
+
+def get_resource(stats_mode: str = GitlabConst.STATS_MODE) -> str:
+    """Return resource name of synced MRs and snapshots.
+
+    Stats of each mode differ, so MRs of each mode are kept apart.
+    """
+    if stats_mode == STATS_MODE_COMMIT:
+        return sync.RESOURCE_MERGEREQUESTS
+    return f"{sync.RESOURCE_MERGEREQUESTS}-{stats_mode}"
+
+
+DIFF_COLS = ["mr_id", "project_id", "file_path", "add", "del", "change_cnt"]
+# name of the diff table published next to the snapshot of MRs.
+DIFF_TABLE = "diff"
+
+
+@metrics.timed("service")
+def make_diff_df(mergerequest_df: pd.DataFrame) -> pd.DataFrame:
+    """Make long format dataset of changed lines of each file in each mergerequest.
+
+    Parameters
+    ----------
+    mergerequest_df :
+        dataset made by make_mergerequest_df.
+
+    Returns
+    -------
+    pd.DataFrame
+        each row has single file changed by single mergerequest. cols are DIFF_COLS.
+        file_path is category and others are int.
+    """
+    records = [
+        (mr_id, project_id, file_path, diff["add"], diff["del"], diff["change_cnt"])
+        for mr_id, project_id, mr_diff in zip(
+            mergerequest_df.get("id", []), mergerequest_df.get("project_id", []), mergerequest_df.get("diff", [])
+        )
+        if isinstance(mr_diff, dict)
+        for file_path, diff in mr_diff.items()
+    ]
+    diff_df = pd.DataFrame.from_records(records, columns=DIFF_COLS)
+    return diff_df.astype(
+        {"mr_id": "Int64", "project_id": "Int64", "file_path": "category", "add": int, "del": int, "change_cnt": int}
+    )
+
+
+# diffs of every MR are walked once per build, not once per view.
+for __stats_mode in (STATS_MODE_COMMIT, STATS_MODE_FAST):
+    snapshot.register_derived(get_resource(__stats_mode), DIFF_TABLE, make_diff_df)
+
+
+def __fetch_commit_detail(
+    client: GitlabClient, mr_commit: ProjectCommit, project: Project, engine: FetchEngine
+) -> dict[str, Any]:
+    """Fetch stats and line counts of each file changed by single commit."""
+    engine.throttle()
+    commit = client.fetch_project_commit(project, mr_commit.short_id)
+    # mr_commit.diff() requests the same endpoint as commit.diff(), so fetch diffs only once.
+    engine.throttle()
+    commit_diffs = client.fetch_commit_diff(project, commit)
+    return {"stats": commit.stats, "changed_file_count": len(commit_diffs), "diff": __agg_diff(commit_diffs)}
+
+
+def __agg_diff(commit_diffs: list[dict]) -> dict[str, dict[str, int]]:
+    diffs = dict()
+    for diff in commit_diffs:
+        if diff["deleted_file"]:
+            continue
+        add_lines, del_lines = diffstat.count_diff_lines(diff["diff"])
+        diffs[diff["new_path"]] = {"add": add_lines, "del": del_lines}
+    return diffs
+
+
+def __make_change_stats(total_commits: int, changes: list[dict]) -> dict:
+    """Make stats of MR from changes of whole MR instead of each commit."""
+    total_additions = 0
+    total_deletions = 0
+    diffs: defaultdict[str, dict[str, int]] = defaultdict(dict)
+    for change in changes:
+        add_lines, del_lines = diffstat.count_diff_lines(change["diff"])
+        total_additions += add_lines
+        total_deletions += del_lines
+        if change["deleted_file"]:
+            continue
+        diffs[change["new_path"]] = {"add": add_lines, "del": del_lines, "change_cnt": 1}
+    return {
+        "total_commits": total_commits,
+        "total_additions": total_additions,
+        "total_deletions": total_deletions,
+        "total_changes": total_additions + total_deletions,
+        "total_changed_file_count": len(changes),
+        "diff": diffs,
+    }
+
 
+def __make_commit_stats(commit_details: list[dict[str, Any]]) -> dict:
     def merge_diff(total_diff: dict, new_diff: dict):
         for file_name, diff in new_diff.items():
             add_lines = total_diff[file_name].get("add", 0) + diff["add"]
@@ -87,24 +314,21 @@ def __make_commit_stats(mr_commits: list[ProjectCommit], project: Project) -> di
             total_diff[file_name]["change_cnt"] = change_cnt
 
     # NOTE: this is not pythonic...
-    mr_commit_stat: dict[str, Union[int, dict]] = {"total_commits": len(mr_commits)}
+    mr_commit_stat: dict[str, Union[int, dict]] = {"total_commits": len(commit_details)}
     total_changed_file_count = 0
     total_additions = 0
     total_deletions = 0
     total_changes = 0
     diffs: defaultdict[str, dict[str, int]] = defaultdict(dict)
 
-    commit_count = len(mr_commits)
-    for i, mr_commit in enumerate(mr_commits):
-        logger.debug(f"Fetch commit from this merge requests {i+1}/{commit_count}")
-        commit = project.commits.get(mr_commit.short_id)
-        stats = commit.stats
+    for commit_detail in commit_details:
+        stats = commit_detail["stats"]
         total_additions += stats["additions"]
         total_deletions += stats["deletions"]
         total_changes += stats["total"]
-        total_changed_file_count += len(mr_commit.diff())
+        total_changed_file_count += commit_detail["changed_file_count"]
 
-        merge_diff(diffs, agg_diff(commit.diff()))
+        merge_diff(diffs, commit_detail["diff"])
 
     mr_commit_stat["total_additions"] = total_additions
     mr_commit_stat["total_deletions"] = total_deletions
@@ -1,12 +1,14 @@
 """Provide service for project dataset."""
 from gitlab.v4.objects.projects import Project
 
+from common import metrics
 from common.Logger import get_logger, logging_start_end
-from repository.mapper import GitlabClient
+from repository.factory import create_client
 
 logger = get_logger()
 
 
+@metrics.timed("service")
 @logging_start_end(logger)
 def list_project(group_id: int) -> list[Project]:
     """Make list of projects in group.
@@ -21,4 +23,4 @@ def list_project(group_id: int) -> list[Project]:
     list[Project]
         projects in the group.
     """
-    return GitlabClient(group_id).fetch_projects_in_group()
+    return create_client(group_id).fetch_projects_in_group()
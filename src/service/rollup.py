@@ -0,0 +1,268 @@
+"""Provide rollup tables of issue and mergerequest datasets for dashboards.
+
+Rollup tables are counts of rows for each combination of project and dimensions.
+Every table has the additive count col, so that view only slices and sums them,
+and new dataset version updates them by adding counts of new rows and subtracting counts of old rows.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Union
+
+import pandas as pd
+
+from common import metrics
+from common.Logger import get_logger
+
+logger = get_logger()
+
+ROLLUP_ISSUES = "issues"
+ROLLUP_MERGEREQUESTS = "mergerequests"
+
+TIME_UNITS = ("Q", "M", "W")
+COUNT_COL = "count"
+PROJECT_COL = "project_id"
+NOT_ASSIGNED = "Not Assigned!"
+NO_LABEL = "No label set!"
+
+TABLE_STATE = "state"
+TABLE_ASSIGNEE_STATE = "assignee_state"
+TABLE_LABEL_STATE = "label_state"
+TABLE_CREATED = "created"
+TABLE_CLOSED = "closed"
+
+# cols of dataset used by rollup. other cols are not kept.
+ROW_COLS = ("id", "updated_at", PROJECT_COL, "state", "created_at", "assignee-username", "labels")
+# if more rows than this ratio changed, rebuild tables instead of updating them.
+REBUILD_RATIO = 0.5
+
+Aggregator = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def period_table(prefix: str, unit: str) -> str:
+    """Return name of table counts rows for each period like created_M."""
+    return f"{prefix}_{unit}"
+
+
+@dataclass
+class Rollup:
+    """Count tables of single dataset version."""
+
+    fingerprint: str
+    tables: dict[str, pd.DataFrame]
+    rows: pd.DataFrame
+
+    def slice(  # noqa: A003
+        self, name: str, project_ids: Union[list[int], None] = None, *, keep_project: bool = False
+    ) -> pd.DataFrame:
+        """Return counts of selected projects.
+
+        Parameters
+        ----------
+        name
+            name of table like TABLE_ASSIGNEE_STATE.
+        project_ids
+            ids of projects to count. if None, count all projects.
+        keep_project
+            keep counts of each project, by default False. if False, counts are summed over projects.
+
+        Returns
+        -------
+        pd.DataFrame
+            cols are (project_id), dimensions and count.
+        """
+        table = self.tables[name]
+        if project_ids is not None:
+            table = table[table[PROJECT_COL].isin(project_ids)]
+        if keep_project:
+            return table.reset_index(drop=True)
+        dims = [c for c in table.columns if c not in (PROJECT_COL, COUNT_COL)]
+        return table.groupby(dims, as_index=False, observed=True)[COUNT_COL].sum()
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Make fingerprint of dataset version from id and updated_at of each row."""
+    key_cols = [c for c in ("id", "updated_at") if c in df.columns]
+    row_hashes = pd.util.hash_pandas_object(df[key_cols], index=False)
+    return hashlib.sha1(row_hashes.to_numpy().tobytes()).hexdigest()
+
+
+def build_rollup(kind: str, df: pd.DataFrame) -> Rollup:
+    """Build all tables of the dataset.
+
+    Parameters
+    ----------
+    kind
+        ROLLUP_ISSUES or ROLLUP_MERGEREQUESTS.
+    df
+        dataset made by service.issue or service.mergerequest.
+
+    Returns
+    -------
+    Rollup
+        built tables.
+    """
+    rows = __to_rows(df)
+    tables = {name: aggregate(rows) for name, aggregate in get_aggregators(kind).items()}
+    return Rollup(fingerprint(df), tables, rows)
+
+
+def update_rollup(kind: str, rollup: Rollup, df: pd.DataFrame) -> Rollup:
+    """Update tables of previous version by rows added, updated or removed in the dataset.
+
+    Parameters
+    ----------
+    kind
+        ROLLUP_ISSUES or ROLLUP_MERGEREQUESTS.
+    rollup
+        tables of previous version.
+    df
+        dataset of new version.
+
+    Returns
+    -------
+    Rollup
+        tables of new version. previous rollup is not changed.
+    """
+    rows = __to_rows(df)
+    changed_ids = __changed_ids(rollup.rows, rows)
+    if len(changed_ids) > len(rows) * REBUILD_RATIO:
+        return build_rollup(kind, df)
+    logger.debug(f"Update {kind} rollup by {len(changed_ids)} changed rows")
+    old_rows = rollup.rows[rollup.rows["id"].isin(changed_ids)]
+    new_rows = rows[rows["id"].isin(changed_ids)]
+    tables = {
+        name: __merge_counts(rollup.tables[name], aggregate(new_rows), aggregate(old_rows))
+        for name, aggregate in get_aggregators(kind).items()
+    }
+    return Rollup(fingerprint(df), tables, rows)
+
+
+rollups: dict[tuple[str, int], Rollup] = {}
+__rollups_lock = threading.Lock()
+
+
+@metrics.timed("service")
+def get_rollup(kind: str, group_id: int, df: pd.DataFrame) -> Rollup:
+    """Return rollup of the dataset. build or update tables only when dataset version changed.
+
+    Parameters
+    ----------
+    kind
+        ROLLUP_ISSUES or ROLLUP_MERGEREQUESTS.
+    group_id
+        id of group the dataset belongs to.
+    df
+        dataset.
+
+    Returns
+    -------
+    Rollup
+        tables of the dataset shared by all callers.
+    """
+    version = fingerprint(df)
+    with __rollups_lock:
+        rollup = rollups.get((kind, group_id))
+        if rollup is not None and rollup.fingerprint == version:
+            metrics.count_cache("rollup", True)
+            return rollup
+        metrics.count_cache("rollup", False)
+        if rollup is None or not {"id", "updated_at"} <= set(df.columns):
+            rollup = build_rollup(kind, df)
+        else:
+            rollup = update_rollup(kind, rollup, df)
+        rollups[(kind, group_id)] = rollup
+    return rollup
+
+
+def clear_rollup(kind: Union[str, None] = None, group_id: Union[int, None] = None) -> None:
+    """Drop rollups. None matches all kinds or groups."""
+    with __rollups_lock:
+        for key in [k for k in rollups if kind in (None, k[0]) and group_id in (None, k[1])]:
+            del rollups[key]
+
+
+def get_aggregators(kind: str) -> dict[str, Aggregator]:
+    """Return functions to make each table of the kind of dataset.
+
+    Parameters
+    ----------
+    kind
+        ROLLUP_ISSUES or ROLLUP_MERGEREQUESTS.
+
+    Returns
+    -------
+    dict[str, Aggregator]
+        key is table name and value is function to count rows.
+    """
+    aggregators: dict[str, Aggregator] = {TABLE_STATE: count_state}
+    for unit in TIME_UNITS:
+        aggregators[period_table(TABLE_CREATED, unit)] = __make_created_counter(unit)
+    if kind == ROLLUP_ISSUES:
+        aggregators[TABLE_ASSIGNEE_STATE] = count_assignee_state
+        aggregators[TABLE_LABEL_STATE] = count_label_state
+        for unit in TIME_UNITS:
+            aggregators[period_table(TABLE_CLOSED, unit)] = __make_closed_counter(unit)
+    return aggregators
+
+
+def count_state(rows: pd.DataFrame) -> pd.DataFrame:
+    """Count rows for each project and state."""
+    return __count(rows, [PROJECT_COL, "state"])
+
+
+def count_assignee_state(rows: pd.DataFrame) -> pd.DataFrame:
+    """Count rows for each project, assignee and state."""
+    tmp_df = rows[[PROJECT_COL, "state"]].copy()
+    # categorical col of snapshot can not be filled by value not in its categories.
+    tmp_df["assignee-username"] = rows["assignee-username"].astype(object) if "assignee-username" in rows else None
+    tmp_df["assignee-username"] = tmp_df["assignee-username"].fillna(NOT_ASSIGNED)
+    return __count(tmp_df, [PROJECT_COL, "assignee-username", "state"])
+
+
+def count_label_state(rows: pd.DataFrame) -> pd.DataFrame:
+    """Count rows for each project, label and state. row has multiple labels is counted for each label."""
+    tmp_df = rows[[PROJECT_COL, "state"]].copy()
+    tmp_df["labels"] = rows.get("labels")
+    tmp_df = tmp_df.explode("labels")
+    tmp_df["labels"] = tmp_df["labels"].fillna(NO_LABEL)
+    return __count(tmp_df, [PROJECT_COL, "labels", "state"])
+
+
+def count_created(rows: pd.DataFrame, unit: str) -> pd.DataFrame:
+    """Count rows for each project and period of created_at."""
+    return __count(rows, [PROJECT_COL, pd.Grouper(key="created_at", freq=unit)])
+
+
+def __make_created_counter(unit: str) -> Aggregator:
+    return lambda rows: count_created(rows, unit)
+
+
+def __make_closed_counter(unit: str) -> Aggregator:
+    return lambda rows: count_created(rows[rows["state"] == "closed"], unit)
+
+
+def __count(rows: pd.DataFrame, keys: list[Union[str, pd.Grouper]]) -> pd.DataFrame:
+    return rows.groupby(keys, observed=True).size().reset_index(name=COUNT_COL)
+
+
+def __to_rows(df: pd.DataFrame) -> pd.DataFrame:
+    rows = df[[c for c in ROW_COLS if c in df.columns]].copy()
+    # parse once, period counts of each unit and each update share it.
+    rows["created_at"] = pd.to_datetime(rows["created_at"], utc=True)
+    return rows
+
+
+def __changed_ids(old_rows: pd.DataFrame, new_rows: pd.DataFrame) -> pd.Series:
+    keys = new_rows[["id", "updated_at"]].merge(
+        old_rows[["id", "updated_at"]], on="id", how="outer", suffixes=("", "_old")
+    )
+    # added or removed row has NaN in either updated_at, which is not equal to anything.
+    return keys.loc[keys["updated_at"].ne(keys["updated_at_old"]), "id"]
+
+
+def __merge_counts(table: pd.DataFrame, plus: pd.DataFrame, minus: pd.DataFrame) -> pd.DataFrame:
+    dims = [c for c in table.columns if c != COUNT_COL]
+    minus = minus.assign(**{COUNT_COL: -minus[COUNT_COL]})
+    merged = pd.concat([table, plus, minus]).groupby(dims, as_index=False, observed=True)[COUNT_COL].sum()
+    return merged[merged[COUNT_COL] != 0].reset_index(drop=True)
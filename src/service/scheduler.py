@@ -0,0 +1,128 @@
+"""Refresh datasets of groups in background and publish them as snapshots.
+
+Run ``python -m service.scheduler`` to refresh datasets in a worker process instead of the server process.
+"""
+import threading
+import time
+from typing import Callable, Union
+
+import pandas as pd
+
+from common import GitlabConst
+from common.Logger import get_logger
+from service import mergerequest, snapshot, sync
+from service.issue import make_issue_df
+
+logger = get_logger()
+
+Builder = Callable[[int], pd.DataFrame]
+
+
+def get_default_builders() -> dict[str, Builder]:
+    """Return functions to build dataset of each resource from group id."""
+    return {
+        sync.RESOURCE_ISSUES: lambda group_id: make_issue_df(group_id, incremental=GitlabConst.INCREMENTAL_SYNC),
+        mergerequest.get_resource(): lambda group_id: mergerequest.make_mergerequest_df(
+            group_id, incremental=GitlabConst.INCREMENTAL_SYNC
+        ),
+    }
+
+
+class RefreshScheduler:
+    """Refresh datasets of every group on daemon thread at fixed interval."""
+
+    def __init__(
+        self,
+        group_ids: list[int],
+        builders: dict[str, Builder],
+        interval_sec: float = GitlabConst.REFRESH_INTERVAL_SEC,
+    ) -> None:
+        """Create scheduler. Call start() to run it.
+
+        Parameters
+        ----------
+        group_ids
+            ids of groups to refresh.
+        builders
+            key is resource name of snapshot and value is function to build dataset from group id.
+        interval_sec
+            seconds between end of a refresh and start of the next, by default GitlabConst.REFRESH_INTERVAL_SEC
+        """
+        self.group_ids = group_ids
+        self.builders = builders
+        self.interval_sec = interval_sec
+        self.errors: dict[tuple[int, str], str] = {}
+        self._stop_event = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        """Check refresh thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start refresh thread. Do nothing if already running."""
+        with self._lock:
+            if self.is_running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="gitlab-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Union[float, None] = None) -> None:
+        """Stop refresh thread after current dataset is built."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self) -> None:
+        """Refresh all datasets repeatedly until stopped."""
+        while not self._stop_event.is_set():
+            self.refresh_all()
+            self._stop_event.wait(self.interval_sec)
+
+    def refresh_all(self) -> None:
+        """Refresh each dataset of each group older than interval. failure of one dataset does not stop others."""
+        for group_id in self.group_ids:
+            for resource, build in self.builders.items():
+                if self._stop_event.is_set():
+                    return
+                saved_at = snapshot.saved_at(group_id, resource)
+                if saved_at is not None and time.time() - saved_at < self.interval_sec:
+                    # published by previous process or another worker recently.
+                    continue
+                start = time.perf_counter()
+                try:
+                    # a view may be building the same dataset on cold start. its snapshot is used if published.
+                    snapshot.refresh(group_id, resource, lambda: build(group_id), max_age_sec=self.interval_sec)
+                except Exception as e:
+                    logger.error(f"Failed to refresh {resource} of group {group_id}", exc_info=True)
+                    self.errors[(group_id, resource)] = repr(e)
+                    continue
+                self.errors.pop((group_id, resource), None)
+                logger.info(f"Refreshed {resource} of group {group_id} in {time.perf_counter() - start:.1f} sec")
+
+
+scheduler: Union[RefreshScheduler, None] = None
+__scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RefreshScheduler:
+    """Create (or return pre exists) scheduler of GitlabConst.GROUP_IDS shared in the process."""
+    global scheduler
+    with __scheduler_lock:
+        if scheduler is None:
+            scheduler = RefreshScheduler(GitlabConst.GROUP_IDS, get_default_builders())
+    return scheduler
+
+
+def start_scheduler() -> RefreshScheduler:
+    """Start the shared scheduler if not running. Safe to call on every rerun of streamlit."""
+    shared_scheduler = get_scheduler()
+    shared_scheduler.start()
+    return shared_scheduler
+
+
+if __name__ == "__main__":
+    get_scheduler().run_forever()
@@ -0,0 +1,91 @@
+"""Provide typed schema of issue and mergerequest datasets."""
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    """Dtypes of cols kept in dataset. cols not in schema are dropped, missing cols are not added."""
+
+    int_cols: tuple[str, ...] = ()
+    datetime_cols: tuple[str, ...] = ()
+    date_cols: tuple[str, ...] = ()
+    category_cols: tuple[str, ...] = ()
+    object_cols: tuple[str, ...] = ()
+
+    @property
+    def cols(self) -> tuple[str, ...]:
+        """Return all cols kept in dataset."""
+        return self.int_cols + self.datetime_cols + self.date_cols + self.category_cols + self.object_cols
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop unused cols and convert dtypes.
+
+        Parameters
+        ----------
+        df
+            dataset made from flattened dicts of gitlab api.
+
+        Returns
+        -------
+        pd.DataFrame
+            typed dataset. order of cols is kept.
+            ints are nullable Int64, datetimes are UTC, dates are naive and categories are category.
+        """
+        kept_cols = set(self.cols)
+        typed_df = df[[c for c in df.columns if c in kept_cols]].copy()
+        for col in typed_df.columns:
+            if col in self.int_cols:
+                typed_df[col] = pd.to_numeric(typed_df[col]).astype("Int64")
+            elif col in self.datetime_cols:
+                typed_df[col] = pd.to_datetime(typed_df[col], utc=True)
+            elif col in self.date_cols:
+                typed_df[col] = pd.to_datetime(typed_df[col], format="%Y-%m-%d")
+            elif col in self.category_cols:
+                typed_df[col] = typed_df[col].astype("category")
+        return typed_df
+
+
+ISSUE_SCHEMA = DatasetSchema(
+    int_cols=("id", "iid", "project_id", "user_notes_count", "upvotes", "downvotes", "weight"),
+    datetime_cols=("created_at", "updated_at", "closed_at"),
+    date_cols=("due_date",),
+    category_cols=("state", "author-username", "assignee-username", "closed_by-username", "milestone-title"),
+    object_cols=("title", "labels", "web_url"),
+)
+
+MERGEREQUEST_SCHEMA = DatasetSchema(
+    int_cols=(
+        "id",
+        "iid",
+        "project_id",
+        "group_id",
+        "user_notes_count",
+        "upvotes",
+        "downvotes",
+        "total_commits",
+        "total_additions",
+        "total_deletions",
+        "total_changes",
+        "total_changed_file_count",
+    ),
+    datetime_cols=("created_at", "updated_at", "merged_at", "closed_at"),
+    category_cols=(
+        "state",
+        "target_branch",
+        "source_branch",
+        "merge_status",
+        "author-username",
+        "assignee-username",
+        "merged_by-username",
+        "milestone-title",
+    ),
+    # changes_count is string like "1000+" if too many files are changed.
+    object_cols=("title", "labels", "web_url", "changes_count", "diff"),
+)
+
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """Return memory usage of dataset including contents of object cols in MiB."""
+    return df.memory_usage(deep=True).sum() / 1024**2
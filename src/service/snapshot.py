@@ -0,0 +1,192 @@
+"""Provide datasets restored from snapshots on local disk."""
+import threading
+from typing import Callable, Union
+
+import pandas as pd
+
+from common import GitlabConst, errors, metrics
+from common.Logger import get_logger
+from repository.snapshot_store import get_snapshot_store
+
+logger = get_logger()
+
+# key of DataFrame.attrs has number of rows failed to fetch temporarily. such dataset is not saved as snapshot.
+FAILED_ROWS_ATTR = "failed_rows"
+
+Deriver = Callable[[pd.DataFrame], pd.DataFrame]
+
+# tables made from dataset of each resource, published next to its snapshot. see register_derived.
+derivers: dict[str, dict[str, Deriver]] = {}
+__derivers_lock = threading.Lock()
+
+# dataset of each group and resource is built by one caller at a time. others wait and read its snapshot.
+__refresh_locks: dict[tuple[int, str], threading.Lock] = {}
+__refresh_locks_lock = threading.Lock()
+
+
+def load_or_build(
+    group_id: int, resource: str, build: Callable[[], pd.DataFrame], max_age_sec: Union[float, None] = None
+) -> pd.DataFrame:
+    """Load snapshot of the dataset if it is fresh enough. Otherwise build dataset and save it as snapshot.
+
+    Parameters
+    ----------
+    group_id
+        target group.
+    resource
+        resource type like sync.RESOURCE_ISSUES.
+    build
+        function to make dataset from gitlab.
+    max_age_sec
+        max age of snapshot to use, by default GitlabConst.SNAPSHOT_MAX_AGE_SEC
+
+    Returns
+    -------
+    pd.DataFrame
+        dataset of the group. may lack rows failed to fetch, see FAILED_ROWS_ATTR.
+    """
+    if max_age_sec is None:
+        max_age_sec = GitlabConst.SNAPSHOT_MAX_AGE_SEC
+    df = __load_fresh(group_id, resource, max_age_sec)
+    metrics.count_cache("snapshot", df is not None)
+    if df is not None:
+        return df
+    try:
+        return refresh(group_id, resource, build, max_age_sec=max_age_sec)
+    except errors.IncompleteDatasetError as e:
+        # view shows rows fetched so far with warning of FAILED_ROWS_ATTR.
+        logger.warning(str(e))
+        return e.df
+
+
+@metrics.timed("service")
+def refresh(
+    group_id: int, resource: str, build: Callable[[], pd.DataFrame], *, max_age_sec: Union[float, None] = None
+) -> pd.DataFrame:
+    """Build dataset and replace its snapshot. Builds of the same dataset run one at a time.
+
+    Parameters
+    ----------
+    group_id
+        target group.
+    resource
+        resource type like sync.RESOURCE_ISSUES.
+    build
+        function to make dataset from gitlab.
+    max_age_sec
+        if given, snapshot younger than it is returned instead of building, like the one published
+        by another caller while this caller waited, by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        built dataset. if saved, typed dataset loaded from the snapshot.
+
+    Raises
+    ------
+    errors.IncompleteDatasetError
+        some rows failed to fetch temporarily. snapshot is not replaced. built dataset is kept in the error.
+    """
+    with __refresh_lock(group_id, resource):
+        if max_age_sec is not None:
+            fresh_df = __load_fresh(group_id, resource, max_age_sec)
+            if fresh_df is not None:
+                return fresh_df
+        df = build()
+        if df.attrs.get(FAILED_ROWS_ATTR):
+            raise errors.IncompleteDatasetError(resource, group_id, df.attrs[FAILED_ROWS_ATTR], df)
+        store = get_snapshot_store()
+        if store.save(group_id, resource, df):
+            __save_derived(group_id, resource, df)
+            # return typed dataset same as the one loaded by next process.
+            saved_df = store.load(group_id, resource)
+            if saved_df is not None:
+                return saved_df
+        return df
+
+
+def saved_at(group_id: int, resource: str) -> Union[float, None]:
+    """Return unix time the latest snapshot was published, or None if never published."""
+    return get_snapshot_store().saved_at(group_id, resource)
+
+
+def load_published(group_id: int, resource: str) -> Union[pd.DataFrame, None]:
+    """Load the latest published snapshot regardless of its age, or None if never published."""
+    return get_snapshot_store().load(group_id, resource)
+
+
+def register_derived(resource: str, table: str, derive: Deriver) -> None:
+    """Publish table made from dataset of the resource whenever its snapshot is replaced.
+
+    Views load the table by load_derived instead of making it from the dataset on each version.
+
+    Parameters
+    ----------
+    resource
+        resource type like sync.RESOURCE_MERGEREQUESTS.
+    table
+        name of the table like diff.
+    derive
+        function to make the table from the dataset.
+    """
+    with __derivers_lock:
+        derivers.setdefault(resource, {})[table] = derive
+
+
+def load_derived(group_id: int, resource: str, table: str) -> Union[pd.DataFrame, None]:
+    """Load table published with the latest snapshot of the dataset.
+
+    Parameters
+    ----------
+    group_id
+        target group.
+    resource
+        resource type of the dataset like sync.RESOURCE_MERGEREQUESTS.
+    table
+        name of the table given to register_derived.
+
+    Returns
+    -------
+    Union[pd.DataFrame, None]
+        the table, or None if it is not published with the latest snapshot, like when making it failed.
+    """
+    store = get_snapshot_store()
+    dataset_saved_at = store.saved_at(group_id, resource)
+    table_saved_at = store.saved_at(group_id, derived_resource(resource, table))
+    # table is saved after its dataset, so older table was made from previous dataset.
+    if dataset_saved_at is None or table_saved_at is None or table_saved_at < dataset_saved_at:
+        return None
+    return store.load(group_id, derived_resource(resource, table))
+
+
+def derived_resource(resource: str, table: str) -> str:
+    """Return resource name of the snapshot of table made from dataset of the resource."""
+    return f"{resource}-{table}"
+
+
+def __save_derived(group_id: int, resource: str, df: pd.DataFrame) -> None:
+    with __derivers_lock:
+        tables = dict(derivers.get(resource, {}))
+    store = get_snapshot_store()
+    for table, derive in tables.items():
+        try:
+            store.save(group_id, derived_resource(resource, table), derive(df))
+        except Exception:
+            # dataset is already published. views make the table from it instead.
+            logger.warning(f"Failed to make {table} of {resource} in group {group_id}", exc_info=True)
+
+
+def __refresh_lock(group_id: int, resource: str) -> threading.Lock:
+    with __refresh_locks_lock:
+        return __refresh_locks.setdefault((group_id, resource), threading.Lock())
+
+
+def __load_fresh(group_id: int, resource: str, max_age_sec: float) -> Union[pd.DataFrame, None]:
+    store = get_snapshot_store()
+    age = store.age(group_id, resource)
+    if age is not None and age <= max_age_sec:
+        df = store.load(group_id, resource)
+        if df is not None:
+            logger.debug(f"Load snapshot of {resource} in group {group_id} saved {age:.0f} sec ago")
+            return df
+    return None
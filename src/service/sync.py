@@ -0,0 +1,64 @@
+"""Provide incremental sync of group resources."""
+from typing import Any, Callable, Union
+
+import pandas as pd
+
+from common.Logger import get_logger
+from repository.sync_store import get_sync_store
+
+logger = get_logger()
+
+RESOURCE_ISSUES = "issues"
+RESOURCE_MERGEREQUESTS = "mergerequests"
+
+
+class PartialRows(list):
+    """Rows fetched successfully. Rows failed to fetch are left out and fetched again by next sync."""
+
+    def __init__(self, rows: list[dict[str, Any]], failed_updated_ats: list[str]) -> None:
+        """Keep rows and updated_at of rows failed to fetch.
+
+        Parameters
+        ----------
+        rows
+            rows fetched successfully.
+        failed_updated_ats
+            updated_at of rows failed to fetch.
+        """
+        super().__init__(rows)
+        self.failed_updated_ats = failed_updated_ats
+
+
+def sync_group_rows(
+    group_id: int, resource: str, fetch_rows: Callable[[Union[str, None]], list[dict[str, Any]]]
+) -> list[dict[str, Any]]:
+    """Fetch rows updated after previous sync and merge them into stored rows.
+
+    Parameters
+    ----------
+    group_id
+        target group.
+    resource
+        resource type like RESOURCE_ISSUES.
+    fetch_rows
+        function to fetch rows updated after given datetime(None at first sync).
+        each row must have id and updated_at. return PartialRows if some rows failed to fetch.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        all rows of the group.
+    """
+    store = get_sync_store()
+    mark = store.get_mark(group_id, resource)
+    rows = fetch_rows(mark)
+    logger.debug(f"Sync {len(rows)} {resource} of group {group_id} updated after {mark}")
+    if rows:
+        # updated_after includes the mark itself, so the latest row of previous sync is fetched again and replaced.
+        updated_ats = [row["updated_at"] for row in rows] + ([mark] if mark else [])
+        high_water_mark = max(updated_ats, key=pd.Timestamp)
+        if isinstance(rows, PartialRows) and rows.failed_updated_ats:
+            # keep mark at or before failed rows so that next sync fetches them again.
+            high_water_mark = min([high_water_mark, *rows.failed_updated_ats], key=pd.Timestamp)
+        store.merge(group_id, resource, rows, high_water_mark)
+    return store.load_rows(group_id, resource)
@@ -0,0 +1,44 @@
+"""Create diagnostics view shows metrics of this process."""
+import pandas as pd
+import streamlit as st
+
+from common import metrics
+
+
+def create_diagnostics_view():
+    """Create a view of latency, api calls and cache hit ratio collected in this server process."""
+    st.markdown("# Diagnostics")
+    registry = metrics.get_registry()
+
+    st.markdown("## Latency of functions")
+    latency_df = pd.DataFrame(registry.collect(metrics.FUNCTION_SECONDS) + registry.collect(metrics.STAGE_SECONDS))
+    if latency_df.empty:
+        st.info("No function has been called yet.")
+    else:
+        st.dataframe(latency_df.sort_values("sum", ascending=False))
+
+    st.markdown("## Gitlab API calls")
+    calls_df = pd.DataFrame(registry.collect(metrics.API_CALLS))
+    if calls_df.empty:
+        st.info("No request has been sent yet.")
+    else:
+        calls_df = calls_df.groupby(["endpoint", "status"], as_index=False)["value"].sum()
+        bytes_df = pd.DataFrame(registry.collect(metrics.DOWNLOADED_BYTES)).rename(columns={"value": "bytes"})
+        calls_df = calls_df.merge(bytes_df.groupby("endpoint", as_index=False)["bytes"].sum(), on="endpoint")
+        st.dataframe(calls_df.rename(columns={"value": "calls"}).sort_values("calls", ascending=False))
+
+    st.markdown("## Cache hit ratio")
+    st.dataframe(__cache_ratio_df(registry))
+
+    with st.expander("Prometheus text"):
+        st.code(registry.to_prometheus())
+
+
+def __cache_ratio_df(registry: metrics.MetricsRegistry) -> pd.DataFrame:
+    hits = {row["cache"]: row["value"] for row in registry.collect(metrics.CACHE_HITS)}
+    misses = {row["cache"]: row["value"] for row in registry.collect(metrics.CACHE_MISSES)}
+    rows = []
+    for cache in sorted(hits.keys() | misses.keys()):
+        hit, miss = hits.get(cache, 0), misses.get(cache, 0)
+        rows.append({"cache": cache, "hits": hit, "misses": miss, "hit_ratio": hit / (hit + miss)})
+    return pd.DataFrame(rows, columns=["cache", "hits", "misses", "hit_ratio"])
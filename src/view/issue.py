@@ -1,71 +1,55 @@
 """Create issue view."""
-import datetime
 from typing import Union
 
 import altair as alt
 import pandas as pd
 import streamlit as st
 
-from common import Const
-from common import util as common_util
+from common import Const, GitlabConst, metrics
+from service import rollup, snapshot, sync
 from service.issue import make_issue_df
 from view import util
 
 
+@metrics.timed("view")
 def create_issue_view(group_id: int):
     """Create streamlit view of issues."""
-    df = __fetch_dataset(group_id)
+    df = __fetch_dataset(group_id, __dataset_version(group_id))
+    util.show_data_age(snapshot.saved_at(group_id, sync.RESOURCE_ISSUES))
     if df.empty:
         st.error("No issue found in this group.")
         return
-    filtered_df = util.filter_by_projects(df, group_id)
-    if filtered_df.empty:
+    pj_ids, pj_id_name_map = util.select_projects(group_id)
+    df["project_name"] = df["project_id"].map(pj_id_name_map).astype("category")
+    # aggregated once per dataset version. widget changes only slice the tables.
+    issue_rollup = rollup.get_rollup(rollup.ROLLUP_ISSUES, group_id, df)
+    if issue_rollup.slice(rollup.TABLE_STATE, pj_ids).empty:
         st.error("No issue found in this project.")
         return
 
-    create_count_of_created_issue_view(filtered_df)
-    create_count_of_closed_issue_view(filtered_df)
-    # TODO: add filter selector. filter should be used globally?
-    create_assigned_issue_count_view(filtered_df)
-    create_label_issues_view(filtered_df)
-    util.show_table("Detail", df)
-
-
-def create_count_of_created_issue_view(issue_df: pd.DataFrame):
-    """Create charts of created issues."""
     st.markdown("## Created Issues")
-    util.create_count_of_created_view(issue_df)
-
-
-def create_count_of_closed_issue_view(issue_df: pd.DataFrame):
-    """Create charts of closed issues."""
+    util.create_count_of_period_view(
+        util.slice_period_counts(issue_rollup, rollup.TABLE_CREATED, pj_ids, pj_id_name_map)
+    )
     st.markdown("## Closed Issues")
-    closed_df = issue_df[issue_df["state"] == "closed"].copy()
-    util.create_count_of_created_view(closed_df)
-
-
-def create_assigned_issue_count_view(
-    issue_df: pd.DataFrame,
-    *,
-    state: Union[str, None] = None,
-    project_ids: Union[list[int], None] = None,
-    due_date: Union[tuple[datetime.date], None] = None,
-    labels: Union[list[str], None] = None
-):
-    """Create a chart of counting issues for assignees."""
+    util.create_count_of_period_view(
+        util.slice_period_counts(issue_rollup, rollup.TABLE_CLOSED, pj_ids, pj_id_name_map)
+    )
+    # TODO: add filter selector. filter should be used globally?
     st.markdown("## Assigned Issues")
-    target_cols = ["id", "project_id", "assignee-username", "labels", "state", "due_date"]
-    df = __filter_issues(issue_df[target_cols], state=state, project_ids=project_ids, due_date=due_date, labels=labels)
+    __show_assigned_issue_count_chart(issue_rollup.slice(rollup.TABLE_ASSIGNEE_STATE, pj_ids))
+    st.markdown("## Issues for each labels")
+    __show_label_issue_count_chart(issue_rollup.slice(rollup.TABLE_LABEL_STATE, pj_ids))
+    util.show_table("Detail", df)
 
-    df["assignee-username"] = df["assignee-username"].fillna("Not Assigned!")
-    df["count"] = 0
-    agg_df = df.groupby(["assignee-username", "state"], as_index=False).count()
+
+def __show_assigned_issue_count_chart(agg_df: pd.DataFrame):
     chart = (
         alt.Chart(agg_df)
         .mark_bar()
         .encode(
             x=alt.X("assignee-username", title="assignee"),
-            y=alt.Y("id", title="issue count"),
+            y=alt.Y("count", title="issue count"),
             color="state",
             tooltip=["assignee-username", "state", "count"],
         )
@@ -73,28 +57,13 @@ def create_assigned_issue_count_view(
     st.altair_chart(chart)
 
 
-def create_label_issues_view(
-    issue_df: pd.DataFrame,
-    *,
-    state: Union[str, None] = None,
-    project_ids: Union[list[int], None] = None,
-    due_date: Union[tuple[datetime.date], None] = None,
-    labels: Union[list[str], None] = None
-):
-    """Create a chart of issue count by labels."""
-    st.markdown("## Issues for each labels")
-    target_cols = ["id", "project_id", "labels", "state", "due_date"]
-    df = __filter_issues(issue_df[target_cols], state=state, project_ids=project_ids, due_date=due_date, labels=labels)
-    df = df.explode("labels").fillna("No label set!")
-    df["count"] = 0
-
-    agg_df = df.groupby(["labels", "state"], as_index=False).count()
+def __show_label_issue_count_chart(agg_df: pd.DataFrame):
     chart = (
         alt.Chart(agg_df)
         .mark_bar()
         .encode(
             x=alt.X("labels", title="label"),
-            y=alt.Y("id", title="issue count"),
+            y=alt.Y("count", title="issue count"),
             color="state",
             tooltip=["labels", "state", "count"],
         )
@@ -102,34 +71,17 @@ def create_label_issues_view(
     st.altair_chart(chart)
 
 
-def __filter_issues(
-    issue_df: pd.DataFrame,
-    *,
-    state: Union[str, None] = None,
-    project_ids: Union[list[int], None] = None,
-    due_date: Union[tuple[datetime.date], None] = None,
-    labels: Union[list[str], None] = None
-) -> pd.DataFrame:
-    df = issue_df.copy()
-    # NOTE: due_date is tuple.
-    #       if len(due_date) == 2, filter between two date. if len(due_date) == 1, filter until due_date.
-    # NOTE: create class for filter condition is better.
-    if state:
-        df = df[df["state"] == state]
-    if project_ids:
-        df = df[df["project_id"].isin(project_ids)]
-    if common_util.len_nullable_list(due_date) > 1:
-        df = df[df["due_date"] > due_date[0]]
-        df = df[df["due_date"] < due_date[1]]
-    elif common_util.len_nullable_list(due_date) == 1:
-        df = df[df["due_date"] < due_date]
-    if labels:
-        df = df[df["labels"].isin(labels)]
-    if isinstance(df, pd.Series):
-        df = df.to_frame()
-    return df
+def __dataset_version(group_id: int) -> Union[float, None]:
+    # published snapshot is refreshed by scheduler, so cached dataset is reloaded only when it is replaced.
+    if not GitlabConst.BACKGROUND_REFRESH:
+        return None
+    return snapshot.saved_at(group_id, sync.RESOURCE_ISSUES)
 
 
 @st.cache(ttl=Const.ST_CACHE_TIME_SHORT, suppress_st_warning=True, allow_output_mutation=True)
-def __fetch_dataset(group_id: int) -> pd.DataFrame:
-    return make_issue_df(group_id)
+def __fetch_dataset(group_id: int, version: Union[float, None] = None) -> pd.DataFrame:
+    if version is not None:
+        df = snapshot.load_published(group_id, sync.RESOURCE_ISSUES)
+        if df is not None:
+            return df
+    return make_issue_df(group_id, incremental=GitlabConst.INCREMENTAL_SYNC, use_snapshot=GitlabConst.SNAPSHOT)
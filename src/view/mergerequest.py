@@ -1,12 +1,13 @@
 """Create issue view."""
-import copy
-from collections import defaultdict as dd
+from typing import Union
 
 import altair as alt
 import pandas as pd
 import streamlit as st
 
-from service.mergerequest import make_mergerequest_df
+from common import Const, GitlabConst, metrics
+from service import rollup, snapshot
+from service.mergerequest import DIFF_TABLE, get_resource, make_diff_df, make_mergerequest_df
 from view import util
 
 size_view_tooltip = [
@@ -28,6 +29,7 @@ size_view_tooltip = [
 ]
 
 
+@metrics.timed("view")
 def create_mergerequest_view(group_id: int):
     """Create a view of streamlit MRs."""
     st.markdown("# Merge Requests")
@@ -35,29 +37,36 @@ def create_mergerequest_view(group_id: int):
     # pj_names = [pj.name for pj in pj_in_groups]
     # target_pj_names = st.multiselect("Select projects to fetch MergeRequests", pj_names, pj_names)
     # df = make_mergerequest_df(group_id, target_pj_names=target_pj_names, from_streamlit_view=True)
-    df = __fetch_mergerequest_dataset(group_id)
+    version = __dataset_version(group_id)
+    df = __fetch_mergerequest_dataset(group_id, version)
+    util.show_data_age(snapshot.saved_at(group_id, get_resource()))
+    if df.attrs.get(snapshot.FAILED_ROWS_ATTR):
+        st.warning(
+            f"{df.attrs[snapshot.FAILED_ROWS_ATTR]} merge requests could not be fetched from Gitlab and are hidden. "
+            "They are fetched again on next reload."
+        )
     if df.empty:
         st.error("No merge request found in this group.")
         return
-    filtered_df = util.filter_by_projects(df, group_id)
+    pj_ids, pj_id_name_map = util.select_projects(group_id)
+    df["project_name"] = df["project_id"].map(pj_id_name_map).astype("category")
+    filtered_df = df[df["project_id"].isin(pj_ids)]
     if filtered_df.empty:
         st.error("No merge request found in this project.")
 
-    create_count_of_created_mr_view(filtered_df)
+    # aggregated once per dataset version. widget changes only slice the tables.
+    mr_rollup = rollup.get_rollup(rollup.ROLLUP_MERGEREQUESTS, group_id, df)
+    st.markdown("## Created MergeRequests")
+    st.markdown("Check how many merge requests have been issued for each period.")
+    util.create_count_of_period_view(util.slice_period_counts(mr_rollup, rollup.TABLE_CREATED, pj_ids, pj_id_name_map))
     create_size_view(filtered_df)
-    create_changed_amount_view(filtered_df)
+    create_changed_amount_view(filtered_df, __fetch_diff_dataset(group_id, version))
 
     st.markdown("## Detail")
     util.show_table("All of MergeRequests", df)
 
 
-def create_count_of_created_mr_view(mergerequest_df: pd.DataFrame):
-    """Create charts of counting created issues."""
-    st.markdown("## Created MergeRequests")
-    st.markdown("Check how many merge requests have been issued for each period.")
-    util.create_count_of_created_view(mergerequest_df)
-
-
+@metrics.timed("view")
 def create_size_view(mergerequest_df: pd.DataFrame):
     """Create chart to show size of MRs.."""
     st.markdown("## Size of MergeRequests")
@@ -85,9 +94,8 @@ def create_size_view(mergerequest_df: pd.DataFrame):
     df["mean_deletions"] = df["total_deletions"] / df["total_commits"]
 
     # if target project never merged requests, merged_by-username does not exists.
-    tooltip = copy.deepcopy(size_view_tooltip)
-    if "merged_by-username" not in df.columns:
-        tooltip.remove("merged_by-username")
+    # changes_count exists only in fast stats mode, which fetches changes of each merge request.
+    tooltip = [col for col in size_view_tooltip if col in df.columns]
     chart = (
         alt.Chart(df)
         .mark_point()
@@ -102,25 +110,35 @@ def create_size_view(mergerequest_df: pd.DataFrame):
     st.altair_chart(chart, use_container_width=True)
 
 
-def create_changed_amount_view(merge_request_df: pd.DataFrame):
-    """Create chart to show how many changes in the repository."""
+@metrics.timed("view")
+def create_changed_amount_view(merge_request_df: pd.DataFrame, diff_df: Union[pd.DataFrame, None] = None):
+    """Create chart to show how many changes in the repository.
+
+    Parameters
+    ----------
+    merge_request_df
+        dataset of merge requests has project_name.
+    diff_df
+        dataset made by make_diff_df, by default made from merge_request_df.
+    """
     st.markdown("## Amount of changes.")
     st.markdown(
         "Check how much of each file has been modified and the number of modifications. "
         "Files that are changed frequently and in large amounts may have too much responsibility."
     )
-    df = merge_request_df.copy()
+    if diff_df is None:
+        diff_df = make_diff_df(merge_request_df)
 
-    target_projects = sorted(set(df["project_name"]))
+    target_projects = sorted(set(merge_request_df["project_name"].dropna()))
     view_target_project = st.selectbox("Select target project you want to see graphs", target_projects, 0)
-    df = df[df["project_name"] == view_target_project]
-    total_diffs = __sum_diffs(df["diff"].to_list())
-    diff_df = pd.DataFrame(
-        [
-            {"file_path": k, "add": v["add"], "del": v["del"], "change_cnt": v["change_cnt"]}
-            for k, v in total_diffs.items()
-        ]
+    mr_ids = merge_request_df.loc[merge_request_df["project_name"] == view_target_project, "id"]
+    diff_df = (
+        diff_df[diff_df["mr_id"].isin(mr_ids)]
+        .groupby("file_path", observed=True)[["add", "del", "change_cnt"]]
+        .sum()
+        .reset_index()
     )
+    diff_df["file_path"] = diff_df["file_path"].astype(str)
     diff_df["total_changes"] = diff_df["add"] + diff_df["del"]
     diff_df["add/del"] = diff_df["add"] / (diff_df["del"] + 1)
     diff_df = diff_df.sort_values("total_changes", ascending=False).reset_index()
@@ -142,17 +160,30 @@ def create_changed_amount_view(merge_request_df: pd.DataFrame):
     st.altair_chart(chart, use_container_width=True)
 
 
-@st.cache(allow_output_mutation=True, suppress_st_warning=True)
-def __fetch_mergerequest_dataset(group_id) -> pd.DataFrame:
-    return make_mergerequest_df(group_id, from_streamlit_view=True)
+def __dataset_version(group_id: int) -> Union[float, None]:
+    # published snapshot is refreshed by scheduler, so cached dataset is reloaded only when it is replaced.
+    if not GitlabConst.BACKGROUND_REFRESH:
+        return None
+    return snapshot.saved_at(group_id, get_resource())
+
+
+@st.cache(ttl=Const.ST_CACHE_TIME_SHORT, allow_output_mutation=True, suppress_st_warning=True)
+def __fetch_mergerequest_dataset(group_id: int, version: Union[float, None] = None) -> pd.DataFrame:
+    if version is not None:
+        df = snapshot.load_published(group_id, get_resource())
+        if df is not None:
+            return df
+    return make_mergerequest_df(
+        group_id, from_streamlit_view=True, incremental=GitlabConst.INCREMENTAL_SYNC, use_snapshot=GitlabConst.SNAPSHOT
+    )
 
 
-def __sum_diffs(diffs: list[dict]):
-    """Sum git diffs."""
-    total_diffs = dd(dict)
-    for commit_diff in diffs:
-        for file_path, diff in commit_diff.items():
-            total_diffs[file_path]["add"] = total_diffs[file_path].get("add", 0) + diff["add"]
-            total_diffs[file_path]["del"] = total_diffs[file_path].get("del", 0) + diff["del"]
-            total_diffs[file_path]["change_cnt"] = total_diffs[file_path].get("change_cnt", 0) + diff["change_cnt"]
-    return total_diffs
+@st.cache(ttl=Const.ST_CACHE_TIME_SHORT, allow_output_mutation=True, suppress_st_warning=True)
+def __fetch_diff_dataset(group_id: int, version: Union[float, None] = None) -> pd.DataFrame:
+    df = __fetch_mergerequest_dataset(group_id, version)
+    # diff table is published with the snapshot of MRs. make it here only if MRs are not the published ones.
+    if (version is not None or GitlabConst.SNAPSHOT) and not df.attrs.get(snapshot.FAILED_ROWS_ATTR):
+        diff_df = snapshot.load_derived(group_id, get_resource(), DIFF_TABLE)
+        if diff_df is not None:
+            return diff_df
+    return make_diff_df(df)
@@ -1,4 +1,6 @@
 """Provide utility functions for make view."""
+import datetime
+import time
 from typing import Union
 
 import altair as alt
@@ -7,7 +9,7 @@ import streamlit as st
 from st_aggrid import AgGrid
 from st_aggrid.grid_options_builder import GridOptionsBuilder
 
-from service import project
+from service import project, rollup
 
 VIEW_TARGETS = ("issues", "merge_requests")
 
@@ -34,6 +36,21 @@ def show_table(
     return grid
 
 
+def show_data_age(saved_at: Union[float, None]):
+    """Show how old the dataset is.
+
+    Parameters
+    ----------
+    saved_at
+        unix time the dataset was published. if None, show nothing.
+    """
+    if saved_at is None:
+        return
+    age_min = (time.time() - saved_at) / 60
+    saved_datetime = datetime.datetime.fromtimestamp(saved_at)
+    st.caption(f"Data updated {age_min:.0f} min ago ({saved_datetime:%Y-%m-%d %H:%M:%S})")
+
+
 def to_datetime(series: pd.Series, fmt: str = "%Y-%m-%dT%H:%M:%S.%f%z") -> pd.Series:
     """Convert string to datetime.
 
@@ -47,27 +64,25 @@ def to_datetime(series: pd.Series, fmt: str = "%Y-%m-%dT%H:%M:%S.%f%z") -> pd.Se
     Returns
     -------
     pd.Series
-        converted col.
+        converted col. if series is already datetime, return it as is.
     """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
     return pd.to_datetime(series, format=fmt)
 
 
-def filter_by_projects(df: pd.DataFrame, group_id: int, add_pj_name_col: bool = True) -> pd.DataFrame:
-    """Filter dataframe by user selected project.
+def select_projects(group_id: int) -> tuple[list[int], dict[int, str]]:
+    """Show selector of projects in the group.
 
     Parameters
     ----------
-    df
-        base dataset.
     group_id
         id of target group.
-    add_pj_name_col
-        flags to add col of project_name, by default True
 
     Returns
     -------
-    pd.DataFrame
-        filtered dataset.
+    tuple[list[int], dict[int, str]]
+        ids of selected projects and map of project id to name of all projects in the group.
     """
     pj_name_id_map = {p.name: p.id for p in project.list_project(group_id)}
     pj_id_name_map = {v: k for k, v in pj_name_id_map.items()}
@@ -76,45 +91,57 @@ def filter_by_projects(df: pd.DataFrame, group_id: int, add_pj_name_col: bool =
     pj_names = st.multiselect(
         "Select projects you want to see graphs", sorted(pj_name_id_map.keys()), pj_name_id_map.keys()
     )
-    pj_ids = [pj_name_id_map[n] for n in pj_names]
-    if add_pj_name_col:
-        df["project_name"] = df["project_id"].map(pj_id_name_map)
-    filtered_df = df[df["project_id"].isin(pj_ids)]
-    if filtered_df.empty:
-        st.error("Selected project(s) has no mergerequests!")
-    return filtered_df
+    return [pj_name_id_map[n] for n in pj_names], pj_id_name_map
 
 
-def create_count_of_created_view(dataset_df: pd.DataFrame, datetime_col: str = "created_at"):
-    """Create views of count something like created issues, MRs.
+def create_count_of_period_view(
+    counts: dict[str, pd.DataFrame], datetime_col: str = "created_at", color_col: str = "project_name"
+):
+    """Create views of pre counted rows for each quater, month and week.
 
     Parameters
     ----------
-    dataset_df
-        data source of view.
+    counts
+        key is unit of period(Q, M, W) and value has cols of color_col, datetime_col and count.
     datetime_col
-        col name of datetime to use aggregate, by default "created_at"
+        col name of period, by default "created_at"
+    color_col
+        col name of category, by default "project_name"
+    """
+    titles = {"Q": "Count at quater", "M": "Count at month", "W": "Count at week"}
+    for bar, unit in zip(st.columns(len(titles)), titles):
+        with bar:
+            st.markdown(titles[unit])
+            st.altair_chart(create_count_chart(counts[unit], datetime_col, color_col), use_container_width=True)
+
+
+def slice_period_counts(
+    dataset_rollup: rollup.Rollup, prefix: str, project_ids: list[int], pj_id_name_map: dict[int, str]
+) -> dict[str, pd.DataFrame]:
+    """Slice period counts of selected projects from rollup.
+
+    Parameters
+    ----------
+    dataset_rollup
+        rollup of dataset.
+    prefix
+        prefix of period table like rollup.TABLE_CREATED.
+    project_ids
+        ids of selected projects.
+    pj_id_name_map
+        map of project id to name.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        key is unit of period and value has cols of project_id, created_at, count and project_name.
     """
-    df = dataset_df.copy()
-    cnt_bar1, cnt_bar2, cnt_bar3 = st.columns(3)
-    with cnt_bar1:
-        st.markdown("Count at quater")
-        st.altair_chart(
-            create_time_count_chart(df, datetime_col, "Q", "project_name"),
-            use_container_width=True,
-        )
-    with cnt_bar2:
-        st.markdown("Count at month")
-        st.altair_chart(
-            create_time_count_chart(df, datetime_col, "M", "project_name"),
-            use_container_width=True,
-        )
-    with cnt_bar3:
-        st.markdown("Count at week")
-        st.altair_chart(
-            create_time_count_chart(df, datetime_col, "W", "project_name"),
-            use_container_width=True,
-        )
+    counts = {}
+    for unit in rollup.TIME_UNITS:
+        count_df = dataset_rollup.slice(rollup.period_table(prefix, unit), project_ids, keep_project=True)
+        count_df["project_name"] = count_df["project_id"].map(pj_id_name_map)
+        counts[unit] = count_df
+    return counts
 
 
 def count_by_datetime(
@@ -144,29 +171,45 @@ def count_by_datetime(
     return count_df.resample(unit).agg(agg_methods)
 
 
+def count_by_time(df: pd.DataFrame, datetime_col: str, unit: str, color_col: Union[str, None] = None) -> pd.DataFrame:
+    """Count rows in each period (and each category) with single grouped aggregation.
+
+    Parameters
+    ----------
+    df
+        dataset.
+    datetime_col
+        col name of datetime col. string col is parsed by to_datetime.
+    unit
+        aggregate unit of pandas resampling like W(eek), M(onth), Q(uarter).
+    color_col
+        col name of category, by default None
+
+    Returns
+    -------
+    pd.DataFrame
+        cols are color_col(if given), datetime_col and count. periods have no rows are not included.
+    """
+    keys: list[Union[str, pd.Grouper]] = [pd.Grouper(key=datetime_col, freq=unit)]
+    target_cols = [datetime_col]
+    if color_col:
+        keys.insert(0, color_col)
+        target_cols.insert(0, color_col)
+    tmp_df = df[target_cols].copy()
+    tmp_df[datetime_col] = to_datetime(tmp_df[datetime_col])
+    return tmp_df.groupby(keys, observed=True).size().reset_index(name="count")
+
+
 def create_time_count_chart(df: pd.DataFrame, datetime_col: str, unit: str, color_col: Union[str, None] = None):
     """Create a chart of count something by time."""
+    return create_count_chart(count_by_time(df, datetime_col, unit, color_col), datetime_col, color_col)
 
-    def aggregate(df: pd.DataFrame, target_col: str, unit: str):
-        agg_df = df[[target_col, df.columns[0]]].set_index(target_col).resample(unit).agg(["count"])
-        agg_df.columns = ["count"]
-        return agg_df
 
-    tmp_df = df.copy()
-    tmp_df[datetime_col] = to_datetime(tmp_df[datetime_col])
+def create_count_chart(agg_df: pd.DataFrame, datetime_col: str, color_col: Union[str, None] = None):
+    """Create a chart of pre counted rows has count col."""
     tool_tips = ["count", datetime_col]
     if color_col:
         tool_tips.append(color_col)
-        items = set(tmp_df[color_col].to_list())
-        agg_dfs = []
-        for item in items:
-            tmp_agg = aggregate(tmp_df.query(f"{color_col} == '{item}'"), datetime_col, unit)
-            tmp_agg[color_col] = item
-            agg_dfs.append(tmp_agg)
-        agg_df = pd.concat(agg_dfs)
-    else:
-        agg_df = aggregate(tmp_df, datetime_col, unit)
-    agg_df = agg_df.reset_index()
     x_axis = alt.X(datetime_col, title="datetime")
     y_axis = alt.Y("count", title="count")
     return alt.Chart(agg_df).mark_bar().encode(x=x_axis, y=y_axis, color=color_col, tooltip=tool_tips).interactive()
@@ -0,0 +1,71 @@
+"""Upper bounds of requests each dataset sends to gitlab. Fan-out regressions fail here instead of production."""
+import math
+
+import pytest
+
+from service.issue import make_issue_df
+from service.mergerequest import STATS_MODE_COMMIT, STATS_MODE_FAST, make_mergerequest_df
+from tests.fake_gitlab import FakeGitlabSize
+
+PER_PAGE = 100
+
+
+def pages(items: int) -> int:
+    return max(1, math.ceil(items / PER_PAGE))
+
+
+def test_issue_dataset_budget(fake_gitlab, api_call_budget):
+    size = FakeGitlabSize(projects_per_group=3, issues_per_project=100)
+    fake_gitlab(size)
+    issue_pages = pages(size.projects_per_group * size.issues_per_project)
+    # group + pages of issues.
+    with api_call_budget(1 + issue_pages, {"GET /groups/:id/issues": issue_pages}):
+        make_issue_df(1)
+
+
+def test_incremental_issue_dataset_budget(fake_gitlab, api_call_budget):
+    fake_gitlab(FakeGitlabSize(projects_per_group=3, issues_per_project=100))
+    make_issue_df(1, incremental=True)
+    # group is memoized and nothing was updated after previous sync.
+    with api_call_budget(1, {"GET /groups/:id/issues": 1}):
+        make_issue_df(1, incremental=True)
+
+
+def test_snapshot_dataset_budget(fake_gitlab, api_call_budget):
+    fake_gitlab()
+    make_issue_df(1, use_snapshot=True)
+    make_mergerequest_df(1, use_snapshot=True)
+    with api_call_budget(0):
+        make_issue_df(1, use_snapshot=True)
+        make_mergerequest_df(1, use_snapshot=True)
+
+
+@pytest.mark.parametrize("stats_mode", [STATS_MODE_COMMIT, STATS_MODE_FAST])
+def test_mergerequest_dataset_budget(fake_gitlab, api_call_budget, stats_mode):
+    size = FakeGitlabSize(projects_per_group=5, mrs_per_project=10, commits_per_mr=5, shared_commits_per_mr=2)
+    fake_gitlab(size)
+    mrs = size.projects_per_group * size.mrs_per_project
+    # commits shared with the previous MR are fetched only once.
+    new_commits_per_mr = size.commits_per_mr - size.shared_commits_per_mr
+    commits = size.projects_per_group * (size.commits_per_mr + (size.mrs_per_project - 1) * new_commits_per_mr)
+    # group + pages of MRs + single scan of projects + commit list of each MR.
+    budget = 1 + pages(mrs) + pages(size.projects_per_group) + mrs
+    by_endpoint = {"GET /groups/:id/projects": pages(size.projects_per_group), "GET /projects/:id": 0}
+    if stats_mode == STATS_MODE_COMMIT:
+        # stats and diff of each unique commit.
+        budget += 2 * commits
+        by_endpoint["GET /projects/:id/repository/commits/:sha"] = commits
+    else:
+        # changes of each MR.
+        budget += mrs
+    with api_call_budget(budget, by_endpoint):
+        make_mergerequest_df(1, stats_mode=stats_mode)
+
+
+def test_cached_commits_budget(fake_gitlab, api_call_budget):
+    size = FakeGitlabSize(projects_per_group=5, mrs_per_project=10, commits_per_mr=5)
+    fake_gitlab(size)
+    make_mergerequest_df(1)
+    # project index and commit cache are reused, so only listings and commit lists of MRs are requested.
+    with api_call_budget(1 + 1 + size.projects_per_group * size.mrs_per_project):
+        make_mergerequest_df(1)
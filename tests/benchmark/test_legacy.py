@@ -0,0 +1,81 @@
+"""Compare speed of rewritten functions with implementations they replaced.
+
+Equal results are checked by unit tests next to each legacy implementation. These time both and print the ratio.
+"""
+import logging
+import time
+
+import pytest
+
+from common.diffstat import count_diff_lines
+from common.Logger import CustomLogger
+from tests.legacy_impl import (
+    LegacyLogger,
+    legacy_count_by_time,
+    legacy_count_diff_lines,
+    make_dataset,
+    make_diff,
+    make_file_logger,
+)
+from view import util
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_diffstat_against_legacy(capsys):
+    diff = make_diff(200_000)
+    timings = {}
+    for name, func in [("legacy", legacy_count_diff_lines), ("diffstat", count_diff_lines)]:
+        start = time.perf_counter()
+        for _ in range(5):
+            result = func(diff)
+        timings[name] = (time.perf_counter() - start) / 5
+        assert result == legacy_count_diff_lines(diff)
+    with capsys.disabled():
+        print(
+            f"\ncount lines of {len(diff):,} chars diff: legacy {timings['legacy'] * 1000:.2f} ms, "
+            f"diffstat {timings['diffstat'] * 1000:.2f} ms ({timings['legacy'] / timings['diffstat']:.1f}x)"
+        )
+
+
+def test_count_by_time_against_legacy(capsys):
+    df = make_dataset(100_000)
+    start = time.perf_counter()
+    for unit in ["Q", "M", "W"]:
+        legacy_count_by_time(df, "created_at", unit, "project_name")
+    legacy_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed_df = df.copy()
+    parsed_df["created_at"] = util.to_datetime(parsed_df["created_at"])
+    for unit in ["Q", "M", "W"]:
+        util.count_by_time(parsed_df, "created_at", unit, "project_name")
+    grouped_sec = time.perf_counter() - start
+    with capsys.disabled():
+        print(
+            f"\ncount {len(df):,} rows of 50 projects by Q/M/W: legacy {legacy_sec * 1000:.0f} ms, "
+            f"grouped {grouped_sec * 1000:.0f} ms ({legacy_sec / grouped_sec:.1f}x)"
+        )
+
+
+def test_logger_against_legacy(tmp_path, capsys):
+    def measure(logger: logging.Logger, calls: int = 2_000) -> float:
+        start = time.perf_counter()
+        for i in range(calls):
+            logger.debug(f"fetch commit {i}")
+        return (time.perf_counter() - start) / calls * 1_000_000
+
+    legacy = make_file_logger(LegacyLogger("bench_legacy"), tmp_path.joinpath("legacy.log"), logging.DEBUG)
+    # inspect.stack() is too slow to call many times.
+    legacy_us = measure(legacy, 200)
+    fast = make_file_logger(CustomLogger("bench_fast"), tmp_path.joinpath("fast.log"), logging.DEBUG)
+    fast_us = measure(fast)
+    fast.setLevel(logging.INFO)
+    disabled_us = measure(fast)
+    assert fast_us < legacy_us
+    assert disabled_us < fast_us
+    with capsys.disabled():
+        print(
+            f"\nper debug call: legacy {legacy_us:.1f} us, fast {fast_us:.1f} us ({legacy_us / fast_us:.0f}x), "
+            f"disabled level {disabled_us:.2f} us"
+        )
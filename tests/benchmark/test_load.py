@@ -0,0 +1,108 @@
+"""Time datasets and aggregations against local stand-in of gitlab at several sizes.
+
+Each result is appended to BENCHMARK_RESULT_PATH as a json line so that regressions can be tracked across commits.
+Set BENCHMARK_SIZES=small,medium,large to choose sizes. large is skipped by default.
+"""
+import datetime
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from service import rollup
+from service.issue import make_issue_df
+from service.mergerequest import STATS_MODE_COMMIT, STATS_MODE_FAST, make_diff_df, make_mergerequest_df
+from tests.fake_gitlab import FakeGitlabSize
+from view import util
+
+SIZES = {
+    "small": FakeGitlabSize(projects_per_group=2, issues_per_project=20, mrs_per_project=5, commits_per_mr=3),
+    "medium": FakeGitlabSize(projects_per_group=3, issues_per_project=200, mrs_per_project=15, commits_per_mr=4),
+    "large": FakeGitlabSize(projects_per_group=10, issues_per_project=1000, mrs_per_project=50, commits_per_mr=5),
+}
+TARGET_SIZES = os.environ.get("BENCHMARK_SIZES", "small,medium").split(",")
+# every request waits like a request over network.
+LATENCY_SEC = float(os.environ.get("BENCHMARK_LATENCY_SEC", 0.002))
+RESULT_PATH = Path(
+    os.environ.get("BENCHMARK_RESULT_PATH", Path(__file__).parents[2].joinpath("build", "benchmarks", "results.jsonl"))
+)
+
+
+def git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return result.stdout.strip() or "unknown"
+
+
+def record(name: str, size_name: str, seconds: float, **extra: Any) -> dict[str, Any]:
+    result = {
+        "name": name,
+        "size": size_name,
+        "seconds": round(seconds, 4),
+        **extra,
+        "revision": git_revision(),
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+    RESULT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with RESULT_PATH.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    return result
+
+
+def measure(func: Callable[[], Any]) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def report(capsys, result: dict[str, Any]) -> None:
+    extra = ", ".join(f"{k}={v}" for k, v in result.items() if k not in ("name", "size", "seconds", "recorded_at"))
+    with capsys.disabled():
+        print(f"\n{result['name']} [{result['size']}]: {result['seconds']:.3f} sec ({extra})")
+
+
+pytestmark = pytest.mark.benchmark
+size_params = pytest.mark.parametrize("size_name", [s for s in SIZES if s in TARGET_SIZES])
+
+
+@size_params
+def test_benchmark_issue_dataset(fake_gitlab, capsys, size_name):
+    server = fake_gitlab(SIZES[size_name], latency_sec=LATENCY_SEC)
+    df, seconds = measure(lambda: make_issue_df(1))
+    assert len(df) == len(server.data.group_issues[1])
+    report(capsys, record("make_issue_df", size_name, seconds, rows=len(df), api_calls=server.total_requests))
+
+
+@size_params
+@pytest.mark.parametrize("stats_mode", [STATS_MODE_COMMIT, STATS_MODE_FAST])
+def test_benchmark_mergerequest_dataset(fake_gitlab, capsys, size_name, stats_mode):
+    server = fake_gitlab(SIZES[size_name], latency_sec=LATENCY_SEC)
+    df, seconds = measure(lambda: make_mergerequest_df(1, stats_mode=stats_mode))
+    assert len(df) == len(server.data.group_mrs[1])
+    result = record(
+        f"make_mergerequest_df[{stats_mode}]", size_name, seconds, rows=len(df), api_calls=server.total_requests
+    )
+    report(capsys, result)
+
+
+@size_params
+def test_benchmark_aggregations(fake_gitlab, capsys, size_name):
+    fake_gitlab(SIZES[size_name])
+    issue_df = make_issue_df(1)
+    mr_df = make_mergerequest_df(1)
+
+    aggregations = {
+        "rollup.build_rollup[issues]": lambda: rollup.build_rollup(rollup.ROLLUP_ISSUES, issue_df),
+        "rollup.build_rollup[mergerequests]": lambda: rollup.build_rollup(rollup.ROLLUP_MERGEREQUESTS, mr_df),
+        "make_diff_df": lambda: make_diff_df(mr_df),
+        "util.count_by_time[issues]": lambda: util.count_by_time(issue_df, "created_at", "W", "state"),
+    }
+    for name, aggregate in aggregations.items():
+        _, seconds = measure(aggregate)
+        report(capsys, record(name, size_name, seconds, rows=len(issue_df) + len(mr_df)))
@@ -0,0 +1,24 @@
+"""Measure memory of datasets at the size of a large group."""
+import time
+
+import pytest
+
+from service import schema
+from tests.legacy_impl import make_raw_issues
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_memory_of_100k_issues(capsys):
+    raw_df = make_raw_issues(100_000)
+    start = time.perf_counter()
+    typed_df = schema.ISSUE_SCHEMA.apply(raw_df)
+    apply_sec = time.perf_counter() - start
+    raw_mb = schema.memory_usage_mb(raw_df)
+    typed_mb = schema.memory_usage_mb(typed_df)
+    assert typed_mb < raw_mb / 2
+    with capsys.disabled():
+        print(
+            f"\nmemory of {len(raw_df):,} issues: raw {raw_mb:.1f} MiB ({len(raw_df.columns)} cols), "
+            f"typed {typed_mb:.1f} MiB ({len(typed_df.columns)} cols), apply {apply_sec * 1000:.0f} ms"
+        )
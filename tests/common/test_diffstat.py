@@ -0,0 +1,29 @@
+import pytest
+
+from common.diffstat import count_diff_lines
+from tests.legacy_impl import legacy_count_diff_lines, make_diff
+
+
+@pytest.mark.parametrize(
+    "diff, expect",
+    [
+        ("", (0, 0)),
+        ("+added", (1, 0)),
+        ("-removed", (0, 1)),
+        ("@@ -1 +1 @@\n-a\n+b\n c\n\\ No newline at end of file", (1, 1)),
+        ("@@ -1,2 +1,2 @@\n--- removed sql comment\n+++ added\n++added", (2, 1)),
+        ("--- a/file\n+++ b/file\n@@ -1 +1 @@\n-a\n+b", (1, 1)),
+        ("diff --git a/file b/file\nindex 1..2\n--- a/file\n+++ b/file\n@@ -1 +1,2 @@\n a\n+b\n+c", (2, 0)),
+        ("--- a/file\n+++ b/file", (0, 0)),
+        ("--- removed comment\n-a", (0, 2)),
+        ("@@ -1 +1 @@\r\n-a\r\n+b\r\n", (1, 1)),
+    ],
+)
+def test_count_diff_lines(diff, expect):
+    assert count_diff_lines(diff) == expect
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_same_as_legacy(seed):
+    diff = make_diff(1000, seed)
+    assert count_diff_lines(diff) == legacy_count_diff_lines(diff)
@@ -1,10 +1,14 @@
+import inspect
 import logging
+import logging.handlers
 import shutil
+import sys
 from pathlib import Path
 
 import pytest
 
-from common.Logger import get_logger
+from common.Logger import CustomFilter, CustomLogger, get_logger
+from tests.legacy_impl import LegacyLogger, make_file_logger
 
 
 @pytest.fixture()
@@ -16,7 +20,7 @@ def clean_log_dir():
 
 def test_get_logger(clean_log_dir):
     test_log_dir = clean_log_dir
-    logger = get_logger(name=__file__, log_path=test_log_dir.joinpath("test.log"))
+    logger = get_logger(name=__file__, log_path=test_log_dir.joinpath("test.log"), use_queue=False)
     assert len(logger.handlers) == 2
     assert isinstance(logger.handlers[1], logging.FileHandler)
     # test use created logger if same name given
@@ -24,6 +28,25 @@ def test_get_logger(clean_log_dir):
     assert logger != get_logger(test_log_dir)
 
 
+def test_get_logger_with_queue(tmp_path):
+    log_path = tmp_path.joinpath("queue.log")
+    logger = get_logger(name="test_get_logger_with_queue", level=logging.INFO, log_path=log_path, use_queue=True)
+    assert len(logger.handlers) == 1
+    assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+    file_handler = logger.listener.handlers[1]
+    assert isinstance(file_handler, logging.FileHandler)
+    logger.debug("ignored")
+    logger.info("shipped")
+    call_lineno = inspect.currentframe().f_lineno - 1
+    # stop flushes records left in queue.
+    logger.stop_listener()
+    file_handler.close()
+    assert logger.listener is None
+    log_text = log_path.read_text()
+    assert "ignored" not in log_text
+    assert f"test_logger.py:test_get_logger_with_queue:{call_lineno}] -> shipped" in log_text
+
+
 def test_logging():
     logger = get_logger()
     logger.debug("debug")
@@ -31,3 +54,90 @@ def test_logging():
     logger.warning("warning")
     logger.error("error")
     logger.critical("critical")
+
+
+class RecordCollector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def log_from_nested_function(logger: CustomLogger) -> int:
+    def wrapper():
+        logger.debug("wrapped", wrapper_depth=1)
+
+    logger.debug("direct")
+    wrapper()
+    return inspect.currentframe().f_lineno - 1
+
+
+def test_caller_info():
+    logger = CustomLogger("test_caller_info", logging.DEBUG)
+    collector = RecordCollector()
+    logger.addHandler(collector)
+    call_lineno = log_from_nested_function(logger)
+
+    direct, wrapped = collector.records
+    assert direct.real_funcName == "log_from_nested_function"
+    assert direct.real_lineno == call_lineno - 1
+    assert wrapped.real_funcName == "log_from_nested_function"
+    assert wrapped.real_lineno == call_lineno
+    assert direct.real_filename.endswith("test_logger.py")
+
+
+def test_disabled_level_skips_caller_lookup(mocker):
+    logger = CustomLogger("test_disabled_level", logging.INFO)
+    collector = RecordCollector()
+    logger.addHandler(collector)
+    getframe_spy = mocker.spy(sys, "_getframe")
+    logger.debug("ignored")
+    getframe_spy.assert_not_called()
+    logger.info("logged")
+    assert [r.getMessage() for r in collector.records] == ["logged"]
+
+
+def test_debug_sampled():
+    logger = CustomLogger("test_debug_sampled", logging.DEBUG)
+    collector = RecordCollector()
+    logger.addHandler(collector)
+    for i in range(25):
+        logger.debug_sampled(f"fetch {i}", every=10)
+    for i in range(3):
+        logger.debug_sampled(f"other {i}", every=10)
+
+    assert [r.getMessage() for r in collector.records] == [
+        "fetch 0 (sampled 1/10, #1)",
+        "fetch 10 (sampled 1/10, #11)",
+        "fetch 20 (sampled 1/10, #21)",
+        "other 0 (sampled 1/10, #1)",
+    ]
+    assert collector.records[0].real_funcName == "test_debug_sampled"
+    logger.setLevel(logging.INFO)
+    logger.debug_sampled("ignored", every=1)
+    assert len(collector.records) == 4
+
+
+def test_file_handler_kept_open(tmp_path):
+    logger = make_file_logger(CustomLogger("test_file_handler_kept_open"), tmp_path.joinpath("a.log"), logging.DEBUG)
+    logger.debug("first")
+    stream = logger.handlers[0].stream
+    logger.debug("second")
+    assert logger.handlers[0].stream is stream
+    assert tmp_path.joinpath("a.log").read_text().count("->") == 2
+
+
+def test_caller_info_same_as_legacy():
+    records = {}
+    for logger in [LegacyLogger("test_legacy_caller"), CustomLogger("test_fast_caller")]:
+        collector = RecordCollector()
+        logger.addHandler(collector)
+        logger.addFilter(CustomFilter())
+        logger.setLevel(logging.DEBUG)
+        logger.debug("message")
+        records[type(logger)] = collector.records[0]
+    legacy, fast = records[LegacyLogger], records[CustomLogger]
+    assert fast.real_filename == CustomLogger.split_filepath(legacy.real_filename)
+    assert (fast.real_funcName, fast.real_lineno) == (legacy.real_funcName, legacy.real_lineno)
@@ -0,0 +1,121 @@
+import urllib.request
+
+import pytest
+import requests
+
+from common import metrics
+from repository.commit_cache import CommitCache
+
+
+def test_histogram_quantile():
+    histogram = metrics.Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.count == 4
+    assert histogram.total == pytest.approx(6.5)
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+
+
+def test_to_prometheus():
+    registry = metrics.MetricsRegistry()
+    registry.inc(metrics.API_CALLS, endpoint="/groups/:id/issues", status=200)
+    registry.inc(metrics.API_CALLS, endpoint="/groups/:id/issues", status=200)
+    registry.observe(metrics.API_SECONDS, 0.2, endpoint='/a"b')
+    text = registry.to_prometheus()
+    assert f"# TYPE {metrics.API_CALLS} counter" in text
+    assert f'{metrics.API_CALLS}{{endpoint="/groups/:id/issues",status="200"}} 2' in text
+    assert f'{metrics.API_SECONDS}_bucket{{endpoint="/a\\"b",le="0.1"}} 0' in text
+    assert f'{metrics.API_SECONDS}_bucket{{endpoint="/a\\"b",le="0.25"}} 1' in text
+    assert f'{metrics.API_SECONDS}_bucket{{endpoint="/a\\"b",le="+Inf"}} 1' in text
+    assert f'{metrics.API_SECONDS}_count{{endpoint="/a\\"b"}} 1' in text
+    assert registry.counter_value(metrics.API_CALLS, status=200) == 2
+
+
+class Client:
+    def __init__(self, group_id: int):
+        self.group_id = group_id
+
+    @metrics.timed("repository")
+    def fetch(self):
+        return "fetched"
+
+
+@metrics.timed("service")
+def build(group_id: int, fail: bool = False):
+    if fail:
+        raise ValueError("failed")
+    return group_id
+
+
+def test_timed_labels_group():
+    assert Client(3).fetch() == "fetched"
+    assert build(1) == 1
+    assert build(group_id=2) == 2
+    with pytest.raises(ValueError):
+        build(1, fail=True)
+
+    rows = metrics.get_registry().collect(metrics.FUNCTION_SECONDS)
+    counts = {(row["stage"], row["function"], row["group"]): row["count"] for row in rows}
+    assert counts == {
+        ("repository", "Client.fetch", "3"): 1,
+        ("service", "build", "1"): 2,
+        ("service", "build", "2"): 1,
+    }
+    assert metrics.get_registry().counter_value(metrics.FUNCTION_ERRORS, function="build") == 1
+
+
+@pytest.mark.parametrize(
+    "url, endpoint",
+    [
+        ("http://gitlab/api/v4/groups/12/merge_requests?page=2", "/groups/:id/merge_requests"),
+        (
+            "http://gitlab/api/v4/projects/3/repository/commits/abc123/diff",
+            "/projects/:id/repository/commits/:sha/diff",
+        ),
+        (
+            "http://gitlab/api/v4/projects/group%2Fpj/merge_requests/7/commits",
+            "/projects/:id/merge_requests/:id/commits",
+        ),
+    ],
+)
+def test_endpoint_of(url, endpoint):
+    assert metrics.endpoint_of(url) == endpoint
+
+
+def test_record_response():
+    response = requests.Response()
+    response.status_code = 200
+    response.url = "http://gitlab/api/v4/groups/1/issues"
+    response._content = b"[]" * 10
+    response.request = requests.Request("GET", response.url).prepare()
+    metrics.record_response(response)
+
+    registry = metrics.get_registry()
+    assert registry.counter_value(metrics.API_CALLS, endpoint="/groups/:id/issues", status=200) == 1
+    assert registry.counter_value(metrics.DOWNLOADED_BYTES, endpoint="/groups/:id/issues") == 20
+
+
+def test_commit_cache_counts_hit_and_miss(tmp_path):
+    cache = CommitCache(tmp_path, 1024 * 1024)
+    cache.get(1, "sha")
+    cache.put(1, "sha", {"stats": {}})
+    cache.get(1, "sha")
+    cache.get(1, "sha")
+    registry = metrics.get_registry()
+    assert registry.counter_value(metrics.CACHE_HITS, cache="commit") == 2
+    assert registry.counter_value(metrics.CACHE_MISSES, cache="commit") == 1
+
+
+def test_http_server():
+    metrics.get_registry().inc(metrics.CACHE_HITS, cache="commit")
+    server = metrics.start_http_server(0, "127.0.0.1")
+    try:
+        assert metrics.start_http_server(0, "127.0.0.1") is server
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode()
+        assert f'{metrics.CACHE_HITS}{{cache="commit"}} 1' in body
+    finally:
+        metrics.stop_http_server()
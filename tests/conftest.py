@@ -1,5 +1,8 @@
 import sys
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Union
+from urllib.parse import urlparse
 
 import pytest
 from gitlab.client import Gitlab
@@ -7,7 +10,11 @@ from gitlab.v4.objects import GroupManager
 from gitlab.v4.objects.groups import Group
 
 sys.path.append(str(Path(__file__).parents[1].joinpath("src")))
+from common import GitlabConst, metrics
+from repository import accounting, connection, fetch_engine, project_index, response_cache, throttle
 from repository.mapper import GitlabClient
+from service import rollup
+from tests.fake_gitlab import FakeGitlabData, FakeGitlabServer, FakeGitlabSize
 
 
 def make_dummy_client(mocker, has_group: bool = True):
@@ -30,3 +37,85 @@ def make_dummy_client(mocker, has_group: bool = True):
 @pytest.fixture
 def mock_construct_gitlab_client(mocker):
     mocker.patch("repository.mapper.GitlabClient", make_dummy_client(mocker))
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(mocker):
+    """Tests never talk to real gitlab, so skip waiting for the rate limiter and share no throttle."""
+    no_limit = fetch_engine.RateLimiter(0)
+    mocker.patch.dict(fetch_engine.host_limiters, {urlparse(GitlabConst.URL).netloc: no_limit})
+    mocker.patch.dict(throttle.host_throttles, clear=True)
+
+
+@pytest.fixture(autouse=True)
+def tmp_cache_dir(mocker, tmp_path):
+    """Keep local stores of each test apart from others and from the developer's cache."""
+    cache_dir = tmp_path.joinpath("cache")
+    mocker.patch.object(GitlabConst, "CACHE_DIR", cache_dir)
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def clear_project_index(mocker):
+    """Project indexes are shared by group id, so drop them after each test."""
+    mocker.patch.dict(project_index.project_indexes, clear=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_connections(mocker):
+    """Gitlab clients, groups and responses are memoized in the process, so drop them after each test."""
+    mocker.patch.dict(connection.gitlab_clients, clear=True)
+    mocker.patch.dict(connection.groups, clear=True)
+    mocker.patch.object(response_cache, "response_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def clear_rollups(mocker):
+    """Rollups are shared by group id, so drop them after each test."""
+    mocker.patch.dict(rollup.rollups, clear=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics(mocker):
+    """Metrics are collected in the process, so give each test empty registry."""
+    return mocker.patch.object(metrics, "registry", metrics.MetricsRegistry())
+
+
+@pytest.fixture
+def fake_gitlab(mocker):
+    """Start local stand-in of gitlab and point clients to it.
+
+    Call with FakeGitlabSize and options of FakeGitlabServer like latency_sec. Servers are stopped after the test.
+    """
+    servers: list[FakeGitlabServer] = []
+
+    def start(size: FakeGitlabSize = FakeGitlabSize(), *, seed: int = 0, **options) -> FakeGitlabServer:
+        server = FakeGitlabServer(FakeGitlabData(size, seed), seed=seed, **options).start()
+        servers.append(server)
+        mocker.patch.object(GitlabConst, "URL", server.url)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def api_call_budget():
+    """Fail the test if requests sent to gitlab in the block exceed the budget.
+
+    Use as ``with api_call_budget(10, {"GET /projects/:id": 2}) as account:``.
+    """
+
+    @contextmanager
+    def budget(max_calls: int, max_calls_by_endpoint: Union[dict[str, int], None] = None):
+        with accounting.account_requests() as account:
+            yield account
+        calls = account.by_endpoint()
+        assert account.total <= max_calls, f"{account.total} calls exceed budget {max_calls}: {calls}"
+        for endpoint, max_endpoint_calls in (max_calls_by_endpoint or {}).items():
+            assert (
+                calls.get(endpoint, 0) <= max_endpoint_calls
+            ), f"{calls.get(endpoint, 0)} calls of {endpoint} exceed budget {max_endpoint_calls}: {calls}"
+
+    return budget
@@ -0,0 +1,400 @@
+"""Local stand-in of gitlab v4 api serves synthetic groups, projects, issues, merge requests and commits.
+
+Only endpoints used by the app are served. List endpoints are paginated with the same headers as gitlab,
+so both python-gitlab and the async client walk pages as they do against real gitlab.
+"""
+import datetime
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Union
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from common import metrics
+
+BASE_DATETIME = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+USERS = ("alice", "bob", "carol", "dave")
+LABELS = ("bug", "feature", "doc", "refactor")
+BRANCHES = ("main", "develop", "release")
+
+
+@dataclass(frozen=True)
+class FakeGitlabSize:
+    """Number of resources generated for the stand-in."""
+
+    groups: int = 1
+    projects_per_group: int = 2
+    issues_per_project: int = 5
+    mrs_per_project: int = 5
+    commits_per_mr: int = 3
+    files_per_commit: int = 2
+    # leading commits of each MR taken from the previous MR of the project, like stacked branches.
+    shared_commits_per_mr: int = 0
+
+
+class FakeGitlabData:
+    """Synthetic gitlab resources as json of gitlab api. Same seed generates same resources."""
+
+    def __init__(self, size: FakeGitlabSize = FakeGitlabSize(), seed: int = 0) -> None:
+        self.size = size
+        rand = random.Random(seed)
+        self.groups: dict[int, dict[str, Any]] = {}
+        self.projects: dict[int, dict[str, Any]] = {}
+        self.group_projects: dict[int, list[dict[str, Any]]] = {}
+        self.group_issues: dict[int, list[dict[str, Any]]] = {}
+        self.group_mrs: dict[int, list[dict[str, Any]]] = {}
+        self.mrs: dict[tuple[int, int], dict[str, Any]] = {}
+        self.mr_commits: dict[tuple[int, int], list[dict[str, Any]]] = {}
+        self.commits: dict[tuple[int, str], dict[str, Any]] = {}
+        self.commit_diffs: dict[tuple[int, str], list[dict[str, Any]]] = {}
+        issue_id = mr_id = 0
+        for group_id in range(1, size.groups + 1):
+            self.groups[group_id] = {"id": group_id, "name": f"group_{group_id}", "full_path": f"group_{group_id}"}
+            self.group_projects[group_id] = []
+            self.group_issues[group_id] = []
+            self.group_mrs[group_id] = []
+            for pj_idx in range(size.projects_per_group):
+                project_id = group_id * 1000 + pj_idx + 1
+                project = {
+                    "id": project_id,
+                    "name": f"pj_{project_id}",
+                    "path_with_namespace": f"group_{group_id}/pj_{project_id}",
+                    "namespace": {"id": group_id, "kind": "group"},
+                }
+                self.projects[project_id] = project
+                self.group_projects[group_id].append(project)
+                for iid in range(1, size.issues_per_project + 1):
+                    issue_id += 1
+                    self.group_issues[group_id].append(self.__make_issue(rand, issue_id, iid, project_id))
+                for iid in range(1, size.mrs_per_project + 1):
+                    mr_id += 1
+                    mr = self.__make_mr(rand, mr_id, iid, project_id)
+                    self.group_mrs[group_id].append(mr)
+                    self.mrs[(project_id, iid)] = mr
+                    shared = min(size.shared_commits_per_mr, size.commits_per_mr) if iid > 1 else 0
+                    previous_commits = self.mr_commits.get((project_id, iid - 1), [])
+                    self.mr_commits[(project_id, iid)] = previous_commits[len(previous_commits) - shared :] + [
+                        self.__make_commit(rand, project_id, f"{project_id}-{iid}-{i}", mr["created_at"])
+                        for i in range(shared, size.commits_per_mr)
+                    ]
+
+    @property
+    def total_commits(self) -> int:
+        """Count unique commits of all MRs."""
+        return len(self.commits)
+
+    def mr_changes(self, project_id: int, iid: int) -> list[dict[str, Any]]:
+        """Return changes of whole MR. Files changed by several commits are concatenated."""
+        changes: dict[str, dict[str, Any]] = {}
+        for commit in self.mr_commits[(project_id, iid)]:
+            for diff in self.commit_diffs[(project_id, commit["id"])]:
+                change = changes.setdefault(diff["new_path"], {**diff, "diff": ""})
+                change["diff"] += diff["diff"]
+        return list(changes.values())
+
+    def mr_with_changes(self, project_id: int, iid: int) -> dict[str, Any]:
+        """Return MR with its changes like the changes api."""
+        changes = self.mr_changes(project_id, iid)
+        return {**self.mrs[(project_id, iid)], "changes_count": str(len(changes)), "changes": changes}
+
+    def __make_issue(self, rand: random.Random, issue_id: int, iid: int, project_id: int) -> dict[str, Any]:
+        created_at = BASE_DATETIME + datetime.timedelta(days=issue_id % 365, hours=rand.randrange(24))
+        state = rand.choice(("opened", "closed"))
+        assignee = rand.choice((None, *USERS))
+        return {
+            "id": issue_id,
+            "iid": iid,
+            "project_id": project_id,
+            "title": f"issue {issue_id}",
+            "state": state,
+            "created_at": created_at.isoformat(),
+            "updated_at": (created_at + datetime.timedelta(days=1)).isoformat(),
+            "closed_at": (created_at + datetime.timedelta(days=2)).isoformat() if state == "closed" else None,
+            "labels": rand.sample(LABELS, rand.randrange(3)),
+            "author": {"username": rand.choice(USERS)},
+            "assignee": {"username": assignee} if assignee else None,
+            "milestone": None,
+            "user_notes_count": rand.randrange(10),
+            "upvotes": 0,
+            "downvotes": 0,
+            "weight": None,
+            "due_date": None,
+            "web_url": f"http://fake/issues/{issue_id}",
+        }
+
+    def __make_mr(self, rand: random.Random, mr_id: int, iid: int, project_id: int) -> dict[str, Any]:
+        created_at = BASE_DATETIME + datetime.timedelta(days=mr_id % 365, hours=rand.randrange(24))
+        state = rand.choice(("opened", "merged", "closed"))
+        merged_at = (created_at + datetime.timedelta(days=1)).isoformat() if state == "merged" else None
+        return {
+            "id": mr_id,
+            "iid": iid,
+            "project_id": project_id,
+            "title": f"mr {mr_id}",
+            "state": state,
+            "created_at": created_at.isoformat(),
+            "updated_at": (created_at + datetime.timedelta(days=1)).isoformat(),
+            "merged_at": merged_at,
+            "closed_at": (created_at + datetime.timedelta(days=1)).isoformat() if state == "closed" else None,
+            "target_branch": rand.choice(BRANCHES),
+            "source_branch": f"feature/{mr_id}",
+            "merge_status": "can_be_merged",
+            "labels": rand.sample(LABELS, rand.randrange(3)),
+            "author": {"username": rand.choice(USERS)},
+            "assignee": {"username": rand.choice(USERS)},
+            "merged_by": {"username": rand.choice(USERS)} if merged_at else None,
+            "milestone": None,
+            "user_notes_count": rand.randrange(10),
+            "upvotes": 0,
+            "downvotes": 0,
+            "web_url": f"http://fake/merge_requests/{mr_id}",
+        }
+
+    def __make_commit(self, rand: random.Random, project_id: int, seed: str, created_at: str) -> dict[str, Any]:
+        sha = hashlib.sha1(seed.encode()).hexdigest()
+        diffs = []
+        additions = deletions = 0
+        for file_idx in rand.sample(range(self.size.files_per_commit * 4), self.size.files_per_commit):
+            add_lines, del_lines = rand.randrange(1, 20), rand.randrange(10)
+            additions += add_lines
+            deletions += del_lines
+            body = "".join(f"+added {i}\n" for i in range(add_lines)) + "".join(
+                f"-deleted {i}\n" for i in range(del_lines)
+            )
+            path = f"src/module_{file_idx}.py"
+            diffs.append(
+                {
+                    "old_path": path,
+                    "new_path": path,
+                    "new_file": False,
+                    "renamed_file": False,
+                    "deleted_file": False,
+                    "diff": f"@@ -1,{del_lines} +1,{add_lines} @@\n{body}",
+                }
+            )
+        commit = {
+            "id": sha,
+            "short_id": sha[:8],
+            "title": f"commit {seed}",
+            "author_name": rand.choice(USERS),
+            "created_at": created_at,
+            "stats": {"additions": additions, "deletions": deletions, "total": additions + deletions},
+        }
+        self.commits[(project_id, sha)] = commit
+        self.commit_diffs[(project_id, sha)] = diffs
+        return commit
+
+
+class FakeGitlabServer(ThreadingHTTPServer):
+    """HTTP server of FakeGitlabData on localhost.
+
+    Each request waits latency_sec, and fails with error_status in error_rate if its path matches error_pattern.
+    Failed responses have Retry-After header if retry_after_sec is given.
+    Responses have ETag, and 304 is answered if If-None-Match matches it.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        data: FakeGitlabData,
+        *,
+        latency_sec: float = 0.0,
+        error_rate: float = 0.0,
+        error_pattern: str = "",
+        error_status: int = 500,
+        retry_after_sec: Union[int, None] = None,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), FakeGitlabHandler)
+        self.data = data
+        self.latency_sec = latency_sec
+        self.error_rate = error_rate
+        self.error_pattern = re.compile(error_pattern)
+        self.error_status = error_status
+        self.retry_after_sec = retry_after_sec
+        self.requests: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.not_modified: Counter[str] = Counter()
+        self._rand = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Union[threading.Thread, None] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def start(self) -> "FakeGitlabServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-gitlab", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.not_modified.clear()
+
+    def record(self, path: str) -> bool:
+        """Count request and return True if it should fail."""
+        endpoint = metrics.endpoint_of(path)
+        with self._lock:
+            self.requests[endpoint] += 1
+            fail = bool(self.error_pattern.search(path)) and self._rand.random() < self.error_rate
+            if fail:
+                self.errors[endpoint] += 1
+        return fail
+
+    def count_not_modified(self, path: str) -> None:
+        with self._lock:
+            self.not_modified[metrics.endpoint_of(path)] += 1
+
+
+class FakeGitlabHandler(BaseHTTPRequestHandler):
+    """Route GET of gitlab v4 api to FakeGitlabData."""
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately. without this, delayed ack makes each request wait 40 ms.
+    disable_nagle_algorithm = True
+    server: FakeGitlabServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if self.server.latency_sec:
+            time.sleep(self.server.latency_sec)
+        if self.server.record(url.path):
+            headers = {} if self.server.retry_after_sec is None else {"Retry-After": str(self.server.retry_after_sec)}
+            self.__send_json({"message": f"{self.server.error_status} error"}, self.server.error_status, headers)
+            return
+        for pattern, route in self.__routes():
+            match = pattern.fullmatch(url.path)
+            if match is None:
+                continue
+            result = route(*match.groups(), query=query)
+            if result is None:
+                self.__send_json({"message": "404 Not found"}, status=404)
+            elif isinstance(result, list):
+                self.__send_page(url.path, query, result)
+            else:
+                self.__send_json(result)
+            return
+        self.__send_json({"message": "404 Not found"}, status=404)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        """Do not write access log."""
+
+    def __routes(self) -> list[tuple[re.Pattern, Callable[..., Any]]]:
+        data = self.server.data
+        return [
+            (re.compile(r"/api/v4/groups/(\d+)"), lambda g, query: data.groups.get(int(g))),
+            (re.compile(r"/api/v4/groups/(\d+)/projects"), lambda g, query: data.group_projects.get(int(g))),
+            (
+                re.compile(r"/api/v4/groups/(\d+)/issues"),
+                lambda g, query: self.__filter(data.group_issues.get(int(g)), query),
+            ),
+            (
+                re.compile(r"/api/v4/groups/(\d+)/merge_requests"),
+                lambda g, query: self.__filter(data.group_mrs.get(int(g)), query),
+            ),
+            (re.compile(r"/api/v4/projects/(\d+)"), lambda p, query: data.projects.get(int(p))),
+            (
+                re.compile(r"/api/v4/projects/(\d+)/merge_requests/(\d+)"),
+                lambda p, i, query: data.mrs.get((int(p), int(i))),
+            ),
+            (
+                re.compile(r"/api/v4/projects/(\d+)/merge_requests/(\d+)/commits"),
+                lambda p, i, query: data.mr_commits.get((int(p), int(i))),
+            ),
+            (
+                re.compile(r"/api/v4/projects/(\d+)/merge_requests/(\d+)/changes"),
+                lambda p, i, query: data.mr_with_changes(int(p), int(i)) if (int(p), int(i)) in data.mrs else None,
+            ),
+            (
+                re.compile(r"/api/v4/projects/(\d+)/repository/commits"),
+                lambda p, query: [c for (pj_id, _), c in data.commits.items() if pj_id == int(p)],
+            ),
+            (
+                re.compile(r"/api/v4/projects/(\d+)/repository/commits/([^/]+)"),
+                lambda p, sha, query: self.__find_commit(int(p), sha, data.commits),
+            ),
+            (
+                re.compile(r"/api/v4/projects/(\d+)/repository/commits/([^/]+)/diff"),
+                lambda p, sha, query: self.__find_commit(int(p), sha, data.commit_diffs),
+            ),
+        ]
+
+    @staticmethod
+    def __filter(items: Union[list[dict[str, Any]], None], query: dict[str, str]) -> Union[list[dict[str, Any]], None]:
+        if items is None:
+            return None
+        if query.get("state") not in (None, "all"):
+            items = [item for item in items if item["state"] == query["state"]]
+        if query.get("updated_after"):
+            updated_after = datetime.datetime.fromisoformat(query["updated_after"].replace("Z", "+00:00"))
+            items = [item for item in items if datetime.datetime.fromisoformat(item["updated_at"]) >= updated_after]
+        if query.get("labels"):
+            labels = set(query["labels"].split(","))
+            items = [item for item in items if labels <= set(item["labels"])]
+        return items
+
+    @staticmethod
+    def __find_commit(project_id: int, sha: str, values: dict[tuple[int, str], Any]) -> Any:
+        for (pj_id, commit_sha), value in values.items():
+            if pj_id == project_id and commit_sha.startswith(sha):
+                return value
+        return None
+
+    def __send_page(self, path: str, query: dict[str, str], items: list[Any]) -> None:
+        page = int(query.get("page", 1))
+        per_page = int(query.get("per_page", 20))
+        total_pages = max(1, math.ceil(len(items) / per_page))
+        headers = {
+            "X-Page": str(page),
+            "X-Per-Page": str(per_page),
+            "X-Total": str(len(items)),
+            "X-Total-Pages": str(total_pages),
+            "X-Next-Page": str(page + 1) if page < total_pages else "",
+            "X-Prev-Page": str(page - 1) if page > 1 else "",
+        }
+        if page < total_pages:
+            next_url = f"http://{self.headers['Host']}{path}?{urlencode({**query, 'page': page + 1})}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        self.__send_json(items[(page - 1) * per_page : page * per_page], headers=headers)
+
+    def __send_json(self, body: Any, status: int = 200, headers: Union[dict[str, str], None] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        if status == 200:
+            etag = f'W/"{hashlib.md5(payload).hexdigest()}"'
+            headers = {**(headers or {}), "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                self.server.count_not_modified(self.path)
+                self.send_response(304)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
@@ -0,0 +1,116 @@
+"""Implementations replaced by rewritten functions and factories of synthetic datasets.
+
+Unit tests check rewritten functions return the same results, and benchmarks compare their speed and memory.
+"""
+import inspect
+import logging
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common import util as common_util
+from common.Logger import CustomFilter
+from view import util
+
+LOG_FORMAT = "[%(asctime)s] [%(levelname)s] [%(real_filename)s:%(real_funcName)s:%(real_lineno)s] -> %(message)s"
+
+
+def legacy_count_diff_lines(diff: str) -> tuple[int, int]:
+    """Implementation used before diffstat module. Kept to compare results and speed."""
+    diff_lines = diff.split("\n")
+    add_lines = len(list(filter(lambda s: s.startswith("+"), diff_lines)))
+    del_lines = len(list(filter(lambda s: s.startswith("-"), diff_lines)))
+    return add_lines, del_lines
+
+
+def make_diff(lines: int, seed: int = 0) -> str:
+    rand = random.Random(seed)
+    body = [rand.choice(["+", "-", " "]) + rand.choice(["", "+", "-", "code", "-- comment"]) for _ in range(lines)]
+    return "@@ -1,10 +1,10 @@ def func():\n" + "\n".join(body) + "\n"
+
+
+def legacy_count_by_time(df: pd.DataFrame, datetime_col: str, unit: str, color_col: str) -> pd.DataFrame:
+    """Aggregation used by create_time_count_chart before count_by_time. Kept to compare results and speed."""
+
+    def aggregate(df: pd.DataFrame, target_col: str, unit: str):
+        agg_df = df[[target_col, df.columns[0]]].set_index(target_col).resample(unit).agg(["count"])
+        agg_df.columns = ["count"]
+        return agg_df
+
+    tmp_df = df.copy()
+    tmp_df[datetime_col] = util.to_datetime(tmp_df[datetime_col])
+    agg_dfs = []
+    for item in set(tmp_df[color_col].to_list()):
+        tmp_agg = aggregate(tmp_df.query(f"{color_col} == '{item}'"), datetime_col, unit)
+        tmp_agg[color_col] = item
+        agg_dfs.append(tmp_agg)
+    return pd.concat(agg_dfs).reset_index()
+
+
+def make_dataset(rows: int, projects: int = 50, seed: int = 0) -> pd.DataFrame:
+    rand = np.random.default_rng(seed)
+    created_at = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rand.integers(0, 3 * 365 * 24, rows), "h")
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "project_name": [f"pj_{i}" for i in rand.integers(0, projects, rows)],
+            "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.%f%z"),
+        }
+    )
+
+
+def make_raw_issues(rows: int, projects: int = 50, users: int = 200, seed: int = 0) -> pd.DataFrame:
+    rand = np.random.default_rng(seed)
+    created_at = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rand.integers(0, 3 * 365 * 24, rows), "h")
+    created_at_str = created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    issues = []
+    for i in range(rows):
+        user = f"user_{rand.integers(0, users)}"
+        issue = {
+            "id": i,
+            "iid": i % 1000,
+            "project_id": int(rand.integers(0, projects)),
+            "title": f"title_{i}",
+            "description": "description " * 10,
+            "state": "closed" if i % 3 else "opened",
+            "created_at": created_at_str[i],
+            "updated_at": created_at_str[i],
+            "closed_at": created_at_str[i] if i % 3 else None,
+            "due_date": "2022-12-31" if i % 5 == 0 else None,
+            "labels": ["bug"] if i % 2 else [],
+            "author": {"id": i % users, "username": user, "name": user, "avatar_url": f"https://example.com/{user}"},
+            "assignee": {"id": i % users, "username": user, "name": user} if i % 4 else None,
+            "web_url": f"https://example.com/issues/{i}",
+            "user_notes_count": i % 7,
+        }
+        common_util.flatten_dict_in_dict(issue)
+        issues.append(issue)
+    return pd.DataFrame.from_dict(issues)
+
+
+class LegacyLogger(logging.Logger):
+    """Logger finds caller by inspect.stack() and closes file handlers after each message like before."""
+
+    def debug(self, msg, *args, **kwargs):
+        caller = inspect.stack()[1]
+        kwargs["extra"] = {
+            "real_filename": caller.filename,
+            "real_funcName": caller.function,
+            "real_lineno": caller.lineno,
+        }
+        super().debug(msg, *args, **kwargs)
+        for handler in self.handlers:
+            if isinstance(handler, logging.FileHandler):
+                handler.close()
+
+
+def make_file_logger(logger: logging.Logger, log_path: Path, level: int) -> logging.Logger:
+    handler = logging.FileHandler(log_path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+    logger.addFilter(CustomFilter())
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
@@ -17,17 +17,24 @@ class MockMergeRequest(MockGitlabBase):
         project_id: int = 1,
         title: str = "mr_title",
         commits: Union[list, None] = None,
+        changes: Union[list[dict[str, Any]], None] = None,
     ):
         self.project_id = project_id
         self.title = title
         if commits is None:
             commits = [MockProjectCommit()]
         self.commits_in_mr = commits
+        if changes is None:
+            changes = [{"new_path": "file_1", "diff": "+additional_diff\n-deletion_diff", "deleted_file": False}]
+        self.changes_in_mr = changes
         super().__init__(attrs)
 
     def commits(self, all: bool = True):
         return self.commits_in_mr
 
+    def changes(self):
+        return {"changes_count": str(len(self.changes_in_mr)), "changes": self.changes_in_mr}
+
 
 class MockProject(MockGitlabBase):
     def __init__(
@@ -54,6 +61,7 @@ class MockProjectCommit(MockGitlabBase):
         stats: dict[str, int] = MOCK_STATS,
         diff: Union[list[dict[str, Any]], None] = None,
     ):
+        self.id = f"{short_id}_sha"
         self.short_id = short_id
         self.stats = stats
         if diff is None:
@@ -79,3 +87,36 @@ class MockProjectCommitManager(MockGitlabBase):
 class MockIssue(MockGitlabBase):
     def __init__(self, attrs: Union[dict[str, Any], None]):
         super().__init__(attrs)
+
+
+class MockRESTObjectList:
+    def __init__(self, items: list, per_page: int, total_pages: Union[int, None]):
+        self._items = iter(items)
+        self.per_page = per_page
+        self._total_pages = total_pages
+
+    @property
+    def total_pages(self) -> int:
+        return int(self._total_pages)
+
+    def __iter__(self):
+        return self._items
+
+
+class MockListManager:
+    """Return pages of items like RESTManager.list."""
+
+    def __init__(self, items: list, total_pages_header: bool = True, errors: Union[dict[int, list], None] = None):
+        self.items = items
+        self.total_pages_header = total_pages_header
+        self.errors = errors or {}
+        self.calls: list[dict[str, Any]] = []
+
+    def list(self, *, page: Union[int, None] = None, per_page: int = 20, as_list: bool = True, **kwargs):
+        self.calls.append({"page": page, "per_page": per_page, "as_list": as_list, **kwargs})
+        if self.errors.get(page or 1):
+            raise self.errors[page or 1].pop(0)
+        if page is None and not as_list:
+            total_pages = max(1, -(-len(self.items) // per_page)) if self.total_pages_header else None
+            return MockRESTObjectList(self.items, per_page, total_pages)
+        return self.items[(page - 1) * per_page : page * per_page]
@@ -0,0 +1,20 @@
+from common import metrics
+from repository import accounting
+
+
+def record_call(url: str) -> None:
+    metrics.record_api_call("GET", url, 200, 0.01, 10)
+
+
+def test_account_requests():
+    record_call("http://gitlab/api/v4/groups/1")
+    with accounting.account_requests() as outer:
+        record_call("http://gitlab/api/v4/projects/1/repository/commits/abc")
+        with accounting.account_requests() as inner:
+            record_call("http://gitlab/api/v4/projects/2/repository/commits/def")
+        record_call("http://gitlab/api/v4/groups/1/issues?page=2")
+    record_call("http://gitlab/api/v4/groups/1/issues?page=3")
+
+    assert outer.by_endpoint() == {"GET /projects/:id/repository/commits/:sha": 2, "GET /groups/:id/issues": 1}
+    assert outer.total == 3
+    assert inner.total == 1
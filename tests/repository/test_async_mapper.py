@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from gitlab.client import Gitlab
+from gitlab.v4.objects.groups import Group
+from gitlab.v4.objects.issues import GroupIssue
+
+from common import GitlabConst, metrics
+from repository import async_mapper, factory, throttle
+from repository.async_mapper import AsyncBackedGitlabClient, AsyncGitlabClient
+from repository.mapper import GitlabClient
+from tests.fake_gitlab import FakeGitlabSize
+
+
+class MockGitlabServer:
+    """Serve list api has items_count items and count requests in flight."""
+
+    def __init__(self, items_count: int, total_pages_header: bool = True):
+        self.items_count = items_count
+        self.total_pages_header = total_pages_header
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requested_pages: list[int] = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        page = int(request.url.params.get("page", 1))
+        per_page = int(request.url.params.get("per_page", 20))
+        self.requested_pages.append(page)
+        total_pages = max(1, -(-self.items_count // per_page))
+        items = [{"id": i, "path": request.url.path} for i in range((page - 1) * per_page, self.items_count)][
+            :per_page
+        ]
+        headers = {"X-Page": str(page)}
+        if page < total_pages:
+            headers["X-Next-Page"] = str(page + 1)
+        if self.total_pages_header:
+            headers["X-Total-Pages"] = str(total_pages)
+        return httpx.Response(200, headers=headers, content=json.dumps(items))
+
+
+def run_with_client(server: MockGitlabServer, func, **kwargs):
+    async def run():
+        async with AsyncGitlabClient(
+            1, url="http://localhost", token="token", transport=httpx.MockTransport(server.handle), **kwargs
+        ) as client:
+            return await func(client)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("total_pages_header", [True, False])
+def test_list_all(total_pages_header):
+    server = MockGitlabServer(250, total_pages_header)
+    issues = run_with_client(server, lambda c: c.fetch_group_issues(state="opened"), per_page=20)
+    assert [i["id"] for i in issues] == list(range(250))
+    assert issues[0]["path"] == "/api/v4/groups/1/issues"
+    assert sorted(server.requested_pages) == list(range(1, 14))
+    if total_pages_header:
+        assert server.max_in_flight > 1
+    else:
+        assert server.max_in_flight == 1
+
+
+def test_concurrency_bounded():
+    server = MockGitlabServer(1000)
+    run_with_client(server, lambda c: c.fetch_group_mergerequests(), per_page=10, max_concurrency=3)
+    assert server.max_in_flight == 3
+
+
+def test_raise_http_error(mocker):
+    mocker.patch.object(GitlabConst, "RETRY_BACKOFF_SEC", 0.001)
+    requests = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(500)
+
+    async def run():
+        async with AsyncGitlabClient(1, url="http://localhost", transport=httpx.MockTransport(handle)) as client:
+            await client.fetch_group_projects()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert len(requests) == GitlabConst.RETRY_COUNT + 1
+
+
+def test_facade():
+    server = MockGitlabServer(30)
+    client = AsyncBackedGitlabClient.__new__(AsyncBackedGitlabClient)
+    client.group_id = 1
+    client.gl = Gitlab("http://localhost", private_token="token")
+    client.group = Group(client.gl.groups, {"id": 1, "name": "group"})
+
+    async def create():
+        return AsyncGitlabClient(1, url="http://localhost", transport=httpx.MockTransport(server.handle))
+
+    client.async_client = async_mapper.get_event_loop_thread().run(create())
+    issues = client.fetch_group_issues()
+    assert len(issues) == 30
+    assert isinstance(issues[0], GroupIssue)
+    assert issues[0].__dict__["_attrs"]["id"] == 0
+    projects = client.fetch_projects_in_group([1, 2])
+    assert [p.id for p in projects] == [1, 2]
+    assert projects[0].commits is not None
+
+
+def test_create_client(mocker):
+    mocker.patch("repository.connection.get_group")
+    mocker.patch.object(async_mapper, "get_async_client")
+    assert type(factory.create_client(1)) is GitlabClient
+    assert type(factory.create_client(1, factory.BACKEND_ASYNC)) is AsyncBackedGitlabClient
+
+
+def test_retry_against_fake_gitlab(mocker, fake_gitlab):
+    mocker.patch.object(GitlabConst, "RETRY_BACKOFF_SEC", 0.001)
+    mocker.patch.object(GitlabConst, "RETRY_COUNT", 10)
+    server = fake_gitlab(FakeGitlabSize(issues_per_project=150), error_rate=0.5, error_pattern="/issues$", seed=1)
+
+    async def run():
+        async with AsyncGitlabClient(1, url=server.url, per_page=20) as client:
+            return await client.fetch_group_issues()
+
+    assert asyncio.run(run()) == server.data.group_issues[1]
+    assert server.errors["/groups/:id/issues"] > 0
+    assert metrics.get_registry().counter_value(metrics.API_RETRIES, reason="500") == sum(server.errors.values())
+
+
+def test_give_up_throttled_request(fake_gitlab):
+    server = fake_gitlab(error_rate=1.0, error_status=429, retry_after_sec=0, error_pattern="/issues$")
+
+    async def run():
+        async with AsyncGitlabClient(1, url=server.url, max_concurrency=4) as client:
+            return await client.fetch_group_issues()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert server.requests["/groups/:id/issues"] == GitlabConst.RETRY_COUNT + 1
+    # throttle shared with the sync client is narrowed.
+    assert throttle.get_host_throttle(server.url).limit < 4
@@ -0,0 +1,38 @@
+from repository.commit_cache import CommitCache, get_commit_cache
+
+DETAIL = {"stats": {"additions": 1, "deletions": 1, "total": 2}, "changed_file_count": 1, "diff": {}}
+
+
+def test_put_and_get(tmp_cache_dir):
+    cache = CommitCache(tmp_cache_dir, 1024 * 1024)
+    assert cache.get(1, "sha") is None
+    cache.put(1, "sha", DETAIL)
+    assert cache.get(1, "sha") == DETAIL
+    assert cache.get(2, "sha") is None
+    # data is kept after reopen
+    assert CommitCache(tmp_cache_dir, 1024 * 1024).get(1, "sha") == DETAIL
+
+
+def test_evict_least_recently_used(tmp_cache_dir):
+    cache = CommitCache(tmp_cache_dir, 1024 * 1024)
+    for i in range(3):
+        cache.put(1, f"sha{i}", DETAIL)
+    cache.max_bytes = cache.total_bytes() - 1
+    cache.get(1, "sha0")
+    cache.put(1, "sha3", DETAIL)
+    assert cache.total_bytes() <= cache.max_bytes
+    assert cache.get(1, "sha0") == DETAIL
+    assert cache.get(1, "sha1") is None
+    assert cache.get(1, "sha3") == DETAIL
+
+
+def test_disabled_cache(tmp_cache_dir):
+    cache = CommitCache(tmp_cache_dir, 0)
+    cache.put(1, "sha", DETAIL)
+    assert cache.get(1, "sha") is None
+
+
+def test_get_commit_cache(tmp_cache_dir):
+    cache = get_commit_cache()
+    assert cache.path.parent == tmp_cache_dir
+    assert cache is get_commit_cache(tmp_cache_dir)
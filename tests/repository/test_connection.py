@@ -0,0 +1,35 @@
+from gitlab.client import Gitlab
+
+from common import metrics
+from repository import connection
+
+
+def test_get_gitlab_shared():
+    gl = connection.get_gitlab()
+    assert gl is connection.get_gitlab()
+    assert gl is not connection.get_gitlab("http://other-host")
+    adapter = gl.session.get_adapter("http://localhost")
+    assert adapter._pool_maxsize == connection.GitlabConst.POOL_SIZE
+    assert gl.timeout == connection.GitlabConst.TIMEOUT_SEC
+
+
+def test_get_group_memoized(mocker):
+    gl = Gitlab("http://localhost", private_token="token")
+    get_mock = mocker.patch.object(gl.groups, "get", side_effect=[None, "group", "other"])
+    assert connection.get_group(gl, 1) is None
+    assert connection.get_group(gl, 1) == "group"
+    assert connection.get_group(gl, 1) == "group"
+    assert get_mock.call_count == 2
+
+
+def test_clear_connections(mocker):
+    gl = connection.get_gitlab()
+    close_mock = mocker.patch.object(gl.session, "close")
+    connection.clear_connections()
+    close_mock.assert_called_once()
+    assert connection.get_gitlab() is not gl
+
+
+def test_session_counts_responses():
+    session = connection.create_session()
+    assert metrics.record_response in session.hooks["response"]
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from repository.fetch_engine import FetchEngine, RateLimiter, get_host_limiter
+
+
+class MockProgress:
+    def __init__(self, total: int, desc: str):
+        self.total = total
+        self.desc = desc
+        self.count = 0
+        self.closed = False
+        MockProgress.last = self
+
+    def update(self, n: int):
+        self.count += n
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_map_keep_order(max_workers):
+    def slow_double(i: int) -> int:
+        time.sleep(0.001 * (10 - i))
+        return i * 2
+
+    engine = FetchEngine(max_workers, RateLimiter(0))
+    assert engine.map(slow_double, range(10), progress=MockProgress, desc="test") == [i * 2 for i in range(10)]
+    assert MockProgress.last.count == 10
+    assert MockProgress.last.desc == "test"
+    assert MockProgress.last.closed
+
+
+def test_map_empty():
+    assert FetchEngine(2, RateLimiter(0)).map(lambda x: x, []) == []
+
+
+def test_map_raise_error():
+    def fail_at_three(i: int) -> int:
+        if i == 3:
+            raise ValueError("failed")
+        return i
+
+    with pytest.raises(ValueError):
+        FetchEngine(2, RateLimiter(0)).map(fail_at_three, range(5))
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # first token is in the bucket, others wait 1 / 50 sec each.
+    assert time.monotonic() - start >= 0.09
+
+
+def test_get_host_limiter_shared_by_host():
+    limiter = get_host_limiter("http://limiter-test:8929/api/v4", 5)
+    assert limiter is get_host_limiter("http://limiter-test:8929/groups/1", 10)
+    assert limiter is not get_host_limiter("http://other-host", 5)
@@ -1,10 +1,13 @@
 import pytest
 from gitlab.client import Gitlab
+from gitlab.exceptions import GitlabGetError
 from gitlab.v4.objects import GroupManager
 from gitlab.v4.objects.groups import Group
+from gitlab.v4.objects.merge_requests import GroupMergeRequest
 
 from common.errors import ResourceNotFoundError
 from repository.mapper import GitlabClient
+from tests.mock_classes import MockGitlabBase, MockListManager
 
 
 class TestGitlabClient:
@@ -42,3 +45,88 @@ class TestGitlabClient:
             mocker.patch("gitlab.v4.objects.GroupManager.get", None)
             mock_client.group = None
         return mock_client
+
+
+class MockGroupProject(MockGitlabBase):
+    def __init__(self, id: int):
+        super().__init__({"id": id, "name": f"pj_{id}"})
+        self.id = id
+        self.attributes = self._attrs
+
+
+class TestProjectIndex:
+    @pytest.fixture
+    def client(self, mocker):
+        client = GitlabClient.__new__(GitlabClient)
+        client.group_id = 1
+        client.gl = Gitlab("http://localhost", private_token="token")
+        client.group = mocker.Mock()
+        client.group.projects = MockListManager([MockGroupProject(i) for i in range(3)])
+        return client
+
+    def test_fetch_projects_in_group(self, mocker, client):
+        instance_list = mocker.patch.object(client.gl.projects, "list")
+        projects = client.fetch_projects_in_group([2, 0, 0])
+        assert [p.id for p in projects] == [0, 2]
+        assert projects[0].name == "pj_0"
+        # project made from group listing has managers.
+        assert projects[0].commits is not None
+        assert [p.id for p in client.fetch_projects_in_group()] == [0, 1, 2]
+        assert client.group.projects.calls == [
+            {"page": None, "per_page": 100, "as_list": False, "include_subgroups": True}
+        ]
+        instance_list.assert_not_called()
+
+    def test_index_shared_by_clients(self, client):
+        client.fetch_projects_in_group()
+        other_client = GitlabClient.__new__(GitlabClient)
+        other_client.group_id = 1
+        other_client.group = None
+        assert [p.id for p in other_client.fetch_projects_in_group([1])] == [1]
+        assert len(client.group.projects.calls) == 1
+
+    def test_fetch_missing_project(self, mocker, client):
+        missing_pj = MockGroupProject(5)
+        get_mock = mocker.patch.object(client.gl.projects, "get", return_value=missing_pj)
+        assert [p.id for p in client.fetch_projects_in_group([0, 5])] == [0, 5]
+        assert [p.id for p in client.fetch_projects_in_group([5])] == [5]
+        get_mock.assert_called_once_with(5)
+
+    def test_skip_inaccessible_project(self, mocker, client):
+        mocker.patch.object(client.gl.projects, "get", side_effect=GitlabGetError("404 Project Not Found", 404))
+        listed_mrs = [GroupMergeRequest(client.gl.projects, {"id": i, "iid": i, "project_id": i}) for i in (0, 5)]
+        client.group.mergerequests = MockListManager(listed_mrs)
+        assert [mr.project_id for mr in client.fetch_mergerrequests_in_group()] == [0]
+
+
+class TestLazyMergeRequest:
+    @pytest.fixture
+    def client(self, mocker):
+        client = GitlabClient.__new__(GitlabClient)
+        client.group_id = 1
+        client.gl = Gitlab("http://localhost", private_token="token")
+        client.group = mocker.Mock()
+        client.group.projects = MockListManager([MockGroupProject(0)])
+        listed_mr = GroupMergeRequest(client.gl.projects, {"id": 10, "iid": 3, "project_id": 0, "title": "mr_title"})
+        client.group.mergerequests = MockListManager([listed_mr])
+        return client
+
+    def test_no_request_per_mergerequest(self, mocker, client):
+        http_get = mocker.patch.object(client.gl, "http_get")
+        http_list = mocker.patch.object(client.gl, "http_list")
+        mrs = client.fetch_mergerrequests_in_group()
+        assert len(mrs) == 1
+        assert mrs[0].title == "mr_title"
+        assert mrs[0].__dict__["_attrs"]["iid"] == 3
+        mrs[0].commits(all=True)
+        http_list.assert_called_once_with("/projects/0/merge_requests/3/commits", as_list=False, all=True)
+        http_get.assert_not_called()
+
+    def test_fetch_missing_field(self, mocker, client):
+        http_get = mocker.patch.object(client.gl, "http_get", return_value={"iid": 3, "changes_count": "5"})
+        mr = client.fetch_mergerrequests_in_group()[0]
+        assert mr.changes_count == "5"
+        assert mr.changes_count == "5"
+        http_get.assert_called_once_with("/projects/0/merge_requests/3")
+        with pytest.raises(AttributeError):
+            mr._missing
@@ -0,0 +1,51 @@
+import pytest
+from gitlab.exceptions import GitlabListError
+
+from repository.fetch_engine import FetchEngine, RateLimiter
+from repository.pagination import list_all_pages
+from tests.mock_classes import MockGitlabBase, MockListManager
+
+
+class MockItem(MockGitlabBase):
+    def __init__(self, id: int):
+        super().__init__({"id": id})
+
+    def get_id(self):
+        return self._attrs["id"]
+
+
+@pytest.mark.parametrize("total_pages_header", [True, False])
+@pytest.mark.parametrize("items_count", [0, 5, 10, 95])
+def test_list_all_pages(items_count, total_pages_header):
+    items = [MockItem(i) for i in range(items_count)]
+    manager = MockListManager(items, total_pages_header)
+    result = list_all_pages(manager, engine=FetchEngine(4, RateLimiter(0)), per_page=10, state="opened")
+    assert [i.get_id() for i in result] == list(range(items_count))
+    assert all(c["state"] == "opened" for c in manager.calls)
+    if total_pages_header:
+        assert sorted(c["page"] or 1 for c in manager.calls) == list(range(1, max(2, -(-items_count // 10) + 1)))
+
+
+def test_list_all_pages_drop_duplicated():
+    items = [MockItem(i) for i in range(20)]
+    manager = MockListManager(items)
+    original_list = manager.list
+
+    def shifted_list(**kwargs):
+        # new item was created while fetching, so last item of page 1 is moved to page 2.
+        result = original_list(**kwargs)
+        if kwargs.get("page") == 2:
+            return [items[9]] + result
+        return result
+
+    manager.list = shifted_list
+    result = list_all_pages(manager, engine=FetchEngine(2, RateLimiter(0)), per_page=10)
+    assert [i.get_id() for i in result] == list(range(20))
+
+
+def test_list_all_pages_leave_retries_to_adapter():
+    items = [MockItem(i) for i in range(30)]
+    manager = MockListManager(items, errors={3: [GitlabListError("error", 500)]})
+    with pytest.raises(GitlabListError):
+        list_all_pages(manager, engine=FetchEngine(2, RateLimiter(0)), per_page=10)
+    assert sorted(c["page"] or 1 for c in manager.calls) == [1, 2, 3]
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from gitlab.exceptions import GitlabGetError
+
+from repository import project_index
+
+
+def make_projects(*ids):
+    return [SimpleNamespace(id=i) for i in ids]
+
+
+def test_build_once_per_group():
+    builds = []
+
+    def build():
+        builds.append(1)
+        return make_projects(0, 1)
+
+    with ThreadPoolExecutor(4) as executor:
+        indexes = list(executor.map(lambda _: project_index.get_project_index(1, build), range(8)))
+    assert len(builds) == 1
+    assert all(index is indexes[0] for index in indexes)
+
+
+def test_build_does_not_block_other_groups():
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_build():
+        building.set()
+        release.wait(5)
+        return make_projects(0)
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(project_index.get_project_index, 1, slow_build)
+        assert building.wait(5)
+        # group 1 is still building.
+        assert [p.id for p in project_index.get_project_index(2, lambda: make_projects(5)).all()] == [5]
+        release.set()
+        assert [p.id for p in future.result().all()] == [0]
+
+
+def test_lookup_skip_missing_project():
+    index = project_index.get_project_index(1, lambda: make_projects(0))
+
+    def fetch_missing(project_id):
+        if project_id == 404:
+            raise GitlabGetError("404 Project Not Found", 404)
+        return SimpleNamespace(id=project_id)
+
+    assert [p.id for p in index.lookup([0, 5, 404], fetch_missing)] == [0, 5]
+
+
+def test_lookup_raise_other_errors():
+    index = project_index.get_project_index(1, lambda: make_projects(0))
+
+    def fetch_missing(project_id):
+        raise GitlabGetError("403 Forbidden", 403)
+
+    with pytest.raises(GitlabGetError):
+        index.lookup([0, 5], fetch_missing)
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from common import metrics
+from repository import response_cache
+from repository.async_mapper import AsyncGitlabClient
+from repository.mapper import GitlabClient
+from repository.response_cache import CachedResponse, ResponseCache
+from service.issue import make_issue_df
+from tests.fake_gitlab import FakeGitlabSize
+
+
+def cached(body: bytes, etag: str = 'W/"1"') -> CachedResponse:
+    return CachedResponse(etag, {"ETag": etag}, body)
+
+
+def test_evict_least_recently_used():
+    cache = ResponseCache(max_bytes=10)
+    cache.put(("t", "a"), cached(b"1234"))
+    cache.put(("t", "b"), cached(b"1234"))
+    assert cache.get(("t", "a")) is not None
+    cache.put(("t", "c"), cached(b"1234"))
+    assert cache.get(("t", "b")) is None
+    assert cache.get(("t", "a")) is not None
+    assert cache.total_bytes == 8
+    cache.put(("t", "a"), cached(b"12"))
+    assert (len(cache), cache.total_bytes) == (2, 6)
+    cache.put(("t", "large"), cached(b"x" * 11))
+    assert cache.get(("t", "large")) is None
+
+
+def test_never_store_if_max_bytes_is_zero():
+    cache = ResponseCache(max_bytes=0)
+    cache.put(("t", "a"), cached(b"1"))
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize(
+    "method, path, cacheable",
+    [
+        ("GET", "/api/v4/groups/1/issues?page=2", True),
+        ("GET", "/api/v4/groups/1/projects", True),
+        ("GET", "/api/v4/projects/1001/repository/commits/abc", False),
+        ("POST", "/api/v4/groups/1/issues", False),
+    ],
+)
+def test_cache_key(method, path, cacheable):
+    key = response_cache.cache_key(method, f"http://gitlab{path}", {"PRIVATE-TOKEN": "token"})
+    assert (key is not None) == cacheable
+
+
+def test_cache_key_differs_by_token():
+    url = "http://gitlab/api/v4/groups/1/issues"
+    assert response_cache.cache_key("GET", url, {"PRIVATE-TOKEN": "a"}) != response_cache.cache_key(
+        "GET", url, {"PRIVATE-TOKEN": "b"}
+    )
+
+
+def test_cache_key_of_bytes_token():
+    url = "http://gitlab/api/v4/groups/1/issues"
+    assert response_cache.cache_key("GET", url, {"PRIVATE-TOKEN": b"a"}) == response_cache.cache_key(
+        "GET", url, {"PRIVATE-TOKEN": "a"}
+    )
+
+
+def test_revalidate_listing_of_sync_client(fake_gitlab):
+    server = fake_gitlab(FakeGitlabSize(issues_per_project=150))
+    first = make_issue_df(1)
+    pages = server.requests["/groups/:id/issues"]
+    assert pages > 1
+    second = make_issue_df(1)
+    assert second.equals(first)
+    assert server.not_modified["/groups/:id/issues"] == pages
+
+    registry = metrics.get_registry()
+    assert registry.counter_value(metrics.CACHE_HITS, cache=response_cache.CACHE_NAME) == pages
+    assert registry.counter_value(metrics.API_CALLS, endpoint="/groups/:id/issues", status=304) == pages
+
+
+def test_refetch_changed_page(fake_gitlab):
+    server = fake_gitlab()
+    client = GitlabClient(1)
+    client.fetch_group_issues()
+    server.data.group_issues[1][0]["title"] = "changed"
+    issues = client.fetch_group_issues()
+    assert issues[0].title == "changed"
+    assert server.not_modified["/groups/:id/issues"] == 0
+
+
+def test_revalidate_listing_of_async_client(fake_gitlab):
+    server = fake_gitlab(FakeGitlabSize(issues_per_project=150))
+
+    async def run():
+        async with AsyncGitlabClient(1, url=server.url, per_page=50) as client:
+            return await client.fetch_group_issues(), await client.fetch_group_issues()
+
+    first, second = asyncio.run(run())
+    assert second == first == server.data.group_issues[1]
+    assert server.not_modified["/groups/:id/issues"] == server.requests["/groups/:id/issues"] / 2
@@ -0,0 +1,24 @@
+import pytest
+import requests
+from gitlab.exceptions import GitlabGetError, GitlabListError
+
+from common import GitlabConst
+from repository.mapper import GitlabClient
+from repository.retry import is_retryable
+
+
+def test_is_retryable():
+    assert is_retryable(GitlabGetError("error", 500))
+    assert is_retryable(GitlabGetError("error", 429))
+    assert is_retryable(requests.exceptions.ConnectionError())
+    assert not is_retryable(GitlabGetError("error", 404))
+    assert not is_retryable(ValueError())
+
+
+@pytest.mark.parametrize("error_status", [500, 429])
+def test_retry_page_only_in_adapter(mocker, fake_gitlab, error_status):
+    mocker.patch("repository.throttle.time.sleep")
+    server = fake_gitlab(error_rate=1.0, error_status=error_status, retry_after_sec=0, error_pattern="/issues$")
+    with pytest.raises(GitlabListError):
+        GitlabClient(1).fetch_group_issues()
+    assert server.requests["/groups/:id/issues"] == GitlabConst.RETRY_COUNT + 1
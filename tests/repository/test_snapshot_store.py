@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from repository.snapshot_store import SnapshotStore, get_snapshot_store
+
+
+@pytest.fixture
+def dataset():
+    return pd.DataFrame(
+        [
+            {
+                "id": 1,
+                "state": "opened",
+                "created_at": "2022-01-05T00:00:00.000Z",
+                "labels": ["bug", "ui"],
+                "diff": {"a.py": {"add": 1, "del": 2, "change_cnt": 1}},
+                "assignee-username": None,
+            },
+            {
+                "id": 2,
+                "state": "closed",
+                "created_at": "2022-02-05T09:30:00.000+09:00",
+                "labels": [],
+                "diff": {},
+                "assignee-username": "alice",
+            },
+        ]
+    )
+
+
+def test_save_and_load(tmp_cache_dir, dataset):
+    store = get_snapshot_store()
+    assert store is get_snapshot_store(tmp_cache_dir)
+    assert store.load(1, "issues") is None
+    assert store.age(1, "issues") is None
+
+    assert store.save(1, "issues", dataset)
+    loaded = store.load(1, "issues")
+    assert store.age(1, "issues") >= 0
+    assert loaded["id"].to_list() == [1, 2]
+    assert loaded["created_at"].to_list() == [
+        pd.Timestamp("2022-01-05T00:00:00Z"),
+        pd.Timestamp("2022-02-05T00:30:00Z"),
+    ]
+    assert loaded["state"].dtype == "category"
+    assert loaded["labels"].to_list() == [["bug", "ui"], []]
+    assert loaded["diff"].to_list() == dataset["diff"].to_list()
+    assert loaded["assignee-username"].isna().to_list() == [True, False]
+    assert store.load(2, "issues") is None
+
+
+def test_save_replaces_snapshot(tmp_path, dataset):
+    store = SnapshotStore(tmp_path)
+    store.save(1, "issues", dataset)
+    store.save(1, "issues", dataset.iloc[:1])
+    assert store.load(1, "issues")["id"].to_list() == [1]
+    assert [p.name for p in store.dir.iterdir()] == ["issues-1.parquet"]
+
+
+def test_save_skips_unconvertible_dataset(tmp_path):
+    store = SnapshotStore(tmp_path)
+    assert not store.save(1, "issues", pd.DataFrame({"id": [1, 2], "mixed": [1, "a"]}))
+    assert store.load(1, "issues") is None
+    assert list(store.dir.iterdir()) == []
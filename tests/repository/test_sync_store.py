@@ -0,0 +1,26 @@
+from repository.sync_store import SyncStore, get_sync_store
+
+
+def test_merge_and_load(tmp_cache_dir):
+    store = SyncStore(tmp_cache_dir)
+    assert store.get_mark(1, "issues") is None
+    assert store.load_rows(1, "issues") == []
+    store.merge(1, "issues", [{"id": 1, "title": "a"}, {"id": 2, "title": "b"}], "2022-01-02T00:00:00.000Z")
+    store.merge(1, "issues", [{"id": 2, "title": "updated"}, {"id": 3, "title": "c"}], "2022-01-03T00:00:00.000Z")
+    assert store.get_mark(1, "issues") == "2022-01-03T00:00:00.000Z"
+    assert store.load_rows(1, "issues") == [
+        {"id": 3, "title": "c"},
+        {"id": 2, "title": "updated"},
+        {"id": 1, "title": "a"},
+    ]
+    # other group and resource are independent
+    assert store.get_mark(2, "issues") is None
+    assert store.load_rows(1, "mergerequests") == []
+
+
+def test_clear(tmp_cache_dir):
+    store = get_sync_store()
+    store.merge(1, "issues", [{"id": 1}], "2022-01-02T00:00:00.000Z")
+    store.clear(1, "issues")
+    assert store.get_mark(1, "issues") is None
+    assert store.load_rows(1, "issues") == []
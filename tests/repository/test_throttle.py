@@ -0,0 +1,110 @@
+import email.utils
+import io
+import threading
+import time
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+from repository import throttle
+
+
+def make_response(status: int, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b"{}")
+    response.url = "http://gitlab/api/v4/projects/1"
+    return response
+
+
+def send(mocker, responses: list, method: str = "GET", **adapter_kwargs) -> tuple[requests.Response, int]:
+    send_mock = mocker.patch.object(HTTPAdapter, "send", side_effect=responses)
+    adapter = throttle.ThrottledAdapter(pool_maxsize=4, backoff_sec=0.001, **adapter_kwargs)
+    request = requests.Request(method, "http://gitlab/api/v4/projects/1").prepare()
+    return adapter.send(request), send_mock.call_count
+
+
+def test_retry_server_error(mocker):
+    response, calls = send(mocker, [make_response(500), make_response(502), make_response(200)])
+    assert response.status_code == 200
+    assert calls == 3
+    assert metrics.get_registry().counter_value(metrics.API_RETRIES, reason="500") == 1
+
+
+def test_give_up_after_retries(mocker):
+    response, calls = send(mocker, [make_response(500)] * 3, retries=2)
+    assert response.status_code == 500
+    assert calls == 3
+
+
+def test_retry_connection_error(mocker):
+    response, calls = send(mocker, [requests.exceptions.ConnectionError(), make_response(200)])
+    assert response.status_code == 200
+    assert calls == 2
+    with pytest.raises(requests.exceptions.ConnectionError):
+        send(mocker, [requests.exceptions.ConnectionError()], retries=0)
+
+
+def test_not_retry_post(mocker):
+    response, calls = send(mocker, [make_response(500), make_response(200)], method="POST")
+    assert response.status_code == 500
+    assert calls == 1
+
+
+def test_throttled_response_halves_concurrency_and_pauses(mocker):
+    sleep = mocker.patch("repository.throttle.time.sleep")
+    start = time.monotonic()
+    response, _ = send(mocker, [make_response(429, {"Retry-After": "0.1"}), make_response(200)])
+    assert response.status_code == 200
+    sleep.assert_called_once_with(0.1)
+    host_throttle = throttle.get_host_throttle("http://gitlab")
+    # halved once, then increased by 1 / limit.
+    assert host_throttle.limit == pytest.approx(2.5)
+    # retry waited for the pause of the host even though sleep of the adapter is patched.
+    assert time.monotonic() >= host_throttle.paused_until >= start + 0.1
+
+
+def test_pause_when_rate_limit_exhausted(mocker):
+    reset = str(int(time.time()) + 30)
+    send(mocker, [make_response(200, {"RateLimit-Remaining": "3", "RateLimit-Reset": reset})], min_remaining=5)
+    assert throttle.get_host_throttle("http://gitlab").paused_until > time.monotonic() + 20
+
+
+def test_host_throttle_limits_in_flight():
+    host_throttle = throttle.HostThrottle(max_concurrency=1)
+    host_throttle.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (host_throttle.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+    host_throttle.release()
+    assert acquired.wait(1)
+    waiter.join()
+    host_throttle.release(throttled=True)
+    assert host_throttle.limit == 1
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("3", 3.0), ("-1", 0.0), (None, None), ("soon", None)],
+)
+def test_parse_retry_after(value, expected):
+    assert throttle.parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 < throttle.parse_retry_after(value) <= 10
+
+
+def test_adapter_against_fake_gitlab(fake_gitlab, mocker):
+    mocker.patch("repository.throttle.time.sleep")
+    server = fake_gitlab(error_rate=0.5, error_status=429, retry_after_sec=0, error_pattern="/projects/")
+    session = requests.Session()
+    session.mount("http://", throttle.ThrottledAdapter(pool_maxsize=4, retries=20))
+    for project_id in list(server.data.projects) * 10:
+        assert session.get(f"{server.url}/api/v4/projects/{project_id}").status_code == 200
+    assert sum(server.errors.values()) > 0
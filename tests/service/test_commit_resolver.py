@@ -0,0 +1,57 @@
+import pytest
+
+from repository.commit_cache import CommitCache
+from repository.fetch_engine import FetchEngine
+from service.commit_resolver import CommitResolver
+from tests.mock_classes import MockProject, MockProjectCommit
+
+
+def make_resolver(tmp_path, fetch_detail) -> CommitResolver:
+    return CommitResolver(FetchEngine(4), CommitCache(tmp_path, max_bytes=1024 * 1024), fetch_detail)
+
+
+def test_fetch_shared_commit_once(tmp_path):
+    fetched = []
+
+    def fetch_detail(project, commit):
+        fetched.append((project.id, commit.id))
+        return {"sha": commit.id}
+
+    pj_1, pj_2 = MockProject(id=1), MockProject(id=2)
+    shared, other = MockProjectCommit(short_id="shared"), MockProjectCommit(short_id="other")
+    # the same sha in another project is another commit.
+    targets = [(pj_1, shared), (pj_1, other), (pj_1, shared), (pj_2, shared)]
+    resolver = make_resolver(tmp_path, fetch_detail)
+
+    details = resolver.resolve(targets)
+    assert [d["sha"] for d in details] == [shared.id, other.id, shared.id, shared.id]
+    assert sorted(fetched) == [(1, other.id), (1, shared.id), (2, shared.id)]
+
+    # resolved commits are kept in CommitCache for next builds.
+    assert make_resolver(tmp_path, fetch_detail).resolve([(pj_2, shared)]) == [{"sha": shared.id}]
+    assert len(fetched) == 3
+
+
+def test_use_commit_cache_before_fetch(tmp_path):
+    resolver = make_resolver(tmp_path, lambda project, commit: pytest.fail("must not fetch"))
+    project, commit = MockProject(id=1), MockProjectCommit()
+    resolver.commit_cache.put(project.id, commit.id, {"sha": "cached"})
+    assert resolver.resolve([(project, commit)]) == [{"sha": "cached"}]
+
+
+def test_tolerate_failed_commit(tmp_path):
+    def fetch_detail(project, commit):
+        if commit.short_id == "broken":
+            raise ValueError("broken")
+        return {"sha": commit.id}
+
+    resolver = make_resolver(tmp_path, fetch_detail)
+    project, broken = MockProject(id=1), MockProjectCommit(short_id="broken")
+    details = resolver.resolve(
+        [(project, broken), (project, MockProjectCommit()), (project, broken)], tolerate=(ValueError,)
+    )
+    assert isinstance(details[0], ValueError) and details[0] is details[2]
+    assert details[1] == {"sha": "short_id_1_sha"}
+    # failures are not kept, so that next resolve fetches them again.
+    with pytest.raises(ValueError):
+        resolver.resolve([(project, broken)])
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from service import crawl, mergerequest, snapshot
+
+
+def make_df(group_id: int) -> pd.DataFrame:
+    return pd.DataFrame({"id": [group_id], "updated_at": ["2022-01-01T00:00:00.000Z"]})
+
+
+def test_parse_args():
+    args = crawl.parse_args(["--groups", "1,2", "--resources", "issues,mrs", "--concurrency", "16"])
+    assert args.groups == [1, 2]
+    assert args.resources == ["issues", "mergerequests"]
+    assert args.concurrency == 16
+    assert not args.full and not args.restart
+    with pytest.raises(SystemExit):
+        crawl.parse_args(["--resources", "issues,unknown"])
+
+
+def test_crawl_resumes_from_checkpoint(mocker, tmp_cache_dir):
+    issue_mock = mocker.patch.object(crawl, "make_issue_df", side_effect=lambda group_id, **_: make_df(group_id))
+    mr_mock = mocker.patch.object(
+        mergerequest, "make_mergerequest_df", side_effect=[RuntimeError("interrupted"), make_df(1)]
+    )
+
+    errors = crawl.crawl([1], ["issues", "mergerequests"], concurrency=16)
+    assert list(errors) == [(1, "mergerequests")]
+    assert crawl.CrawlCheckpoint().done == {"1:issues"}
+    assert snapshot.load_published(1, "issues")["id"].to_list() == [1]
+
+    assert crawl.crawl([1], ["issues", "mergerequests"], concurrency=16) == {}
+    assert issue_mock.call_count == 1
+    assert mr_mock.call_count == 2
+    assert mr_mock.call_args.kwargs["max_workers"] == 16
+    assert snapshot.load_published(1, "mergerequests")["id"].to_list() == [1]
+    assert not tmp_cache_dir.joinpath(crawl.CrawlCheckpoint.file_name).exists()
+
+
+def test_crawl_fails_incomplete_dataset(mocker):
+    def make_partial_df(group_id: int, **_) -> pd.DataFrame:
+        df = make_df(group_id)
+        df.attrs[snapshot.FAILED_ROWS_ATTR] = 1
+        return df
+
+    mocker.patch.object(crawl, "make_issue_df", side_effect=make_partial_df)
+    errors = crawl.crawl([1], ["issues"])
+    assert list(errors) == [(1, "issues")]
+    assert crawl.CrawlCheckpoint().done == set()
+    assert snapshot.load_published(1, "issues") is None
+
+
+def test_main(mocker):
+    crawl_mock = mocker.patch.object(crawl, "crawl", side_effect=[{}, {(1, "issues"): "RuntimeError()"}])
+    assert crawl.main(["--groups", "1", "--resources", "issues", "--stats-mode", "fast", "--full"]) == 0
+    assert crawl_mock.call_args.args == ([1], ["issues"])
+    assert crawl_mock.call_args.kwargs["stats_mode"] == "fast"
+    assert crawl_mock.call_args.kwargs["full"]
+    assert crawl.main(["--groups", "1", "--resources", "issues", "--restart"]) == 1
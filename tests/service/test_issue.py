@@ -2,15 +2,64 @@ from typing import Any
 
 import pandas as pd
 
+from common import GitlabConst
 from repository.mapper import GitlabClient
 from service import issue
+from tests.fake_gitlab import FakeGitlabSize
 from tests.mock_classes import MockIssue
 
 
 def test_make_issue_df(mocker, mock_construct_gitlab_client):
-    mock_issues = [MockIssue({"id": i, "name": f"name_{i}", "nest": {"id": 1, "name": 1}}) for i in range(3)]
+    mock_issues = [
+        MockIssue({"id": i, "title": f"title_{i}", "author": {"id": 1, "username": "user"}, "unused": i})
+        for i in range(3)
+    ]
     mocker.patch.object(GitlabClient, "fetch_group_issues", return_value=mock_issues)
     issue_df = issue.make_issue_df(1)
-    assert issue_df.shape == (3, 4)
-    expect = pd.DataFrame([{"id": i, "name": f"name_{i}", "nest-id": 1, "nest-name": 1} for i in range(3)])
+    assert issue_df.shape == (3, 3)
+    expect = pd.DataFrame([{"id": i, "title": f"title_{i}", "author-username": "user"} for i in range(3)])
     assert (issue_df == expect).all().all()
+    assert issue_df["id"].dtype == "Int64"
+    assert issue_df["author-username"].dtype == "category"
+
+
+def test_make_issue_df_incremental(mocker, mock_construct_gitlab_client):
+    def make_issue(id: int, updated_at: str, title: str = "title"):
+        return MockIssue({"id": id, "title": title, "updated_at": updated_at})
+
+    first = [make_issue(i, f"2022-01-0{i + 1}T00:00:00.000Z") for i in range(3)]
+    second = [make_issue(2, "2022-01-03T00:00:00.000Z"), make_issue(1, "2022-01-05T00:00:00.000Z", "updated")]
+    fetch_mock = mocker.patch.object(GitlabClient, "fetch_group_issues", side_effect=[first, second, []])
+
+    assert issue.make_issue_df(1, incremental=True)["id"].to_list() == [2, 1, 0]
+    issue_df = issue.make_issue_df(1, incremental=True)
+    assert issue_df["title"].to_list() == ["title", "updated", "title"]
+    assert issue.make_issue_df(1, incremental=True).equals(issue_df)
+    updated_afters = [c.kwargs["updated_after"] for c in fetch_mock.call_args_list]
+    assert updated_afters == [None, "2022-01-03T00:00:00.000Z", "2022-01-05T00:00:00.000Z"]
+
+
+def test_make_issue_df_snapshot(mocker, mock_construct_gitlab_client):
+    mock_issues = [MockIssue({"id": i, "state": "opened", "updated_at": "2022-01-01T00:00:00.000Z"}) for i in range(3)]
+    fetch_mock = mocker.patch.object(GitlabClient, "fetch_group_issues", return_value=mock_issues)
+
+    first = issue.make_issue_df(1, use_snapshot=True)
+    assert first["updated_at"].dtype == "datetime64[ns, UTC]"
+    create_spy = mocker.spy(issue, "create_client")
+    pd.testing.assert_frame_equal(issue.make_issue_df(1, use_snapshot=True), first)
+    assert fetch_mock.call_count == 1
+    create_spy.assert_not_called()
+
+    mocker.patch.object(GitlabConst, "SNAPSHOT_MAX_AGE_SEC", -1)
+    issue.make_issue_df(1, use_snapshot=True)
+    assert fetch_mock.call_count == 2
+    issue.make_issue_df(1, state="opened", use_snapshot=True)
+    assert fetch_mock.call_count == 3
+
+
+def test_make_issue_df_retries_server_error(mocker, fake_gitlab):
+    mocker.patch("repository.throttle.time.sleep")
+    server = fake_gitlab(FakeGitlabSize(issues_per_project=150), error_rate=0.5, error_pattern="/issues$", seed=1)
+    df = issue.make_issue_df(1)
+    assert sorted(df["id"]) == [i["id"] for i in server.data.group_issues[1]]
+    assert server.errors["/groups/:id/issues"] > 0
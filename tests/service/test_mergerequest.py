@@ -1,7 +1,12 @@
+from collections import defaultdict
+
+import pandas as pd
 import pytest
 
+from repository import async_mapper, connection, factory
 from repository.mapper import GitlabClient
-from service import mergerequest
+from service import mergerequest, snapshot
+from tests.fake_gitlab import FakeGitlabSize
 from tests.mock_classes import MockMergeRequest, MockProject, MockProjectCommit
 
 
@@ -29,3 +34,185 @@ def test_make_issue_df(mocker, target_pj_names):
     assert mergerequest_df.shape[0] == expect_rows
     for group_id in mergerequest_df["group_id"]:
         assert group_id == 1
+
+
+@pytest.mark.usefixtures("mock_construct_gitlab_client")
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_make_mergerequest_df_stats(mocker, max_workers):
+    mock_commits = [MockProjectCommit(short_id=f"short_id{str(i)}") for i in range(3)]
+    mock_commits.append(MockProjectCommit(short_id=f"short_id{len(mock_commits)}", diff=[{"deleted_file": "file_d"}]))
+    mock_mrs = [MockMergeRequest(project_id=0, commits=mock_commits[: i + 1]) for i in range(4)]
+    mock_pjs = [MockProject(id=0, name="pj_0", commit_info={m.short_id: m for m in mock_commits})]
+    mocker.patch.object(GitlabClient, "fetch_mergerrequests_in_group", return_value=mock_mrs)
+    mocker.patch.object(GitlabClient, "fetch_projects_in_group", return_value=mock_pjs)
+    mergerequest_df = mergerequest.make_mergerequest_df(1, max_workers=max_workers)
+    assert mergerequest_df["total_commits"].to_list() == [1, 2, 3, 4]
+    assert mergerequest_df["total_additions"].to_list() == [1, 2, 3, 4]
+    assert mergerequest_df["total_deletions"].to_list() == [1, 2, 3, 4]
+    assert mergerequest_df["total_changes"].to_list() == [2, 4, 6, 8]
+    assert mergerequest_df["total_changed_file_count"].to_list() == [1, 2, 3, 4]
+    expect_diffs = [{"file_1": {"add": i, "del": i, "change_cnt": i}} for i in [1, 2, 3, 3]]
+    assert mergerequest_df["diff"].to_list() == expect_diffs
+
+
+@pytest.mark.usefixtures("mock_construct_gitlab_client")
+def test_make_mergerequest_df_use_commit_cache(mocker):
+    mock_commits = [MockProjectCommit(short_id=f"short_id{str(i)}") for i in range(3)]
+    mock_mrs = [MockMergeRequest(project_id=0, commits=mock_commits)]
+    mock_pjs = [MockProject(id=0, name="pj_0", commit_info={m.short_id: m for m in mock_commits})]
+    mocker.patch.object(GitlabClient, "fetch_mergerrequests_in_group", return_value=mock_mrs)
+    mocker.patch.object(GitlabClient, "fetch_projects_in_group", return_value=mock_pjs)
+    first_df = mergerequest.make_mergerequest_df(1)
+    # second build must not fetch any commit.
+    mock_pjs[0].commits = {}
+    second_df = mergerequest.make_mergerequest_df(1)
+    assert first_df.drop(columns="diff").equals(second_df.drop(columns="diff"))
+    assert first_df["diff"].to_list() == second_df["diff"].to_list()
+
+
+@pytest.mark.usefixtures("mock_construct_gitlab_client")
+def test_make_mergerequest_df_fast_stats(mocker):
+    changes = [
+        {"new_path": "file_1", "diff": "@@ -1,2 +1,3 @@\n+a\n+b\n-c\n d", "deleted_file": False},
+        {"new_path": "file_2", "diff": "@@ -1,2 +0,0 @@\n-a\n-b", "deleted_file": True},
+    ]
+    mock_commits = [MockProjectCommit(short_id=f"short_id{str(i)}") for i in range(3)]
+    mock_mrs = [MockMergeRequest(project_id=0, commits=mock_commits, changes=changes)]
+    mock_pjs = [MockProject(id=0, name="pj_0", commit_info={})]
+    mocker.patch.object(GitlabClient, "fetch_mergerrequests_in_group", return_value=mock_mrs)
+    mocker.patch.object(GitlabClient, "fetch_projects_in_group", return_value=mock_pjs)
+    mergerequest_df = mergerequest.make_mergerequest_df(1, stats_mode=mergerequest.STATS_MODE_FAST)
+    assert mergerequest_df.loc[0, "total_commits"] == 3
+    assert mergerequest_df.loc[0, "total_additions"] == 2
+    assert mergerequest_df.loc[0, "total_deletions"] == 3
+    assert mergerequest_df.loc[0, "total_changes"] == 5
+    assert mergerequest_df.loc[0, "total_changed_file_count"] == 2
+    assert mergerequest_df.loc[0, "changes_count"] == "2"
+    assert mergerequest_df.loc[0, "diff"] == {"file_1": {"add": 2, "del": 1, "change_cnt": 1}}
+
+
+def legacy_sum_diffs(diffs: list[dict]) -> dict:
+    total_diffs = defaultdict(dict)
+    for commit_diff in diffs:
+        for file_path, diff in commit_diff.items():
+            total_diffs[file_path]["add"] = total_diffs[file_path].get("add", 0) + diff["add"]
+            total_diffs[file_path]["del"] = total_diffs[file_path].get("del", 0) + diff["del"]
+            total_diffs[file_path]["change_cnt"] = total_diffs[file_path].get("change_cnt", 0) + diff["change_cnt"]
+    return total_diffs
+
+
+def test_make_diff_df():
+    mergerequest_df = pd.DataFrame(
+        [
+            {"id": 1, "project_id": 10, "diff": {"a.py": {"add": 1, "del": 2, "change_cnt": 1}}},
+            {
+                "id": 2,
+                "project_id": 10,
+                "diff": {"a.py": {"add": 3, "del": 0, "change_cnt": 2}, "b.py": {"add": 5, "del": 1, "change_cnt": 1}},
+            },
+            {"id": 3, "project_id": 20, "diff": {}},
+            {"id": 4, "project_id": 20, "diff": None},
+        ]
+    )
+    diff_df = mergerequest.make_diff_df(mergerequest_df)
+
+    assert diff_df.columns.to_list() == mergerequest.DIFF_COLS
+    assert diff_df["file_path"].dtype == "category"
+    assert diff_df[["mr_id", "file_path", "add"]].astype({"file_path": str}).values.tolist() == [
+        [1, "a.py", 1],
+        [2, "a.py", 3],
+        [2, "b.py", 5],
+    ]
+    total_df = diff_df.groupby("file_path", observed=True)[["add", "del", "change_cnt"]].sum()
+    assert total_df.to_dict("index") == legacy_sum_diffs(mergerequest_df["diff"].dropna().to_list())
+    assert mergerequest.make_diff_df(pd.DataFrame()).columns.to_list() == mergerequest.DIFF_COLS
+
+
+@pytest.mark.parametrize("backend", [factory.BACKEND_SYNC, factory.BACKEND_ASYNC])
+@pytest.mark.parametrize("shared_commits", [0, 1])
+def test_make_mergerequest_df_against_fake_gitlab(mocker, fake_gitlab, backend, shared_commits):
+    server = fake_gitlab(
+        FakeGitlabSize(projects_per_group=2, mrs_per_project=3, commits_per_mr=2, shared_commits_per_mr=shared_commits)
+    )
+    mocker.patch("service.mergerequest.create_client", lambda group_id: factory.create_client(group_id, backend))
+    mocker.patch.dict(async_mapper.async_clients, clear=True)
+    df = mergerequest.make_mergerequest_df(1).set_index("id")
+
+    assert sorted(df.index) == [mr["id"] for mr in server.data.group_mrs[1]]
+    for (project_id, iid), commits in server.data.mr_commits.items():
+        mr_id = server.data.mrs[(project_id, iid)]["id"]
+        assert df.loc[mr_id, "total_commits"] == len(commits)
+        assert df.loc[mr_id, "total_additions"] == sum(c["stats"]["additions"] for c in commits)
+        assert df.loc[mr_id, "total_deletions"] == sum(c["stats"]["deletions"] for c in commits)
+    # each commit is fetched once with its diff, even if MRs share it.
+    assert server.requests["/projects/:id/repository/commits/:sha"] == server.data.total_commits
+    assert server.requests["/projects/:id/repository/commits/:sha/diff"] == server.data.total_commits
+
+
+def test_make_mergerequest_df_keeps_partial_progress(mocker, fake_gitlab):
+    mocker.patch("repository.throttle.time.sleep")
+    server = fake_gitlab(
+        FakeGitlabSize(projects_per_group=2, mrs_per_project=3, commits_per_mr=2),
+        error_rate=1.0,
+        error_pattern="/projects/1001/repository/commits/",
+    )
+    df = mergerequest.make_mergerequest_df(1, incremental=True, use_snapshot=True)
+    failed_ids = [mr["id"] for mr in server.data.group_mrs[1] if mr["project_id"] == 1001]
+    assert sorted(df["id"]) == sorted(mr["id"] for mr in server.data.group_mrs[1] if mr["project_id"] != 1001)
+    assert df.attrs[snapshot.FAILED_ROWS_ATTR] == len(failed_ids)
+
+    # failed MRs are fetched again on next sync, since snapshot is not saved and sync mark is not advanced.
+    server.error_rate = 0.0
+    df = mergerequest.make_mergerequest_df(1, incremental=True, use_snapshot=True)
+    assert sorted(df["id"]) == sorted(mr["id"] for mr in server.data.group_mrs[1])
+    assert not df.attrs.get(snapshot.FAILED_ROWS_ATTR)
+
+
+@pytest.mark.parametrize("backend", [factory.BACKEND_SYNC, factory.BACKEND_ASYNC])
+def test_make_mergerequest_df_keeps_permanently_failed_mrs_without_stats(mocker, fake_gitlab, backend):
+    mocker.patch("service.mergerequest.create_client", lambda group_id: factory.create_client(group_id, backend))
+    mocker.patch.dict(async_mapper.async_clients, clear=True)
+    server = fake_gitlab(
+        FakeGitlabSize(projects_per_group=2, mrs_per_project=3, commits_per_mr=2),
+        error_rate=1.0,
+        error_status=404,
+        error_pattern="/projects/1001/repository/commits/",
+    )
+    df = mergerequest.make_mergerequest_df(1, incremental=True, use_snapshot=True).set_index("id")
+    assert sorted(df.index) == [mr["id"] for mr in server.data.group_mrs[1]]
+    failed = df["project_id"] == 1001
+    assert df.loc[failed, "total_commits"].isna().all()
+    assert df.loc[~failed, "total_commits"].notna().all()
+    # 404 is not retried and does not withhold the snapshot.
+    assert server.errors["/projects/:id/repository/commits/:sha"] == server.data.size.commits_per_mr * 3
+    assert snapshot.load_published(1, mergerequest.get_resource()) is not None
+
+
+@pytest.mark.parametrize("stats_mode", [mergerequest.STATS_MODE_COMMIT, mergerequest.STATS_MODE_FAST])
+def test_async_backend_fetches_mr_details_without_python_gitlab(mocker, fake_gitlab, stats_mode):
+    server = fake_gitlab(FakeGitlabSize(projects_per_group=2, mrs_per_project=3, commits_per_mr=2))
+    mocker.patch(
+        "service.mergerequest.create_client", lambda group_id: factory.create_client(group_id, factory.BACKEND_ASYNC)
+    )
+    mocker.patch.dict(async_mapper.async_clients, clear=True)
+    http_request = mocker.spy(connection.AdapterRetriedGitlab, "http_request")
+    df = mergerequest.make_mergerequest_df(1, stats_mode=stats_mode)
+
+    assert len(df) == len(server.data.group_mrs[1])
+    assert df["total_commits"].notna().all()
+    requested_paths = [c.args[2] for c in http_request.call_args_list]
+    assert not [p for p in requested_paths if "/merge_requests/" in p or "/repository/commits" in p]
+
+
+def test_diff_table_published_with_snapshot(mocker, fake_gitlab):
+    fake_gitlab(FakeGitlabSize(projects_per_group=2, mrs_per_project=3, commits_per_mr=2))
+    resource = mergerequest.get_resource()
+    assert snapshot.load_derived(1, resource, mergerequest.DIFF_TABLE) is None
+    df = mergerequest.make_mergerequest_df(1, use_snapshot=True)
+    diff_df = snapshot.load_derived(1, resource, mergerequest.DIFF_TABLE)
+    pd.testing.assert_frame_equal(diff_df, mergerequest.make_diff_df(df))
+
+    # table made from previous dataset is not loaded.
+    mocker.patch.dict(snapshot.derivers[resource], {mergerequest.DIFF_TABLE: mocker.Mock(side_effect=ValueError)})
+    snapshot.refresh(1, resource, lambda: df)
+    assert snapshot.load_derived(1, resource, mergerequest.DIFF_TABLE) is None
@@ -0,0 +1,124 @@
+import pandas as pd
+import pytest
+
+from service import rollup
+
+
+def make_issue(id: int, project_id: int, state: str, created_at: str, updated_at: str, assignee=None, labels=None):
+    return {
+        "id": id,
+        "project_id": project_id,
+        "state": state,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "assignee-username": assignee,
+        "labels": labels or [],
+        "title": f"title_{id}",
+    }
+
+
+@pytest.fixture
+def issue_df():
+    return pd.DataFrame(
+        [
+            make_issue(1, 10, "opened", "2022-01-05T00:00:00.000Z", "2022-01-05T00:00:00.000Z", "alice", ["bug"]),
+            make_issue(2, 10, "closed", "2022-02-05T00:00:00.000Z", "2022-02-06T00:00:00.000Z", None, ["bug", "ui"]),
+            make_issue(3, 20, "closed", "2022-04-05T00:00:00.000Z", "2022-04-06T00:00:00.000Z", "bob"),
+            make_issue(4, 20, "opened", "2022-04-10T00:00:00.000Z", "2022-04-10T00:00:00.000Z", "alice", ["ui"]),
+        ]
+    )
+
+
+def sort_table(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def assert_same_tables(actual: rollup.Rollup, expect: rollup.Rollup, check_dtype: bool = True):
+    assert actual.tables.keys() == expect.tables.keys()
+    for name in expect.tables:
+        pd.testing.assert_frame_equal(
+            sort_table(actual.tables[name]),
+            sort_table(expect.tables[name]),
+            check_dtype=check_dtype,
+            check_categorical=check_dtype,
+        )
+
+
+def test_build_rollup_issues(issue_df):
+    issue_rollup = rollup.build_rollup(rollup.ROLLUP_ISSUES, issue_df)
+
+    assignee_df = issue_rollup.slice(rollup.TABLE_ASSIGNEE_STATE)
+    assert assignee_df.to_dict("records") == [
+        {"assignee-username": "Not Assigned!", "state": "closed", "count": 1},
+        {"assignee-username": "alice", "state": "opened", "count": 2},
+        {"assignee-username": "bob", "state": "closed", "count": 1},
+    ]
+    label_df = issue_rollup.slice(rollup.TABLE_LABEL_STATE, [10])
+    assert label_df.to_dict("records") == [
+        {"labels": "bug", "state": "closed", "count": 1},
+        {"labels": "bug", "state": "opened", "count": 1},
+        {"labels": "ui", "state": "closed", "count": 1},
+    ]
+    created_df = issue_rollup.slice(rollup.period_table(rollup.TABLE_CREATED, "Q"), keep_project=True)
+    assert created_df["project_id"].to_list() == [10, 20]
+    assert created_df["count"].to_list() == [2, 2]
+    closed_df = issue_rollup.slice(rollup.period_table(rollup.TABLE_CLOSED, "M"), [20])
+    assert closed_df["count"].to_list() == [1]
+    assert issue_rollup.slice(rollup.TABLE_STATE, [99]).empty
+
+
+def test_build_rollup_mergerequests(issue_df):
+    mr_rollup = rollup.build_rollup(
+        rollup.ROLLUP_MERGEREQUESTS, issue_df.drop(columns=["assignee-username", "labels"])
+    )
+    assert rollup.TABLE_ASSIGNEE_STATE not in mr_rollup.tables
+    assert mr_rollup.slice(rollup.period_table(rollup.TABLE_CREATED, "W"))["count"].sum() == 4
+
+
+def test_update_rollup_equals_rebuild(issue_df, mocker):
+    mocker.patch.object(rollup, "REBUILD_RATIO", 1.0)
+    old_rollup = rollup.build_rollup(rollup.ROLLUP_ISSUES, issue_df)
+    new_df = issue_df[issue_df["id"] != 3].copy()
+    new_df.loc[new_df["id"] == 1, ["state", "updated_at", "labels"]] = ["closed", "2022-05-01T00:00:00.000Z", None]
+    new_issue = make_issue(5, 30, "opened", "2022-05-02T00:00:00.000Z", "2022-05-02T00:00:00.000Z", "carol", ["ui"])
+    new_df = pd.concat([new_df, pd.DataFrame([new_issue])], ignore_index=True)
+
+    build_spy = mocker.spy(rollup, "build_rollup")
+    updated = rollup.update_rollup(rollup.ROLLUP_ISSUES, old_rollup, new_df)
+    build_spy.assert_not_called()
+    assert_same_tables(updated, rollup.build_rollup(rollup.ROLLUP_ISSUES, new_df))
+    assert updated.fingerprint == rollup.fingerprint(new_df)
+    assert old_rollup.slice(rollup.TABLE_STATE)["count"].sum() == 4
+
+
+def test_get_rollup_reuses_same_version(issue_df, mocker):
+    build_spy = mocker.spy(rollup, "build_rollup")
+    update_spy = mocker.spy(rollup, "update_rollup")
+    first = rollup.get_rollup(rollup.ROLLUP_ISSUES, 1, issue_df)
+    assert rollup.get_rollup(rollup.ROLLUP_ISSUES, 1, issue_df.copy()) is first
+    assert build_spy.call_count == 1
+
+    new_df = issue_df.copy()
+    new_df.loc[0, "updated_at"] = "2022-06-01T00:00:00.000Z"
+    second = rollup.get_rollup(rollup.ROLLUP_ISSUES, 1, new_df)
+    assert second is not first
+    assert update_spy.call_count == 1
+    assert rollup.get_rollup(rollup.ROLLUP_ISSUES, 2, issue_df) is not first
+
+    rollup.clear_rollup(group_id=1)
+    assert list(rollup.rollups) == [(rollup.ROLLUP_ISSUES, 2)]
+
+
+def test_build_rollup_from_snapshot(issue_df):
+    from repository.snapshot_store import get_snapshot_store
+
+    store = get_snapshot_store()
+    store.save(1, "issues", issue_df)
+    snapshot_df = store.load(1, "issues")
+    assert snapshot_df["assignee-username"].dtype == "category"
+
+    assert_same_tables(
+        rollup.build_rollup(rollup.ROLLUP_ISSUES, snapshot_df),
+        rollup.build_rollup(rollup.ROLLUP_ISSUES, issue_df),
+        check_dtype=False,
+    )
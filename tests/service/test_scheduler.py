@@ -0,0 +1,104 @@
+import threading
+
+import pandas as pd
+
+from service import scheduler, snapshot
+
+
+def make_builder(calls: list):
+    def build(group_id: int) -> pd.DataFrame:
+        calls.append(group_id)
+        return pd.DataFrame({"id": [group_id], "updated_at": ["2022-01-01T00:00:00.000Z"]})
+
+    return build
+
+
+def test_refresh_all_publishes_snapshots():
+    calls = []
+    refresh_scheduler = scheduler.RefreshScheduler([1, 2], {"issues": make_builder(calls)}, interval_sec=60)
+    refresh_scheduler.refresh_all()
+    assert calls == [1, 2]
+    assert snapshot.load_published(2, "issues")["id"].to_list() == [2]
+    assert snapshot.saved_at(1, "issues") is not None
+
+    # snapshots younger than interval are not refreshed.
+    refresh_scheduler.refresh_all()
+    assert calls == [1, 2]
+    refresh_scheduler.interval_sec = 0
+    refresh_scheduler.refresh_all()
+    assert calls == [1, 2, 1, 2]
+
+
+def test_refresh_all_continues_after_failure():
+    calls = []
+
+    def fail(group_id: int) -> pd.DataFrame:
+        raise RuntimeError(f"failed {group_id}")
+
+    refresh_scheduler = scheduler.RefreshScheduler([1], {"mergerequests": fail, "issues": make_builder(calls)})
+    refresh_scheduler.refresh_all()
+    assert calls == [1]
+    assert refresh_scheduler.errors == {(1, "mergerequests"): "RuntimeError('failed 1')"}
+    assert snapshot.load_published(1, "mergerequests") is None
+
+
+def test_refresh_all_records_incomplete_dataset():
+    def build_partial(group_id: int) -> pd.DataFrame:
+        df = pd.DataFrame({"id": [group_id], "updated_at": ["2022-01-01T00:00:00.000Z"]})
+        df.attrs[snapshot.FAILED_ROWS_ATTR] = 2
+        return df
+
+    refresh_scheduler = scheduler.RefreshScheduler([1], {"mergerequests": build_partial})
+    refresh_scheduler.refresh_all()
+    assert "failed_rows=2" in refresh_scheduler.errors[(1, "mergerequests")]
+    assert snapshot.load_published(1, "mergerequests") is None
+
+
+def test_start_and_stop():
+    refreshed = threading.Event()
+
+    def build(group_id: int) -> pd.DataFrame:
+        refreshed.set()
+        return pd.DataFrame({"id": [group_id]})
+
+    refresh_scheduler = scheduler.RefreshScheduler([1], {"issues": build}, interval_sec=60)
+    refresh_scheduler.start()
+    refresh_scheduler.start()
+    assert refreshed.wait(5)
+    assert refresh_scheduler.is_running
+    refresh_scheduler.stop(timeout=5)
+    assert not refresh_scheduler.is_running
+
+
+def test_get_scheduler_is_shared(mocker):
+    mocker.patch.object(scheduler, "scheduler", None)
+    start_mock = mocker.patch.object(scheduler.RefreshScheduler, "start")
+    shared = scheduler.start_scheduler()
+    assert scheduler.get_scheduler() is shared
+    assert set(shared.builders) == {"issues", "mergerequests"}
+    start_mock.assert_called_once()
+
+
+def test_refresh_waits_for_build_of_view():
+    calls = []
+    building = threading.Event()
+    release = threading.Event()
+    build = make_builder(calls)
+
+    def slow_build():
+        building.set()
+        release.wait(5)
+        return build(1)
+
+    # view builds the dataset on cold start, while the scheduler refreshes the same dataset.
+    view = threading.Thread(target=snapshot.load_or_build, args=(1, "issues", slow_build))
+    view.start()
+    assert building.wait(5)
+    refresh_scheduler = scheduler.RefreshScheduler([1], {"issues": make_builder(calls)}, interval_sec=60)
+    refresher = threading.Thread(target=refresh_scheduler.refresh_all)
+    refresher.start()
+    release.set()
+    view.join(5)
+    refresher.join(5)
+    assert calls == [1]
+    assert snapshot.load_published(1, "issues")["id"].to_list() == [1]
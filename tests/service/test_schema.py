@@ -0,0 +1,36 @@
+import pandas as pd
+
+from service import schema
+from tests.legacy_impl import make_raw_issues
+
+
+def test_apply_issue_schema():
+    raw_df = make_raw_issues(10)
+    typed_df = schema.ISSUE_SCHEMA.apply(raw_df)
+
+    assert set(typed_df.columns) <= set(schema.ISSUE_SCHEMA.cols)
+    assert "description" not in typed_df.columns
+    assert "author-avatar_url" not in typed_df.columns
+    assert list(typed_df.columns) == [c for c in raw_df.columns if c in typed_df.columns]
+    assert typed_df["id"].dtype == "Int64"
+    assert typed_df["created_at"].dtype == "datetime64[ns, UTC]"
+    assert typed_df["closed_at"].isna().sum() == raw_df["closed_at"].isna().sum()
+    assert typed_df["due_date"].dtype == "datetime64[ns]"
+    assert typed_df["state"].dtype == "category"
+    assert typed_df["assignee-username"].isna().to_list() == raw_df["assignee-username"].isna().to_list()
+    assert typed_df["labels"].to_list() == raw_df["labels"].to_list()
+
+
+def test_apply_schema_to_empty_dataset():
+    assert schema.MERGEREQUEST_SCHEMA.apply(pd.DataFrame()).empty
+
+
+def test_apply_schema_keeps_nullable_ints():
+    typed_df = schema.ISSUE_SCHEMA.apply(pd.DataFrame({"id": [1, 2], "weight": [3, None]}))
+    assert typed_df["weight"].to_list() == [3, pd.NA]
+
+
+def test_typed_dataset_is_smaller():
+    raw_df = make_raw_issues(2000)
+    typed_df = schema.ISSUE_SCHEMA.apply(raw_df)
+    assert schema.memory_usage_mb(typed_df) < schema.memory_usage_mb(raw_df) / 2
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from tests.legacy_impl import legacy_count_by_time, make_dataset
+from view import util
+
+
+def sort_counts(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[df["count"] > 0][["project_name", "created_at", "count"]]
+    return df.sort_values(["project_name", "created_at"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("unit", ["Q", "M", "W"])
+def test_count_by_time_same_as_legacy(unit):
+    df = make_dataset(2000)
+    expect = sort_counts(legacy_count_by_time(df, "created_at", unit, "project_name"))
+    result = sort_counts(util.count_by_time(df, "created_at", unit, "project_name"))
+    pd.testing.assert_frame_equal(result, expect, check_dtype=False)
+
+
+def test_count_by_time():
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "project_name": ["it's quoted", "it's quoted", "pj", None],
+            "created_at": pd.to_datetime(["2022-01-01", "2022-01-02", "2022-02-01", "2022-02-01"], utc=True),
+        }
+    )
+    result = util.count_by_time(df, "created_at", "M", "project_name")
+    assert result["project_name"].to_list() == ["it's quoted", "pj"]
+    assert result["count"].to_list() == [2, 1]
+    assert util.count_by_time(df, "created_at", "M")["count"].to_list() == [2, 2]
+    assert util.count_by_time(df.iloc[:0], "created_at", "M", "project_name").empty
+
+
+def test_to_datetime():
+    parsed = util.to_datetime(pd.Series(["2022-01-01T00:00:00.000+09:00"]))
+    assert pd.api.types.is_datetime64_any_dtype(parsed)
+    assert util.to_datetime(parsed) is parsed